@@ -3,24 +3,22 @@ Script to import photos for all collections from Douban album to the website.
 """
 
 import os
-import shutil
 import sys
 from datetime import datetime
 
 # Add the parent directory to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from mySite.app import app, db, ExercisePhoto, ReadingQuotePhoto, IntellectualPhoto, FragmentedQuotePhoto
+from mySite.app import (
+    app, db, ExercisePhoto, ReadingQuotePhoto, IntellectualPhoto, FragmentedQuotePhoto,
+    adopt_derivatives, generate_image_variants, store_blob,
+)
 
 BASE_SOURCE_DIR = "/Users/k/Library/Mobile Documents/com~apple~CloudDocs/08_Python/Working projects/douban/douban_album"
-BASE_DEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mySite/static")
 
-def import_collection(source_subdirs, dest_subdir, ModelClass, collection_name):
+def import_collection(source_subdirs, ModelClass, collection_name):
     print(f"\n--- Importing {collection_name} ---")
     
-    dest_dir = os.path.join(BASE_DEST_DIR, dest_subdir)
-    os.makedirs(dest_dir, exist_ok=True)
-    
     total_imported = 0
     
     with app.app_context():
@@ -36,32 +34,44 @@ def import_collection(source_subdirs, dest_subdir, ModelClass, collection_name):
             
             count = 0
             for filename in files:
-                # Check if already exists in DB
+                # Check if already exists in DB (imported before the blob store)
                 if ModelClass.query.filter_by(filename=filename).first():
                     # print(f"Skipping {filename} (already in DB)")
                     continue
                     
-                # Copy file
+                # Copy file into the blob store, once per content: a photo
+                # already imported into another collection shares its file
                 src_path = os.path.join(source_dir, filename)
-                dest_path = os.path.join(dest_dir, filename)
-                
                 try:
-                    shutil.copy2(src_path, dest_path)
-                except Exception as e:
+                    blob, new = store_blob(src_path)
+                except (OSError, ValueError) as e:
                     print(f"Error copying {filename}: {e}")
                     continue
+                if ModelClass.query.filter_by(sha256=blob.sha256).first():
+                    continue
                 
                 # Create DB entry
                 title = os.path.splitext(filename)[0]
                 
                 photo = ModelClass(
                     title=title,
-                    filename=filename,
+                    filename=blob.filename,
+                    sha256=blob.sha256,
                     description=f"Imported from {subdir}",
                     created_at=datetime.utcnow()
                 )
                 
                 db.session.add(photo)
+
+                # Grid thumbnail and responsive copies, all from one
+                # (reduced-size for JPEGs) decode, unless the same bytes
+                # already have them
+                if new or not adopt_derivatives(photo):
+                    try:
+                        generate_image_variants(photo)
+                    except Exception as e:
+                        print(f"Error resizing {filename}: {e}")
+
                 count += 1
                 total_imported += 1
                 
@@ -78,7 +88,6 @@ def main():
     # Exercises
     import_collection(
         ["Exercises"], 
-        "exercise_photos", 
         ExercisePhoto, 
         "Exercises"
     )
@@ -86,7 +95,6 @@ def main():
     # Reading Quotes
     import_collection(
         ["Reading Quotes"], 
-        "reading_quote_photos", 
         ReadingQuotePhoto, 
         "Reading Quotes"
     )
@@ -94,7 +102,6 @@ def main():
     # Intellectual Masturbation
     import_collection(
         ["Intellectual Masturbation"], 
-        "intellectual_photos", 
         IntellectualPhoto, 
         "Intellectual Masturbation"
     )
@@ -102,7 +109,6 @@ def main():
     # Fragmented Quotes (from Quotes and Quotes v2)
     import_collection(
         ["Quotes", "Quotes v2"], 
-        "fragmented_quote_photos", 
         FragmentedQuotePhoto, 
         "Fragmented Quotes"
     )
@@ -13,6 +13,21 @@ Author: K.
 
 import os
 import json
+import base64
+import hashlib
+import io
+import math
+import pickle
+import random
+import re
+import shutil
+import threading
+import multiprocessing
+from collections import Counter, OrderedDict, namedtuple
+from itertools import chain
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import MappingProxyType
 from urllib.parse import quote
 from flask import (
     Flask,
@@ -22,9 +37,13 @@ from flask import (
     url_for,
     flash,
     abort,
+    send_file,
     send_from_directory,
     make_response,
     jsonify,
+    session,
+    Response,
+    stream_with_context,
 )
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -37,13 +56,23 @@ from flask_login import (
     current_user,
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 import os  # Make sure to import os
 from werkzeug.utils import (
+    safe_join,
     secure_filename,
 )  # Make sure to import this for secure filenames
-from PIL import Image
+from PIL import ExifTags, Image, ImageOps
 from functools import wraps
+from bs4 import BeautifulSoup
+from markupsafe import Markup, escape
+import sqlite3
+import time
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session as OrmSession, make_transient_to_detached
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 
 # NOTE: For a real application, you would also initialize Flask-Login here
@@ -61,11 +90,96 @@ UPLOAD_FOLDER = os.path.join(basedir, "static/project_images")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}  # Allowed image file extensions
 
 # Configure database path using absolute path to avoid issues with instance folder
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
-    basedir, "database.db"
+# DATABASE_URL can point scripts and benchmarks at a different database file
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", "sqlite:///" + os.path.join(basedir, "database.db")
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# --- SQLite Engine Profiles ---
+# PRAGMAs applied to every pooled SQLite connection. busy_timeout comes first so
+# that switching the journal mode waits for other connections instead of failing.
+SQLITE_ENGINE_PROFILES = {
+    # WAL lets /gallery and /blogs keep reading while an upload commits
+    "production": {
+        "busy_timeout": 5000,  # milliseconds
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,  # bytes
+        "cache_size": -64 * 1024,  # negative means KiB, so 64 MB
+        "temp_store": "MEMORY",
+    },
+    # SQLite defaults plus a busy timeout, for debugging or network filesystems
+    "development": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+}
+app.config["SQLITE_ENGINE_PROFILE"] = os.environ.get("SQLITE_ENGINE_PROFILE", "production")
+
+# How often commit_with_retry() retries a commit that hit "database is locked"
+app.config["SQLITE_COMMIT_RETRIES"] = 3
+app.config["SQLITE_COMMIT_BACKOFF"] = 0.1  # seconds, doubled after each attempt
+
+# How long an approximate total used for "Page X of Y" may be reused
+app.config["APPROXIMATE_COUNT_TTL"] = 300  # seconds
+
+# How long load_user() may reuse a user loaded by an earlier request. Changes
+# are seen at once by this process, and by other workers sharing the disk page
+# cache store (see load_user()); without that store, role changes and
+# deletions made in another worker take up to this long.
+app.config["USER_CACHE_TTL"] = 60  # seconds
+
+# How long cached_query() results (category and label lists) may be reused.
+# Commits in this process drop them at once; other workers see the change
+# within this time.
+app.config["QUERY_CACHE_TTL"] = 60  # seconds
+
+# Full-page cache for logged-out visitors: comma-separated stores, fastest first
+# ("memory", "disk"); empty disables it. The disk store is shared by all workers.
+app.config["PAGE_CACHE_STORES"] = os.environ.get("PAGE_CACHE_STORES", "memory,disk")
+app.config["PAGE_CACHE_MEMORY_BYTES"] = 32 * 1024 * 1024
+app.config["PAGE_CACHE_DIR"] = os.environ.get("PAGE_CACHE_DIR", os.path.join(basedir, "instance", "page_cache"))
+app.config["PAGE_CACHE_DISK_BYTES"] = 256 * 1024 * 1024
+# Upper bound on entry age, for what commits don't cover (JSON files, manual SQL)
+app.config["PAGE_CACHE_TTL"] = 600  # seconds
+# Admins can send "X-Page-Cache-Bypass: <token>" to render (and re-store) a fresh copy
+app.config["PAGE_CACHE_BYPASS_TOKEN"] = os.environ.get("PAGE_CACHE_BYPASS_TOKEN")
+
+# Responsive copies of gallery and collection photos (see generate_image_variants):
+# widths wider than the original are skipped and the original width is added
+# instead, and every width is written in each format
+app.config["IMAGE_VARIANT_WIDTHS"] = [320, 480, 640, 960, 1280, 1920]
+app.config["IMAGE_VARIANT_FORMATS"] = ["webp", "jpeg"]
+app.config["IMAGE_VARIANT_QUALITY"] = {"webp": 80, "jpeg": 82}
+app.config["IMAGE_VARIANT_FOLDER"] = "variants"  # under static/
+
+# Uploaded photos are resized in a pool of this many worker processes, which
+# is also the most images this process decodes at once. 0 processes them
+# inline in the request (scripts, tests). "spawn" starts clean interpreters;
+# use "fork" under servers where sys.executable isn't Python (e.g. uWSGI).
+app.config["IMAGE_WORKERS"] = int(os.environ.get("IMAGE_WORKERS", 2))
+app.config["IMAGE_WORKER_START_METHOD"] = os.environ.get("IMAGE_WORKER_START_METHOD", "spawn")
+app.config["IMAGE_WORKER_MAX_TASKS"] = 50  # jobs before a worker is replaced
+# Images larger than this are refused instead of decoded (decompression bombs)
+app.config["IMAGE_MAX_PIXELS"] = 60_000_000
+
+# /img/<preset>/<path> serves any photo under a media root fitted into its
+# preset's box, in the preset's format (see resized_image()). Copies are made
+# on first request and kept on disk up to IMAGE_CACHE_BYTES, least recently
+# used evicted first, so a new layout only needs a new preset here.
+app.config["IMAGE_PRESETS"] = {
+    "thumb": {"size": (400, 400), "format": "jpeg"},
+    "thumb-webp": {"size": (400, 400), "format": "webp"},
+    "medium": {"size": (800, 800), "format": "jpeg"},
+    "medium-webp": {"size": (800, 800), "format": "webp"},
+    "large": {"size": (1200, 800), "format": "jpeg"},
+    "large-webp": {"size": (1200, 800), "format": "webp"},
+}
+app.config["IMAGE_CACHE_DIR"] = os.environ.get("IMAGE_CACHE_DIR", os.path.join(basedir, "instance", "image_cache"))
+app.config["IMAGE_CACHE_BYTES"] = 512 * 1024 * 1024
+
 # Secret key for session management and flash messages
 # In production, this should be stored securely (environment variable)
 app.config["SECRET_KEY"] = "your_super_secret_key_change_this_later"
@@ -77,6 +191,115 @@ db = SQLAlchemy(app)
 # Setup migration tool for database schema changes
 migrate = Migrate(app, db)
 
+
+def apply_sqlite_pragmas(dbapi_connection, profile):
+    """
+    Apply a SQLite engine profile to a raw DB-API connection.
+
+    Args:
+        dbapi_connection (sqlite3.Connection): Connection to configure
+        profile (dict): Mapping of PRAGMA name to value
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in profile.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+@event.listens_for(Engine, "connect")
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Apply the configured engine profile whenever the pool opens a SQLite connection.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    profile_name = app.config["SQLITE_ENGINE_PROFILE"]
+    if profile_name not in SQLITE_ENGINE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_ENGINE_PROFILE: {profile_name}")
+    apply_sqlite_pragmas(dbapi_connection, SQLITE_ENGINE_PROFILES[profile_name])
+
+
+def is_database_locked(error):
+    """
+    Check whether an OperationalError was caused by SQLite lock contention.
+
+    Args:
+        error (OperationalError): The error raised by SQLAlchemy
+
+    Returns:
+        bool: True if the database was locked or busy
+    """
+    message = str(error.orig if getattr(error, "orig", None) is not None else error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def transaction_has_written(session):
+    """
+    Whether the session's transaction already sent writes to SQLite (a flush,
+    or SQL run with session.execute() or its connection). The sqlite3 driver
+    only opens a transaction for its first INSERT, UPDATE or DELETE.
+    """
+    return session.connection().connection.driver_connection.in_transaction
+
+
+def commit_with_retry(work=None, session=None):
+    """
+    Commit a session, retrying a bounded number of times if SQLite is locked.
+
+    A failed commit rolls the transaction back, which discards everything it
+    wrote. Given ``work``, the function that makes the transaction's changes,
+    each retry calls it again from the start, so SQL statements and early
+    flushes are redone too. Without it, the new, modified and deleted objects
+    are captured before the first attempt and replayed onto the session
+    before each retry; that can't redo anything already written, so if the
+    transaction has written (see transaction_has_written()) the error is
+    re-raised instead.
+
+    Args:
+        work (callable): Makes the changes to commit, called before each attempt
+        session: SQLAlchemy session to commit (defaults to db.session)
+
+    Returns:
+        What ``work`` returned
+    """
+    session = session or db.session
+    retries = app.config["SQLITE_COMMIT_RETRIES"]
+    delay = app.config["SQLITE_COMMIT_BACKOFF"]
+
+    replayable = work is not None or not transaction_has_written(session)
+    new_objects = list(session.new)
+    deleted_objects = list(session.deleted)
+    changed_values = []
+    for obj in session.dirty:
+        for attr in sa_inspect(obj).attrs:
+            if attr.history.has_changes():
+                value = attr.value
+                if isinstance(value, list):
+                    value = list(value)
+                changed_values.append((obj, attr.key, value))
+
+    for attempt in range(retries + 1):
+        try:
+            result = work() if work is not None else None
+            session.commit()
+            return result
+        except OperationalError as e:
+            session.rollback()
+            if attempt == retries or not replayable or not is_database_locked(e):
+                raise
+            app.logger.warning(
+                "Database locked on commit, retrying (%d/%d)", attempt + 1, retries
+            )
+            time.sleep(delay)
+            delay *= 2
+            if work is not None:
+                continue
+            session.add_all(new_objects)
+            for obj, key, value in changed_values:
+                setattr(obj, key, value)
+            for obj in deleted_objects:
+                session.delete(obj)
+
 # Initialize Flask-Login for user session management
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -85,18 +308,56 @@ login_manager.login_message = "Please log in to access this page."
 login_manager.login_message_category = "info"
 
 
+# user id -> (detached User snapshot, time loaded, its version in the shared
+# page cache store), shared by this process's requests
+_user_cache = {}
+USER_CACHE_MAX = 1000
+
+
+def user_version_key(user_id):
+    """Page cache store version bumped by every change to one user (see _forget_cached_user())."""
+    return f"user-{user_id}"
+
+
 @login_manager.user_loader
 def load_user(user_id):
     """
     Callback function for Flask-Login to reload a user object from the user ID stored in the session.
 
+    Users are kept for USER_CACHE_TTL seconds as detached snapshots and merged
+    into the request's session, so a hit doesn't touch the database. A hit is
+    checked against the user's version in the shared page cache store, which
+    the commit of every change to the user bumps, so with the disk store a
+    role change or deletion made in any worker is seen by all of them on the
+    user's next request.
+
     Args:
         user_id (str): The user ID as a string
 
     Returns:
         User: The user object if found, None otherwise
     """
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    now = time.time()
+    key = user_version_key(user_id)
+    version = page_cache_stores[-1].get_versions([key])[key] if page_cache_stores else None
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        snapshot, loaded_at, loaded_version = cached
+        if now - loaded_at < app.config["USER_CACHE_TTL"] and loaded_version == version:
+            return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        _user_cache.pop(user_id, None)
+        return None
+    if len(_user_cache) >= USER_CACHE_MAX:
+        _user_cache.clear()
+    # A separate detached copy, so later changes to ``user`` in this request don't leak into the cache
+    snapshot = User(**{attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs})
+    make_transient_to_detached(snapshot)
+    _user_cache[user_id] = (snapshot, now, version)
+    return user
 
 
 # --- Database Models ---
@@ -164,6 +425,17 @@ class User(UserMixin, db.Model):
         return self.role in ["admin", "member"]
 
 
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_cached_user(mapper, connection, target):
+    # Covers update_user_role, delete_user and profile/password changes
+    _user_cache.pop(target.id, None)
+    # Other workers notice when the commit bumps the user's version (see
+    # _invalidate_cached_pages and load_user)
+    session = sa_inspect(target).session
+    session.info.setdefault("page_cache_tables", set()).add(user_version_key(target.id))
+
+
 class Comment(db.Model):
     """
     Comment model for blog posts.
@@ -172,7 +444,7 @@ class Comment(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
     
     user = db.relationship('User', backref=db.backref('comments', lazy=True))
 
@@ -181,6 +453,9 @@ class Like(db.Model):
     """
     Like model for blog posts.
     """
+    # Serves both the like toggle lookup and loading a post's likes
+    __table_args__ = (db.Index('ix_like_post_id_user_id', 'post_id', 'user_id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
@@ -196,7 +471,7 @@ class PhotoComment(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False, index=True)
     
     user = db.relationship('User', backref=db.backref('photo_comments', lazy=True))
 
@@ -205,6 +480,8 @@ class PhotoLike(db.Model):
     """
     PhotoLike model for photo gallery likes.
     """
+    __table_args__ = (db.Index('ix_photo_like_photo_id_user_id', 'photo_id', 'user_id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
@@ -250,7 +527,9 @@ class Project(db.Model):
 
 post_labels = db.Table('post_labels',
     db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
-    db.Column('label_id', db.Integer, db.ForeignKey('label.id'), primary_key=True)
+    db.Column('label_id', db.Integer, db.ForeignKey('label.id'), primary_key=True),
+    # The primary key covers post -> labels; this covers label -> posts
+    db.Index('ix_post_labels_label_id', 'label_id')
 )
 
 class Label(db.Model):
@@ -273,14 +552,25 @@ class Post(db.Model):
         title (str): Post title
         content (str): Main content of the post
         created_at (datetime): Timestamp when post was created
+        like_count (int): Number of likes, maintained alongside Like rows
+        comment_count (int): Number of comments, maintained alongside Comment rows
+        excerpt (str): Start of the plain text, for listings and meta descriptions
+        plain_text_length (int): Length of the plain text in characters
+        reading_minutes (int): Estimated reading time
     """
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     media_filename = db.Column(db.String(255))
     media_type = db.Column(db.String(50))  # 'image', 'video', 'audio'
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Derived from content whenever it is assigned (see _post_content_set)
+    excerpt = db.Column(db.String(300))
+    plain_text_length = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    reading_minutes = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('Like', backref='post', lazy=True, cascade="all, delete-orphan")
@@ -297,11 +587,30 @@ class Photo(db.Model):
         id (int): Primary key
         title (str): Photo title
         description (str): Optional description of the photo
-        filename (str): Name of the image file
+        filename (str): Name of the image file, "<sha256>.<ext>" in the blob store
         created_at (datetime): Timestamp when photo was uploaded
-        month (str): Month identifier (e.g., "nov23", "oct23")
-        year (int): Year the photo was taken/uploaded
-    """
+        taken_at (datetime): When the photo was taken, from its EXIF (camera
+            local time), or the upload time if it has none; the gallery order
+        month (str): Month identifier of taken_at (e.g., "nov23", "oct23")
+        year (int): Year of taken_at
+        like_count (int): Number of likes, maintained alongside PhotoLike rows
+        comment_count (int): Number of comments, maintained alongside PhotoComment rows
+        status (str): "processing" while the upload is resized in the background,
+            then "ready" or "failed"
+        thumb_width, thumb_height (int): Size of the grid thumbnail, None until written
+        sha256 (str): Key of its MediaBlob, or None for a file still in the
+            model's own folder (see media_path())
+        width, height (int): Size of the image the gallery serves, upright;
+            None until it has been processed
+        orientation (int): EXIF orientation of the upload (1-8), already
+            applied to the stored image and its derivatives
+        placeholder (str): data: URI of a tiny preview shown while the image
+            loads (see render_placeholder()), None until it has been processed
+    """
+
+    # Matches the gallery ordering (taken_at DESC, id DESC), its year ranges
+    # and the year facets
+    __table_args__ = (db.Index('ix_photo_taken_at', 'taken_at', 'id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -310,6 +619,17 @@ class Photo(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     month = db.Column(db.String(20))  # e.g., "nov23", "oct23"
     year = db.Column(db.Integer, default=datetime.now().year)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    status = db.Column(db.String(20), nullable=False, default="ready", server_default="ready")
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    orientation = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
     
     comments = db.relationship('PhotoComment', backref='photo', lazy=True, cascade="all, delete-orphan")
     likes = db.relationship('PhotoLike', backref='photo', lazy=True, cascade="all, delete-orphan")
@@ -334,7 +654,7 @@ class GuitarVideo(db.Model):
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
     thumbnail = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
 class GuitarPhoto(db.Model):
@@ -345,15 +665,27 @@ class GuitarPhoto(db.Model):
         id (int): Primary key
         title (str): Photo title
         description (str): Optional description
-        filename (str): Name of the image file
+        filename (str): Name of the image file, "<sha256>.<ext>" in the blob store
         created_at (datetime): Timestamp when photo was uploaded
+        thumb_width, thumb_height (int): Size of the grid thumbnail, None until written
+        sha256 (str): Key of its MediaBlob, or None for a file still in the
+            model's own folder (see media_path())
+        width, height (int): Upright size of the image, None until processed
+        placeholder (str): data: URI of a tiny preview shown while the image
+            loads (see render_placeholder()), None until processed
     """
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
 
 
 class CollectionVideo(db.Model):
@@ -376,13 +708,19 @@ class CollectionVideo(db.Model):
     filename = db.Column(db.String(255), nullable=False)
     thumbnail = db.Column(db.String(255))
     category = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
 class Book(db.Model):
     """
     Book model representing downloadable books in the Library.
     """
+    # Readers filter on is_public, members and admins see the whole category
+    __table_args__ = (
+        db.Index('ix_book_category_is_public_upload_date', 'category', 'is_public', 'upload_date'),
+        db.Index('ix_book_category_upload_date', 'category', 'upload_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     author = db.Column(db.String(100))
@@ -392,6 +730,7 @@ class Book(db.Model):
     description = db.Column(db.Text)
     is_public = db.Column(db.Boolean, default=True)  # Whether the book is visible to public/readers
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
+    file_size = db.Column(db.Integer)  # Bytes on disk, set on insert; None if the file was missing
     
     
     def __repr__(self):
@@ -402,6 +741,8 @@ class CategoryIcon(db.Model):
     """
     CategoryIcon model representing library categories with custom icons.
     """
+    __table_args__ = (db.Index('ix_category_icon_display_order_name', 'display_order', 'name'),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     icon = db.Column(db.String(10), default='📚')  # Emoji or icon character
@@ -421,15 +762,27 @@ class BookPhoto(db.Model):
         id (int): Primary key
         title (str): Book title or photo title
         description (str): Optional description
-        filename (str): Name of the image file
+        filename (str): Name of the image file, "<sha256>.<ext>" in the blob store
         created_at (datetime): Timestamp when photo was uploaded
+        thumb_width, thumb_height (int): Size of the grid thumbnail, None until written
+        sha256 (str): Key of its MediaBlob, or None for a file still in the
+            model's own folder (see media_path())
+        width, height (int): Upright size of the image, None until processed
+        placeholder (str): data: URI of a tiny preview shown while the image
+            loads (see render_placeholder()), None until processed
     """
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
 
 
 class ExercisePhoto(db.Model):
@@ -438,7 +791,13 @@ class ExercisePhoto(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
 
 
 class ReadingQuotePhoto(db.Model):
@@ -447,7 +806,13 @@ class ReadingQuotePhoto(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
 
 
 class IntellectualPhoto(db.Model):
@@ -456,7 +821,13 @@ class IntellectualPhoto(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
 
 
 class FragmentedQuotePhoto(db.Model):
@@ -465,7 +836,86 @@ class FragmentedQuotePhoto(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     filename = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    thumb_width = db.Column(db.Integer)  # grid thumbnail size, set once it is written
+    thumb_height = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64), db.ForeignKey("media_blob.sha256"), index=True)
+    width = db.Column(db.Integer)  # upright size of the image, set once it is processed
+    height = db.Column(db.Integer)
+    placeholder = db.Column(db.String(1024))  # data: URI of a tiny preview
+
+
+class ImageVariant(db.Model):
+    """
+    One resized copy of a gallery or collection photo, for srcset.
+
+    Attributes:
+        id (int): Primary key
+        source (str): Path of the original under static/, e.g. "book_photos/cover.jpg"
+        format (str): "webp" or "jpeg"
+        width (int): Width of the copy in pixels
+        height (int): Height of the copy in pixels
+        filename (str): Path of the copy under static/
+        size (int): Bytes on disk
+    """
+    # The unique index also serves the per-page lookup by source
+    __table_args__ = (db.UniqueConstraint('source', 'format', 'width', name='uq_image_variant_source_format_width'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(300), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(300), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+
+
+class ImageManifest(db.Model):
+    """
+    What the derivatives of a gallery or collection photo (its thumbnail and
+    responsive copies) were last built from, so scripts/rebuild_derivatives.py
+    only rebuilds the stale ones.
+
+    Attributes:
+        source (str): Path of the original under static/
+        sha256 (str): Hex digest of the original at build time
+        mtime (float): Its modification time then
+        size (int): Its size in bytes then
+        version (str): derivative_version() of the settings used
+        built_at (datetime): When the derivatives were written
+    """
+    source = db.Column(db.String(300), primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    mtime = db.Column(db.Float, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.String(16), nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class MediaBlob(db.Model):
+    """
+    A photo file in the content-addressed store, kept once however many
+    gallery and collection rows show it (see store_blob()).
+
+    Attributes:
+        sha256 (str): Hex digest of the bytes as uploaded, also the file name
+        extension (str): "jpg", "png", "gif" or "webp", from the image format
+        size (int): Bytes uploaded
+        ref_count (int): Rows referencing it, maintained by mapper events
+        created_at (datetime): When the bytes were first stored
+    """
+    __tablename__ = 'media_blob'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @property
+    def filename(self):
+        """What the rows referencing it store as their filename."""
+        return f"{self.sha256}.{self.extension}"
 
 
 class LabProject(db.Model):
@@ -477,167 +927,2697 @@ class LabProject(db.Model):
     description = db.Column(db.Text, nullable=False)
     github_url = db.Column(db.String(200))
     image_filename = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
-# --- Authentication Routes ---
+class CollectionStats(db.Model):
+    """
+    Materialized summary of one collection for the /collections landing page.
 
+    Rows are kept up to date by mapper events on the collection models (see
+    COLLECTION_DEFINITIONS) and can be rebuilt with rebuild_collection_stats().
 
-@app.route("/register", methods=["GET", "POST"])
-def register():
+    Attributes:
+        key (str): Collection key from COLLECTION_DEFINITIONS
+        last_update (datetime): created_at of the newest item in the collection
+        item_count (int): Number of items across the collection's models
+        cover_filename (str): Static path of the newest photo, if any
     """
-    Handle user registration.
+    __tablename__ = 'collection_stats'
 
-    GET: Display registration form
-    POST: Process registration form and create new user
+    key = db.Column(db.String(50), primary_key=True)
+    last_update = db.Column(db.DateTime, index=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    cover_filename = db.Column(db.String(255))
 
-    Returns:
-        Rendered template or redirect response
+
+class DataVersion(db.Model):
     """
-    if current_user.is_authenticated:
-        return redirect(url_for("index"))
+    Change counter per table, used to build HTTP validators (ETag/Last-Modified).
 
-    if request.method == "POST":
-        username = request.form.get("username")
-        password = request.form.get("password")
-        confirm_password = request.form.get("confirm_password")
+    A row is bumped by an after_flush hook in the same transaction as the change
+    it records, so every worker sees the new version as soon as it commits.
 
-        # Validation
-        if not username or not password:
-            flash("Username and password are required!", "error")
-            return render_template("auth/register.html")
+    Attributes:
+        name (str): Table name
+        version (int): Incremented on every flush that touches the table
+        updated_at (datetime): Time of the last change
+    """
+    __tablename__ = 'data_version'
 
-        if password != confirm_password:
-            flash("Passwords do not match!", "error")
-            return render_template("auth/register.html")
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    updated_at = db.Column(db.DateTime)
 
-        if User.query.filter_by(username=username).first():
-            flash("Username already exists!", "error")
-            return render_template("auth/register.html")
 
-        # Create new user with username as email (for compatibility)
-        new_user = User(username=username, email=f"{username}@example.com", role="reader")
-        new_user.set_password(password)
+# --- Interaction Counters ---
+# like_count/comment_count on Post and Photo are kept in step with the child rows
+# by mapper events, so the UPDATE runs in the same transaction as the INSERT/DELETE.
 
-        db.session.add(new_user)
-        db.session.commit()
+# (child model, parent model, foreign key attribute, counter attribute)
+INTERACTION_COUNTERS = [
+    (Like, Post, "post_id", "like_count"),
+    (Comment, Post, "post_id", "comment_count"),
+    (PhotoLike, Photo, "photo_id", "like_count"),
+    (PhotoComment, Photo, "photo_id", "comment_count"),
+]
 
-        flash("Registration successful! Please log in.", "success")
-        return redirect(url_for("login"))
 
-    return render_template("auth/register.html")
+def _register_counter_events(child, parent, fk_name, counter_name):
+    counter = getattr(parent, counter_name)
 
+    def adjust(connection, target, delta):
+        connection.execute(
+            db.update(parent)
+            .where(parent.id == getattr(target, fk_name))
+            .values({counter: counter + delta})
+        )
 
-@app.route("/login", methods=["GET", "POST"])
-def login():
+    event.listen(child, "after_insert", lambda mapper, connection, target: adjust(connection, target, 1))
+    event.listen(child, "after_delete", lambda mapper, connection, target: adjust(connection, target, -1))
+
+
+for _counter in INTERACTION_COUNTERS:
+    _register_counter_events(*_counter)
+
+
+def check_interaction_counters(repair=False):
     """
-    Handle user login.
+    Compare the stored like/comment counters with the child tables.
 
-    GET: Display login form
-    POST: Authenticate user credentials and establish session
+    Args:
+        repair (bool): Recompute every counter from the child tables
 
     Returns:
-        Rendered template or redirect response
+        list: (model name, id, counter, stored, actual) for each mismatch found
+    """
+    def check():
+        mismatches = []
+        for child, parent, fk_name, counter_name in INTERACTION_COUNTERS:
+            counter = getattr(parent, counter_name)
+            actual = (
+                db.select(db.func.count(child.id))
+                .where(getattr(child, fk_name) == parent.id)
+                .scalar_subquery()
+            )
+            rows = db.session.execute(
+                db.select(parent.id, counter, actual).where(counter != actual)
+            ).all()
+            mismatches.extend(
+                (parent.__name__, row[0], counter_name, row[1], row[2]) for row in rows
+            )
+            if repair and rows:
+                db.session.execute(db.update(parent).values({counter: actual}))
+        return mismatches
+
+    return commit_with_retry(check) if repair else check()
+
+
+# --- Keyset Pagination ---
+
+_approximate_counts = {}
+APPROXIMATE_COUNT_MAX = 1000
+
+
+def approximate_count(query, cache_key):
     """
-    if current_user.is_authenticated:
-        return redirect(url_for("index"))
+    Count the rows of a query, reusing the result for APPROXIMATE_COUNT_TTL seconds.
 
-    if request.method == "POST":
-        username = request.form.get("username")
-        password = request.form.get("password")
-        remember = bool(request.form.get("remember"))
+    Args:
+        query: Query to count
+        cache_key: Hashable key identifying the query (e.g. table name and
+            filters), built from parsed values rather than raw query strings
 
-        user = User.query.filter_by(username=username).first()
+    Returns:
+        int: The (possibly slightly stale) row count
+    """
+    now = time.time()
+    cached = _approximate_counts.get(cache_key)
+    if cached and now - cached[1] < app.config["APPROXIMATE_COUNT_TTL"]:
+        return cached[0]
+    total = query.order_by(None).count()
+    if len(_approximate_counts) >= APPROXIMATE_COUNT_MAX:
+        ttl = app.config["APPROXIMATE_COUNT_TTL"]
+        for key in [key for key, (_, counted_at) in _approximate_counts.items() if now - counted_at >= ttl]:
+            del _approximate_counts[key]
+        if len(_approximate_counts) >= APPROXIMATE_COUNT_MAX:
+            _approximate_counts.clear()
+    _approximate_counts[cache_key] = (total, now)
+    return total
 
-        if user and user.check_password(password):
-            login_user(user, remember=remember)
-            next_page = request.args.get("next")
-            flash(f"Welcome back, {user.username}!", "success")
-            return redirect(next_page) if next_page else redirect(url_for("index"))
+
+class KeysetPagination:
+    """
+    Cursor-based pagination for a query sorted descending by its key columns.
+
+    Each page continues from the sort key of the previous page's last row
+    (?after=) or next page's first row (?before=) instead of using OFFSET, so a
+    page costs one index range scan however deep the visitor goes. It exposes the
+    same attributes the templates use from Flask-SQLAlchemy's Pagination.
+
+    Args:
+        query: Filtered query without ORDER BY
+        key_columns (list): Sort columns, most significant first; together unique
+        per_page (int): Number of items per page
+        count_key: Cache key for an approximate total; if given, ``pages`` is
+            computed from it, otherwise ``pages`` only tells whether a next page exists
+    """
+
+    def __init__(self, query, key_columns, per_page=20, count_key=None):
+        self._key_columns = key_columns
+        self.per_page = per_page
+        self.page = max(request.args.get("page", 1, type=int), 1)
+        self.total = approximate_count(query, count_key) if count_key is not None else None
+
+        after = self._decode(request.args.get("after"))
+        before = self._decode(request.args.get("before"))
+        key = db.tuple_(*key_columns)
+
+        if before is not None:
+            rows = (
+                query.filter(key > before)
+                .order_by(*[column.asc() for column in key_columns])
+                .limit(per_page + 1)
+                .all()
+            )
+            self.has_prev = len(rows) > per_page
+            self.has_next = True
+            self.items = rows[:per_page][::-1]
         else:
-            flash("Invalid username or password!", "error")
+            query = query.order_by(*[column.desc() for column in key_columns])
+            if after is not None:
+                query = query.filter(key < after)
+            elif self.page > 1:
+                # Plain ?page=N links (bookmarks, crawlers) still work via OFFSET
+                query = query.offset((self.page - 1) * per_page)
+            rows = query.limit(per_page + 1).all()
+            self.has_next = len(rows) > per_page
+            self.has_prev = after is not None or self.page > 1
+            self.items = rows[:per_page]
+
+        if not self.has_prev:
+            self.page = 1
+        self.prev_num = self.page - 1 if self.has_prev else None
+        self.next_num = self.page + 1 if self.has_next else None
+
+        self.prev_args = {}
+        self.next_args = {}
+        if self.has_prev and self.items:
+            self.prev_args = self._cursor_args("before", self.items[0], self.prev_num)
+        if self.has_next:
+            self.next_args = self._cursor_args("after", self.items[-1], self.next_num)
+
+        self.pages = self.next_num or self.page
+        if self.total is not None:
+            self.pages = max(math.ceil(self.total / per_page), self.pages)
+
+    def _cursor_args(self, direction, item, page):
+        """Build the url_for() arguments that fetch the page next to ``item``."""
+        if direction == "before" and page == 1:
+            return {}
+        values = [getattr(item, column.key) for column in self._key_columns]
+        return {direction: self._encode(values), "page": page}
+
+    @staticmethod
+    def _encode(values):
+        data = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def _decode(self, cursor):
+        """Turn a cursor back into typed key values, or None if absent or malformed."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            data = json.loads(raw)
+            if len(data) != len(self._key_columns):
+                return None
+            values = []
+            for column, value in zip(self._key_columns, data):
+                if column.type.python_type is datetime:
+                    value = datetime.fromisoformat(value)
+                values.append(value)
+            return tuple(values)
+        except (ValueError, TypeError):
+            return None
+
+
+# --- Full-Text Search ---
+# post_fts and book_fts are FTS5 tables whose rowid is the post/book id. They use
+# the trigram tokenizer because most titles are Chinese, which unicode61 cannot
+# split into words; trigrams match any substring of three or more characters.
+# Shorter terms (most Chinese words have two characters) are looked up in
+# post_grams and book_grams instead, which index every one- and two-character
+# substring of the words of a row as one hex-encoded token each (see
+# short_grams()).
+
+POST_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+    "USING fts5(title, body, tokenize='trigram')"
+)
+BOOK_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts "
+    "USING fts5(title, author, category, tokenize='trigram')"
+)
+# detail='none': a gram only needs to say which rows contain it
+POST_GRAMS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_grams "
+    "USING fts5(grams, tokenize='ascii', detail='none')"
+)
+BOOK_GRAMS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS book_grams "
+    "USING fts5(grams, tokenize='ascii', detail='none')"
+)
 
-    return render_template("auth/login.html")
+post_fts = db.Table(
+    "post_fts",
+    db.MetaData(),  # kept out of db.metadata so create_all() doesn't build it as a plain table
+    db.Column("rowid", db.Integer, primary_key=True),
+    db.Column("title", db.Text),
+    db.Column("body", db.Text),
+)
+
+book_fts = db.Table(
+    "book_fts",
+    db.MetaData(),
+    db.Column("rowid", db.Integer, primary_key=True),
+    db.Column("title", db.Text),
+    db.Column("author", db.Text),
+    db.Column("category", db.Text),
+)
 
+post_grams = db.Table(
+    "post_grams",
+    db.MetaData(),
+    db.Column("rowid", db.Integer, primary_key=True),
+    db.Column("grams", db.Text),
+)
 
-@app.route("/logout")
-@login_required
-def logout():
+book_grams = db.Table(
+    "book_grams",
+    db.MetaData(),
+    db.Column("rowid", db.Integer, primary_key=True),
+    db.Column("grams", db.Text),
+)
+
+# Markers snippet()/highlight() wrap matches in, swapped for <mark> after escaping
+_MATCH_START, _MATCH_END = "\x02", "\x03"
+
+_search_tables_ready = False
+
+
+def html_to_text(html):
     """
-    Log out the current user and end their session.
+    Strip HTML tags from post content and collapse whitespace.
+
+    Args:
+        html (str): Post content as stored (HTML from the editor or importers)
 
     Returns:
-        Redirect to homepage with success message
+        str: Plain text
     """
-    logout_user()
-    flash("You have been logged out.", "info")
-    return redirect(url_for("index"))
+    text = BeautifulSoup(html or "", "html.parser").get_text(" ")
+    return " ".join(text.split())
 
 
-@app.route("/profile", methods=["GET", "POST"])
-@login_required
-def profile():
+def gram_token(gram):
+    """The token a short search term or gram is indexed as: its lowercased UTF-8 bytes in hex."""
+    return gram.lower().encode("utf-8").hex()
+
+
+def short_grams(*texts):
     """
-    User profile page for managing account settings.
-    
-    GET: Display profile information
-    POST: Update password or other settings
-    
-    Returns:
-        Rendered template or redirect response
+    Every one- and two-character substring of the words in ``texts``, as the
+    space-separated tokens post_grams and book_grams index. A term without whitespace
+    shorter than three characters occurs in the texts exactly if its
+    gram_token() is among them.
     """
-    if request.method == "POST":
-        action = request.form.get("action")
-        
-        if action == "change_password":
-            current_password = request.form.get("current_password")
-            new_password = request.form.get("new_password")
-            confirm_password = request.form.get("confirm_password")
-            
-            # Validation
-            if not current_password or not new_password or not confirm_password:
-                flash("All password fields are required!", "error")
-                return render_template("profile.html")
-            
-            if not current_user.check_password(current_password):
-                flash("Current password is incorrect!", "error")
-                return render_template("profile.html")
-            
-            if new_password != confirm_password:
-                flash("New passwords do not match!", "error")
-                return render_template("profile.html")
-            
-            if len(new_password) < 6:
-                flash("Password must be at least 6 characters long!", "error")
-                return render_template("profile.html")
-            
-            # Update password
-            current_user.set_password(new_password)
-            db.session.commit()
-            flash("Password changed successfully!", "success")
-            return redirect(url_for("profile"))
-    
-    return render_template("profile.html")
+    grams = set()
+    for text in texts:
+        for word in (text or "").lower().split():
+            grams.update(word)
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(sorted(gram_token(gram) for gram in grams))
 
 
-# --- Decorators ---
+def ensure_search_tables(connection):
+    """
+    Create the FTS5 tables if they don't exist yet (e.g. after db.create_all()).
+    """
+    global _search_tables_ready
+    if not _search_tables_ready:
+        connection.exec_driver_sql(POST_FTS_DDL)
+        connection.exec_driver_sql(BOOK_FTS_DDL)
+        connection.exec_driver_sql(POST_GRAMS_DDL)
+        connection.exec_driver_sql(BOOK_GRAMS_DDL)
+        _search_tables_ready = True
+
+
+def _index_post(connection, post_id, title, content):
+    ensure_search_tables(connection)
+    body = html_to_text(content)
+    connection.execute(post_fts.delete().where(post_fts.c.rowid == post_id))
+    connection.execute(post_fts.insert().values(rowid=post_id, title=title, body=body))
+    connection.execute(post_grams.delete().where(post_grams.c.rowid == post_id))
+    connection.execute(post_grams.insert().values(rowid=post_id, grams=short_grams(title, body)))
+
+
+@event.listens_for(Post, "after_insert")
+def _post_inserted(mapper, connection, target):
+    _index_post(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, "after_update")
+def _post_updated(mapper, connection, target):
+    state = sa_inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        _index_post(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, "after_delete")
+def _post_deleted(mapper, connection, target):
+    ensure_search_tables(connection)
+    connection.execute(post_fts.delete().where(post_fts.c.rowid == target.id))
+    connection.execute(post_grams.delete().where(post_grams.c.rowid == target.id))
+
+
+def rebuild_post_search_index(batch_size=500):
+    """
+    Rebuild post_fts and post_grams from the post table.
+
+    Args:
+        batch_size (int): Number of posts to strip and insert at a time
+
+    Returns:
+        int: Number of posts indexed
+    """
+    def rebuild():
+        connection = db.session.connection()
+        ensure_search_tables(connection)
+        connection.execute(post_fts.delete())
+        connection.execute(post_grams.delete())
+        indexed = 0
+        rows = db.session.execute(
+            db.select(Post.id, Post.title, Post.content).execution_options(yield_per=batch_size)
+        )
+        for batch in rows.partitions():
+            bodies = [(row, html_to_text(row.content)) for row in batch]
+            connection.execute(post_fts.insert(), [
+                {"rowid": row.id, "title": row.title, "body": body} for row, body in bodies
+            ])
+            connection.execute(post_grams.insert(), [
+                {"rowid": row.id, "grams": short_grams(row.title, body)} for row, body in bodies
+            ])
+            indexed += len(batch)
+        connection.exec_driver_sql("INSERT INTO post_fts(post_fts) VALUES ('optimize')")
+        connection.exec_driver_sql("INSERT INTO post_grams(post_grams) VALUES ('optimize')")
+        return indexed
+
+    return commit_with_retry(rebuild)
+
+
+def _index_book(connection, book):
+    ensure_search_tables(connection)
+    connection.execute(book_fts.delete().where(book_fts.c.rowid == book.id))
+    connection.execute(book_fts.insert().values(
+        rowid=book.id, title=book.title, author=book.author or "", category=book.category
+    ))
+    connection.execute(book_grams.delete().where(book_grams.c.rowid == book.id))
+    connection.execute(book_grams.insert().values(
+        rowid=book.id, grams=short_grams(book.title, book.author, book.category)
+    ))
+
+
+@event.listens_for(Book, "after_insert")
+def _book_inserted(mapper, connection, target):
+    _index_book(connection, target)
+
+
+@event.listens_for(Book, "after_update")
+def _book_updated(mapper, connection, target):
+    state = sa_inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ("title", "author", "category")):
+        _index_book(connection, target)
+
+
+@event.listens_for(Book, "after_delete")
+def _book_deleted(mapper, connection, target):
+    ensure_search_tables(connection)
+    connection.execute(book_fts.delete().where(book_fts.c.rowid == target.id))
+    connection.execute(book_grams.delete().where(book_grams.c.rowid == target.id))
+
+
+def book_file_size(book):
+    """
+    Size of a book's file in the static folder.
+
+    Returns:
+        int: Bytes on disk, or None if the file doesn't exist
+    """
+    try:
+        return os.path.getsize(os.path.join(app.static_folder, book.file_path))
+    except OSError:
+        return None
+
+
+@event.listens_for(Book, "before_insert")
+def _set_book_file_size(mapper, connection, target):
+    # Covers upload_book() and scripts/import_books.py, which save the file first
+    if target.file_size is None:
+        target.file_size = book_file_size(target)
+
+
+def backfill_book_sizes():
+    """
+    Re-read the size of every book's file, e.g. after files were replaced on disk.
+
+    Returns:
+        int: Number of books whose size changed
+    """
+    updated = 0
+    for book in Book.query.all():
+        size = book_file_size(book)
+        if size != book.file_size:
+            book.file_size = size
+            updated += 1
+    commit_with_retry()
+    return updated
+
+
+def rebuild_book_search_index():
+    """
+    Rebuild book_fts and book_grams from the book table.
+
+    Returns:
+        int: Number of books indexed
+    """
+    def rebuild():
+        connection = db.session.connection()
+        ensure_search_tables(connection)
+        connection.execute(book_fts.delete())
+        connection.execute(book_fts.insert().from_select(
+            ["rowid", "title", "author", "category"],
+            db.select(Book.id, Book.title, db.func.coalesce(Book.author, ""), Book.category),
+        ))
+        connection.exec_driver_sql("INSERT INTO book_fts(book_fts) VALUES ('optimize')")
+        connection.execute(book_grams.delete())
+        books = db.session.execute(db.select(Book.id, Book.title, Book.author, Book.category)).all()
+        if books:
+            connection.execute(book_grams.insert(), [
+                {"rowid": book.id, "grams": short_grams(book.title, book.author, book.category)}
+                for book in books
+            ])
+        connection.exec_driver_sql("INSERT INTO book_grams(book_grams) VALUES ('optimize')")
+
+    commit_with_retry(rebuild)
+    return db.session.scalar(db.select(db.func.count()).select_from(Book))
+
+
+def _highlight_terms(text, terms):
+    """Wrap case-insensitive occurrences of ``terms`` in match markers."""
+    for term in terms:
+        start = text.lower().find(term.lower())
+        while start != -1:
+            end = start + len(term)
+            text = text[:start] + _MATCH_START + text[start:end] + _MATCH_END + text[end:]
+            start = text.lower().find(term.lower(), end + 2)
+    return text
+
+
+def _marked_up(text):
+    """Escape a snippet and turn the match markers into <mark> tags."""
+    return Markup(str(escape(text)).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>"))
+
+
+def _split_terms(query_text):
+    """Split a query into trigram-searchable terms and shorter ones."""
+    terms = query_text.split()
+    return [t for t in terms if len(t) >= 3], [t for t in terms if len(t) < 3]
+
+
+def _match_expression(terms):
+    """Quote each term as an FTS5 phrase so punctuation isn't parsed as syntax."""
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _gram_matches(grams, terms):
+    """Rowids of a gram table (e.g. post_grams) whose text contains every one of the short ``terms``."""
+    match = db.literal_column(grams.name).op("MATCH")(_match_expression([gram_token(t) for t in terms]))
+    return db.select(grams.c.rowid).where(match)
+
+
+def search_posts(query_text, limit=20, offset=0):
+    """
+    Search posts by title and text, best matches first.
+
+    Terms of three or more characters go through the trigram index (MATCH) and
+    are ranked with bm25, title matches weighted higher. Shorter terms, common in
+    Chinese, can't use trigrams and are looked up in post_grams instead. A query
+    made only of short terms is listed newest first; a very common one (e.g. a
+    single character) still reads the id of every post containing it, though
+    not their text.
+
+    Args:
+        query_text (str): Whitespace-separated search terms (all must match)
+        limit (int): Maximum number of results
+        offset (int): Number of results to skip
+
+    Returns:
+        list: Dictionaries with id, title, created_at and snippet (Markup)
+    """
+    long_terms, short_terms = _split_terms(query_text)
+    if not long_terms and not short_terms:
+        return []
+
+    fts = db.literal_column("post_fts")
+    ranked = db.select(post_fts.c.rowid)
+    if short_terms:
+        ranked = ranked.where(post_fts.c.rowid.in_(_gram_matches(post_grams, short_terms)))
+
+    if long_terms:
+        match = fts.op("MATCH")(_match_expression(long_terms))
+        order = db.func.bm25(fts, 10.0, 1.0)
+        ranked = ranked.where(match)
+        columns = [
+            db.func.highlight(fts, 0, _MATCH_START, _MATCH_END).label("title"),
+            db.func.snippet(fts, 1, _MATCH_START, _MATCH_END, "…", 48).label("snippet"),
+        ]
+    else:
+        # No MATCH, so no snippet(); cut a window around the first term instead
+        match = db.true()
+        order = Post.created_at.desc()
+        ranked = ranked.join(Post, Post.id == post_fts.c.rowid)
+        position = db.func.instr(db.func.lower(post_fts.c.body), short_terms[0].lower())
+        columns = [
+            post_fts.c.title.label("title"),
+            db.func.substr(post_fts.c.body, db.func.max(position - 40, 1), 120).label("snippet"),
+        ]
+    ranked = ranked.order_by(order).limit(limit).offset(offset)
+
+    ensure_search_tables(db.session.connection())
+    ids = db.session.execute(ranked).scalars().all()
+    if not ids:
+        return []
+
+    # snippet() and highlight() are expensive, so rank first and only build
+    # them for the page of results rather than for every matching post
+    statement = (
+        db.select(post_fts.c.rowid.label("id"), Post.created_at, *columns)
+        .select_from(post_fts)
+        .join(Post, Post.id == post_fts.c.rowid)
+        .where(match, post_fts.c.rowid.in_(ids))
+    )
+    rows = sorted(db.session.execute(statement).all(), key=lambda row: ids.index(row.id))
+    return [
+        {
+            "id": row.id,
+            "title": _marked_up(_highlight_terms(row.title, short_terms)),
+            "created_at": row.created_at,
+            "snippet": _marked_up(_highlight_terms(row.snippet or "", short_terms)),
+        }
+        for row in rows
+    ]
+
+
+def search_books(query_text, include_hidden=False, limit=20, offset=0):
+    """
+    Search books by title, author and category, best matches first.
+
+    Works like search_posts(): terms of three or more characters use the
+    trigram index, shorter ones book_grams.
+
+    Args:
+        query_text (str): Whitespace-separated search terms (all must match)
+        include_hidden (bool): Include books that aren't public (members and admins)
+        limit (int): Maximum number of results
+        offset (int): Number of results to skip
+
+    Returns:
+        list: Dictionaries with id, title, author, category and upload_date;
+              title and author are Markup with the matches highlighted
+    """
+    long_terms, short_terms = _split_terms(query_text)
+    if not long_terms and not short_terms:
+        return []
+
+    fts = db.literal_column("book_fts")
+    statement = db.select(Book.id, Book.category, Book.upload_date).join(
+        book_fts, book_fts.c.rowid == Book.id
+    )
+    if not include_hidden:
+        statement = statement.where(Book.is_public.is_(True))
+    if short_terms:
+        statement = statement.where(Book.id.in_(_gram_matches(book_grams, short_terms)))
+
+    if long_terms:
+        statement = statement.add_columns(
+            db.func.highlight(fts, 0, _MATCH_START, _MATCH_END).label("title"),
+            db.func.highlight(fts, 1, _MATCH_START, _MATCH_END).label("author"),
+        ).where(fts.op("MATCH")(_match_expression(long_terms))).order_by(
+            db.func.bm25(fts, 10.0, 5.0, 1.0)
+        )
+    else:
+        statement = statement.add_columns(
+            book_fts.c.title.label("title"),
+            book_fts.c.author.label("author"),
+        ).order_by(Book.upload_date.desc())
+
+    ensure_search_tables(db.session.connection())
+    rows = db.session.execute(statement.limit(limit).offset(offset)).all()
+    return [
+        {
+            "id": row.id,
+            "title": _marked_up(_highlight_terms(row.title, short_terms)),
+            "author": _marked_up(_highlight_terms(row.author or "", short_terms)),
+            "category": row.category,
+            "upload_date": row.upload_date,
+        }
+        for row in rows
+    ]
+
+
+# --- Post Text Summary ---
+# Listings and meta tags show an excerpt and reading time. They are worked out
+# from the HTML once, when content is assigned, so rendering a list never has
+# to load or strip the full post bodies.
+
+EXCERPT_LENGTH = 300
+# Reading speeds: Chinese is read by character, other text by word
+CJK_CHARS_PER_MINUTE = 300
+WORDS_PER_MINUTE = 200
+
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]")
+
+
+def summarize_post_content(html):
+    """
+    Compute the excerpt, length and reading time for post content.
+
+    Args:
+        html (str): Post content as stored
+
+    Returns:
+        dict: excerpt, plain_text_length and reading_minutes
+    """
+    text = html_to_text(html)
+    cjk_chars = len(_CJK_RE.findall(text))
+    words = len(_CJK_RE.sub(" ", text).split())
+    minutes = cjk_chars / CJK_CHARS_PER_MINUTE + words / WORDS_PER_MINUTE
+    return {
+        "excerpt": text[:EXCERPT_LENGTH],
+        "plain_text_length": len(text),
+        "reading_minutes": max(1, round(minutes)),
+    }
+
+
+@event.listens_for(Post.content, "set")
+def _post_content_set(target, value, oldvalue, initiator):
+    # Covers create/edit and the import scripts, which all assign Post.content
+    for name, summary_value in summarize_post_content(value).items():
+        setattr(target, name, summary_value)
+
+
+def backfill_post_summaries(batch_size=200):
+    """
+    Recompute excerpt, plain_text_length and reading_minutes for every post.
+
+    Args:
+        batch_size (int): Number of posts to update per statement
+
+    Returns:
+        int: Number of posts updated
+    """
+    def backfill():
+        updated = 0
+        rows = db.session.execute(
+            db.select(Post.id, Post.content).execution_options(yield_per=batch_size)
+        )
+        connection = db.session.connection()
+        for batch in rows.partitions():
+            connection.execute(
+                db.update(Post.__table__).where(Post.__table__.c.id == db.bindparam("post_id")),
+                [{"post_id": row.id, **summarize_post_content(row.content)} for row in batch],
+            )
+            updated += len(batch)
+        return updated
+
+    return commit_with_retry(backfill)
+
+
+# --- Static Data ---
+# JSON files under static/ that pages read on every request. Each is parsed
+# once per process and re-read only when its mtime changes, so edits made by
+# scripts/populate_quotes.py show up without a restart.
+
+HOME_QUOTES_SAMPLE = 24  # quotes sent to the homepage for the hero and Ideas rotation
+
+
+def _freeze(value):
+    """Recursively turn parsed JSON into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Copy frozen data back into plain dicts and lists (e.g. for tojson)."""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class StaticDataFile:
+    """
+    A JSON file in the static folder, cached and reloaded when it changes.
+
+    Args:
+        filename (str): Path relative to app.static_folder
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._data = MappingProxyType({})
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(app.static_folder, self.filename)
+
+    def get(self):
+        """
+        Return the parsed file contents (read-only).
+
+        If the file is missing or can't be parsed (e.g. half-written), the last
+        good contents are returned and the file is tried again on the next call.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            app.logger.warning("Error loading %s: %s", self.filename, e)
+            return self._data
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            self._data = _freeze(json.load(f))
+                        self._mtime = mtime
+                    except (OSError, ValueError) as e:
+                        app.logger.warning("Error loading %s: %s", self.filename, e)
+        return self._data
+
+    def sample(self, key=None, k=None):
+        """
+        Pick random items from a list in the file.
+
+        Args:
+            key (str): Top-level key of the list; None if the file itself is a list
+            k (int): Number of items; None for all of them in random order
+
+        Returns:
+            list: Plain (mutable) copies of the chosen items
+        """
+        data = self.get()
+        items = data if key is None else data.get(key, ())
+        if not isinstance(items, tuple):  # missing file or not a list
+            items = ()
+        k = len(items) if k is None else min(k, len(items))
+        return [_thaw(item) for item in random.sample(items, k)]
+
+
+rotating_texts = StaticDataFile("rotating_texts.json")
+
+
+# --- Responsive Images ---
+# Gallery and collection photos get a ladder of smaller copies in WebP and
+# JPEG (IMAGE_VARIANT_*), recorded as ImageVariant rows keyed by the original's
+# path under static/. Pages load the rows for their items in one query and
+# render them with the picture() macro in includes/picture.html.
+
+# Folder under static/ holding each photo model's files
+MEDIA_ROOTS = {
+    Photo: "gallery_images",
+    GuitarPhoto: "guitar_photos",
+    BookPhoto: "book_photos",
+    ExercisePhoto: "exercise_photos",
+    ReadingQuotePhoto: "reading_quote_photos",
+    IntellectualPhoto: "intellectual_photos",
+    FragmentedQuotePhoto: "fragmented_quote_photos",
+}
+IMAGE_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+# Box the grid thumbnail (<root>/thumbnails/<filename>) of every photo fits in
+THUMBNAIL_SIZE = (400, 400)
+# Box of the preview a photo's placeholder column holds (a few hundred bytes
+# as WebP), stretched and blurred by the browser while the photo loads
+PLACEHOLDER_SIZE = (16, 16)
+
+
+def media_path(item):
+    """
+    Path of a photo's file under static/: in the blob store, or in its model's
+    folder for files stored before it.
+
+    Args:
+        item: Instance of one of the MEDIA_ROOTS models
+
+    Returns:
+        str: e.g. "media/3f/a2/3fa2...c9.jpg" or "gallery_images/2024/photo.jpg"
+    """
+    return stored_media_path(MEDIA_ROOTS[type(item)], item.filename, item.sha256)
+
+
+def stored_media_path(root, filename, sha256):
+    """media_path() from column values, for queries that select columns rather than rows."""
+    return blob_path(filename) if sha256 else f"{root}/{filename}"
+
+
+def thumbnail_path(source):
+    """Grid thumbnail of a photo: book_photos/a.jpg -> book_photos/thumbnails/a.jpg"""
+    root, rest = source.split("/", 1)
+    return f"{root}/thumbnails/{rest}"
+
+
+def grid_image(item):
+    """
+    What a grid shows for a photo that has no responsive copies yet: its
+    thumbnail once one is recorded, else the original.
+
+    Returns:
+        tuple: (path under static/, (width, height) or None)
+    """
+    if item.thumb_width:
+        return thumbnail_path(media_path(item)), (item.thumb_width, item.thumb_height)
+    return media_path(item), None
+
+
+def image_settings():
+    """
+    The IMAGE_* settings the image functions need, as a plain dict that can be
+    sent to an image worker process.
+    """
+    return {
+        "static_folder": app.static_folder,
+        "widths": list(app.config["IMAGE_VARIANT_WIDTHS"]),
+        "formats": list(app.config["IMAGE_VARIANT_FORMATS"]),
+        "quality": dict(app.config["IMAGE_VARIANT_QUALITY"]),
+        "folder": app.config["IMAGE_VARIANT_FOLDER"],
+        "max_pixels": app.config["IMAGE_MAX_PIXELS"],
+    }
+
+
+def variant_widths(original_width, ladder):
+    """Widths to generate for an image ``original_width`` pixels wide."""
+    widths = [width for width in ladder if width < original_width]
+    largest = min(original_width, max(ladder))
+    if largest not in widths:
+        widths.append(largest)
+    return widths
+
+
+def variant_target(settings):
+    """load_image() target for the variant ladder: its widest width, any height."""
+    return max(settings["widths"]), 1
+
+
+def variant_filename(source, fmt, width, folder):
+    stem = os.path.splitext(source)[0]
+    return f"{folder}/{stem}-{width}.{IMAGE_EXTENSIONS[fmt]}"
+
+
+# How much larger than its target downscale() keeps an image before the final
+# LANCZOS pass: reduce() only shrinks it down to this margin, which leaves
+# LANCZOS enough pixels to antialias from
+REDUCING_GAP = 1.5
+
+
+def fit_size(size, box):
+    """(width, height) of ``size`` scaled down to fit inside ``box``, never up."""
+    width, height = size
+    scale = min(1, box[0] / width, box[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+# EXIF orientations that turn the image a quarter, swapping width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def exif_orientation(image):
+    """EXIF orientation (1-8) of an opened image, 1 if it has none or an invalid one."""
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    return orientation if orientation in range(1, 9) else 1
+
+
+def image_metadata(path):
+    """
+    Read when a photo was taken, its orientation and its upright size from
+    the file header, without decoding it.
+
+    Returns:
+        dict: "taken_at" (DateTimeOriginal, else DateTimeDigitized or
+        DateTime, as a naive datetime in the camera's local time; None if
+        the file records none), "orientation" (1-8) and "size" ((width,
+        height) with the orientation applied)
+    """
+    with Image.open(path) as image:
+        exif = image.getexif()
+        details = exif.get_ifd(ExifTags.IFD.Exif)
+        taken_at = None
+        for value in (details.get(ExifTags.Base.DateTimeOriginal),
+                      details.get(ExifTags.Base.DateTimeDigitized),
+                      exif.get(ExifTags.Base.DateTime)):
+            try:
+                taken_at = datetime.strptime(str(value).strip("\x00 "), EXIF_DATETIME_FORMAT)
+                break
+            except ValueError:
+                continue
+        orientation = exif_orientation(image)
+        size = image.size[::-1] if orientation in TRANSPOSED_ORIENTATIONS else image.size
+    return {"taken_at": taken_at, "orientation": orientation, "size": size}
+
+
+def load_image(path, target=None, max_pixels=None):
+    """
+    Decode an image once for the image pipeline, turned upright by its EXIF
+    orientation and converted to RGB unless it is RGB or greyscale.
+
+    JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale (draft mode) when the
+    result still covers ``target``, which takes a fraction of the time and
+    memory of a full decode. libjpeg scales in the DCT domain, so this is a
+    filtered reduction, not a nearest-pixel one.
+
+    Args:
+        path (str): Image file
+        target (tuple): Largest upright (width, height) the caller will
+            resize to; None decodes at full size
+        max_pixels (int): Refuse larger images, checked from the header
+
+    Returns:
+        tuple: (image, upright (width, height) of the file at full size)
+
+    Raises:
+        ValueError: The image has more than ``max_pixels`` pixels
+    """
+    with Image.open(path) as image:
+        original = image.size
+        if max_pixels and original[0] * original[1] > max_pixels:
+            raise ValueError(f"{original[0]}x{original[1]} image is larger than {max_pixels} pixels")
+        orientation = exif_orientation(image)
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            original = original[::-1]
+            target = target and target[::-1]
+        if target:
+            image.draft(None, target)
+        image.load()
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        return (image if image.mode in ("RGB", "L") else image.convert("RGB")), original
+
+
+def downscale(image, size):
+    """
+    Resize a decoded image to ``size``: reduce() by a whole factor while it
+    stays REDUCING_GAP times larger, then LANCZOS for the rest.
+    """
+    if image.size == size:
+        return image
+    factor = min(int(image.width / size[0] / REDUCING_GAP), int(image.height / size[1] / REDUCING_GAP))
+    if factor > 1:
+        image = image.reduce(factor)
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def render_placeholder(image):
+    """
+    A PLACEHOLDER_SIZE preview of a decoded photo as a base64 WebP data: URI,
+    small enough to store on the row and inline in the page.
+    """
+    image = image if image.mode in ("RGB", "L") else image.convert("RGB")
+    preview = downscale(image, fit_size(image.size, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    preview.save(buffer, "WEBP", quality=50)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def save_image(image, path, fmt, **params):
+    """
+    Write an image file atomically: under a temporary name, then moved into
+    place. Two jobs for the same bytes (e.g. a second upload before the first
+    one's derivatives are recorded) write the same paths, and pages may be
+    reading them.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    image.save(tmp_path, fmt, **params)
+    os.replace(tmp_path, path)
+
+
+def write_thumbnail(image, source, settings):
+    """
+    Write the grid thumbnail (THUMBNAIL_SIZE, JPEG) of a decoded photo.
+
+    Returns:
+        tuple: Its (width, height)
+    """
+    path = os.path.join(settings["static_folder"], thumbnail_path(source))
+    thumbnail = downscale(image, fit_size(image.size, THUMBNAIL_SIZE))
+    save_image(thumbnail, path, "JPEG", quality=80, optimize=True)
+    return thumbnail.size
+
+
+def render_image_variants(image, source, settings):
+    """
+    Write the responsive copies of a decoded image. No database access, so it
+    can run in an image worker; record_image_variants() stores the result.
+
+    Args:
+        image (Image.Image): The original from load_image(), in RGB or L mode,
+            at least as wide as the largest IMAGE_VARIANT_WIDTHS
+        source (str): Path of the original under static/
+        settings (dict): image_settings()
+
+    Returns:
+        list: One dict of ImageVariant column values per file written
+    """
+    variants = []
+    # Largest first, each resized from the original so quality doesn't compound
+    for width in sorted(variant_widths(image.width, settings["widths"]), reverse=True):
+        height = max(1, round(image.height * width / image.width))
+        resized = downscale(image, (width, height))
+        for fmt in settings["formats"]:
+            filename = variant_filename(source, fmt, width, settings["folder"])
+            path = os.path.join(settings["static_folder"], filename)
+            save_image(resized, path, fmt.upper(), quality=settings["quality"][fmt], optimize=True)
+            variants.append({
+                "source": source, "format": fmt, "width": width, "height": height,
+                "filename": filename, "size": os.path.getsize(path),
+            })
+    return variants
+
+
+# Bump when a change to the image code alters its output in a way the
+# IMAGE_VARIANT_* settings don't show, so every derivative is rebuilt
+IMAGE_PIPELINE_VERSION = 2
+
+
+def derivative_version(source, settings):
+    """
+    Short hash of everything that shapes the derivatives of ``source``. An
+    ImageManifest entry with another version is stale.
+    """
+    parts = {
+        "pipeline": IMAGE_PIPELINE_VERSION,
+        "reducing_gap": REDUCING_GAP,
+        "thumbnail": THUMBNAIL_SIZE,
+        **{key: settings[key] for key in ("widths", "formats", "quality", "folder")},
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def source_fingerprint(path):
+    """SHA-256, mtime and size of an original, as ImageManifest stores them."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    stat = os.stat(path)
+    return {"sha256": digest.hexdigest(), "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def record_image_variants(source, variants):
+    """
+    Replace the ImageVariant rows of ``source`` with ``variants``. The caller commits.
+
+    Returns:
+        list: The new ImageVariant rows
+    """
+    for variant in ImageVariant.query.filter_by(source=source).all():
+        db.session.delete(variant)
+    db.session.flush()
+    rows = [ImageVariant(**values) for values in variants]
+    db.session.add_all(rows)
+    return rows
+
+
+def record_image_details(item, result):
+    """Store a derivatives job's thumbnail size, image size and placeholder on a photo row."""
+    item.thumb_width, item.thumb_height = result["thumbnail"]
+    item.width, item.height = result["size"]
+    item.placeholder = result["placeholder"]
+
+
+def record_derivatives(item, result):
+    """
+    Store what build_derivatives() (or process_gallery_image()) wrote for a
+    photo: its thumbnail size, size and placeholder, the ImageVariant rows
+    and the ImageManifest entry. The caller commits.
+
+    Args:
+        item: Instance of one of the MEDIA_ROOTS models
+        result (dict): The job's result
+
+    Returns:
+        list: The new ImageVariant rows
+    """
+    source = media_path(item)
+    record_image_details(item, result)
+    entry = db.session.get(ImageManifest, source) or ImageManifest(source=source)
+    for key, value in result["manifest"].items():
+        setattr(entry, key, value)
+    entry.built_at = datetime.utcnow()
+    db.session.add(entry)
+    return record_image_variants(source, result["variants"])
+
+
+def generate_image_variants(item):
+    """
+    Write the derivatives of a photo (thumbnail and responsive copies) and
+    record them, replacing older ones.
+
+    Runs in the calling process; uploads use queue_image_variants() instead.
+    The caller commits. Existing files are overwritten.
+
+    Args:
+        item: Instance of one of the MEDIA_ROOTS models
+
+    Returns:
+        list: The new ImageVariant rows
+    """
+    return record_derivatives(item, build_derivatives(media_path(item), image_settings()))
+
+
+def remove_after_commit(path):
+    """
+    Delete a file once db.session's transaction commits (not at all if it
+    rolls back), so a failed or retried commit can't leave rows pointing at
+    files that are gone.
+    """
+    db.session.info.setdefault("files_to_remove", []).append(path)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _remove_released_files(session):
+    for path in session.info.pop("files_to_remove", []):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _keep_released_files(session):
+    session.info.pop("files_to_remove", None)
+
+
+def delete_derivatives(source):
+    """
+    Remove the thumbnail and responsive copies of an image from the database,
+    with its ImageManifest entry, and from disk once the caller commits.
+
+    Args:
+        source (str): Path of the original under static/
+    """
+    remove_after_commit(os.path.join(app.static_folder, thumbnail_path(source)))
+    for variant in ImageVariant.query.filter_by(source=source).all():
+        remove_after_commit(os.path.join(app.static_folder, variant.filename))
+        db.session.delete(variant)
+    entry = db.session.get(ImageManifest, source)
+    if entry is not None:
+        db.session.delete(entry)
+
+
+def load_image_variants(items):
+    """
+    Load the responsive copies of a page of photos in one query.
+
+    Args:
+        items: Instances of the MEDIA_ROOTS models
+
+    Returns:
+        dict: Source path -> {format: [ImageVariant, ...] by width}, for the picture() macro
+    """
+    sources = [media_path(item) for item in items]
+    found = {}
+    if not sources:
+        return found
+    rows = ImageVariant.query.filter(ImageVariant.source.in_(sources)).order_by(
+        ImageVariant.source, ImageVariant.format, ImageVariant.width
+    )
+    for variant in rows:
+        found.setdefault(variant.source, {}).setdefault(variant.format, []).append(variant)
+    return found
+
+
+@app.context_processor
+def inject_media_path():
+    return {"media_path": media_path, "grid_image": grid_image}
+
+
+# --- Media Blob Store ---
+# Uploaded and imported photos are stored once per content, as
+# static/media/<2 hex>/<2 hex>/<sha256>.<ext>, and rows of every MEDIA_ROOTS
+# model point at them through their sha256 column. Identical bytes uploaded
+# twice (or to two collections) share one file and one set of derivatives;
+# MediaBlob.ref_count says when the last row is gone. Gallery blobs hold the
+# resized form of the upload they are named after, written once by its job.
+
+BLOB_ROOT = "media"
+# Pillow format -> file extension of the formats accepted into the store
+BLOB_FORMATS = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+BLOB_PATH = re.compile(rf"^{BLOB_ROOT}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<sha256>[0-9a-f]{{64}})\.[a-z]+$")
+
+
+def blob_path(filename):
+    """Path under static/ of a blob file: "3fa2...c9.jpg" -> "media/3f/a2/3fa2...c9.jpg"."""
+    return f"{BLOB_ROOT}/{filename[:2]}/{filename[2:4]}/{filename}"
+
+
+def _register_blob_refcount(model):
+    def adjust(connection, sha256, delta):
+        if sha256:
+            connection.execute(
+                db.update(MediaBlob)
+                .where(MediaBlob.sha256 == sha256)
+                .values(ref_count=MediaBlob.ref_count + delta)
+            )
+
+    def updated(mapper, connection, target):
+        history = sa_inspect(target).attrs.sha256.history
+        for sha256 in history.deleted:
+            adjust(connection, sha256, -1)
+        for sha256 in history.added:
+            adjust(connection, sha256, 1)
+
+    event.listen(model, "after_insert", lambda mapper, connection, target: adjust(connection, target.sha256, 1))
+    event.listen(model, "after_delete", lambda mapper, connection, target: adjust(connection, target.sha256, -1))
+    event.listen(model, "after_update", updated)
+
+
+for _model in MEDIA_ROOTS:
+    _register_blob_refcount(_model)
+
+
+def stage_blob(upload):
+    """
+    Put a photo's file in the blob store unless the same bytes are already
+    there; claim_blob() adds its row.
+
+    The bytes are hashed while they are written to a temporary file, which
+    then becomes the blob file or is dropped.
+
+    Args:
+        upload: Uploaded FileStorage, or path of a file to copy in
+
+    Returns:
+        dict: The blob's sha256, extension and size (claim_blob()'s arguments)
+
+    Raises:
+        ValueError: The bytes aren't a JPEG, PNG, GIF or WebP image
+    """
+    incoming = os.path.join(app.static_folder, BLOB_ROOT, "incoming")
+    os.makedirs(incoming, exist_ok=True)
+    tmp_path = os.path.join(incoming, f"{os.getpid()}-{threading.get_ident()}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    source = open(upload, "rb") if isinstance(upload, str) else upload.stream
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    finally:
+        if isinstance(upload, str):
+            source.close()
+    try:
+        with Image.open(tmp_path) as image:
+            extension = BLOB_FORMATS.get(image.format)
+    except (OSError, Image.DecompressionBombError):
+        extension = None
+    if extension is None:
+        os.remove(tmp_path)
+        raise ValueError("Not a JPEG, PNG, GIF or WebP image")
+
+    sha256 = digest.hexdigest()
+    path = os.path.join(app.static_folder, blob_path(f"{sha256}.{extension}"))
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        # Also restores a file deleted while its row was still referenced
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return {"sha256": sha256, "extension": extension, "size": size}
+
+
+def claim_blob(sha256, extension, size):
+    """
+    Find the row of a blob stage_blob() stored, adding it if the bytes are new.
+    The caller adds the row that references the blob (setting its filename
+    and sha256) and commits.
+
+    Returns:
+        tuple: (MediaBlob, whether its bytes were new)
+    """
+    # One statement, so two uploads of the same new bytes can't both insert
+    # it; the row goes in before the referencing row, whose insert counts
+    # the reference
+    statement = sqlite_insert(MediaBlob.__table__).values(
+        sha256=sha256, extension=extension, size=size, ref_count=0, created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=["sha256"])
+    new = db.session.execute(statement).rowcount == 1
+    return db.session.get(MediaBlob, sha256), new
+
+
+def store_blob(upload):
+    """
+    Put a photo in the blob store: stage_blob() then claim_blob(). The caller
+    adds the row that references the blob and commits.
+
+    Returns:
+        tuple: (MediaBlob, whether its bytes were new)
+
+    Raises:
+        ValueError: The bytes aren't a JPEG, PNG, GIF or WebP image
+    """
+    return claim_blob(**stage_blob(upload))
+
+
+def adopt_derivatives(item):
+    """
+    Give a row whose bytes were stored before the derivatives already made
+    for them, and its size and placeholder (from the thumbnail, a cheap
+    decode). The caller commits.
+
+    Returns:
+        bool: False if there are none yet and the row needs its own job
+    """
+    source = media_path(item)
+    thumbnail = os.path.join(app.static_folder, thumbnail_path(source))
+    if db.session.get(ImageManifest, source) is None or not os.path.exists(thumbnail):
+        return False
+    with Image.open(thumbnail) as image:
+        item.thumb_width, item.thumb_height = image.size
+        item.placeholder = render_placeholder(image)
+    item.width, item.height = image_metadata(os.path.join(app.static_folder, source))["size"]
+    return True
+
+
+def add_media(model, upload, **fields):
+    """
+    Store an uploaded photo and commit a ``model`` row for it, then queue its
+    derivatives unless its bytes already have them (a gallery photo is always
+    queued for resizing).
+
+    Args:
+        model: One of the MEDIA_ROOTS models
+        upload: The uploaded FileStorage
+        **fields: Column values of the row
+
+    Returns:
+        The new row
+
+    Raises:
+        ValueError: The upload isn't an image (see stage_blob())
+    """
+    staged = stage_blob(upload)
+
+    def insert():
+        blob, new = claim_blob(**staged)
+        item = model(filename=blob.filename, sha256=blob.sha256, **fields)
+        if model is Photo:
+            # Always resized, into a blob of its own
+            ready = False
+            item.status = "processing"
+        else:
+            ready = not new and adopt_derivatives(item)
+        db.session.add(item)
+        return item, ready
+
+    item, ready = commit_with_retry(insert)
+    if not ready:
+        if model is Photo:
+            queue_gallery_upload(item)
+        else:
+            queue_image_variants(item)
+    return item
+
+
+def delete_media(item):
+    """
+    Delete a gallery or collection photo row, and its file and derivatives
+    unless another row still shows the same bytes. The caller commits.
+    """
+    source, sha256 = media_path(item), item.sha256
+    db.session.delete(item)
+    db.session.flush()
+    release_media(source, sha256)
+
+
+def release_media(source, sha256):
+    """
+    Delete a photo file and its derivatives, unless it is a blob that rows
+    still reference. Call it after flushing the change that dropped a
+    reference. The caller commits, and the files go when it does (see
+    remove_after_commit()).
+
+    Args:
+        source (str): Path of the file under static/
+        sha256 (str): Its blob, None for a file in a model's folder
+    """
+    if sha256:
+        # ref_count is updated in SQL by the mapper events, so read it from there
+        refs = db.session.scalar(db.select(MediaBlob.ref_count).where(MediaBlob.sha256 == sha256))
+        if refs:
+            return
+        db.session.execute(db.delete(MediaBlob).where(MediaBlob.sha256 == sha256))
+    remove_after_commit(os.path.join(app.static_folder, source))
+    delete_derivatives(source)
+
+
+def blob_in_use(source):
+    """Whether ``source`` is a blob file that rows still reference."""
+    match = BLOB_PATH.match(source)
+    return match is not None and db.session.scalar(
+        db.select(MediaBlob.ref_count).where(MediaBlob.sha256 == match["sha256"])
+    ) is not None
+
+
+@app.after_request
+def cache_blob_files(response):
+    """
+    Blob files don't change under their name (a gallery upload is resized in
+    place once, before it is shown), so browsers may keep them for good, and
+    their hash is their ETag.
+    """
+    if request.endpoint == "static" and response.status_code == 200:
+        match = BLOB_PATH.match((request.view_args or {}).get("filename", ""))
+        if match:
+            response.set_etag(match["sha256"])
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+            response.make_conditional(request)
+    return response
+
+
+# --- Image Jobs ---
+# Uploads are committed right away and resized in a pool of IMAGE_WORKERS
+# processes, so requests don't wait on Pillow and no more than that many
+# images are decoded at once. Jobs run in the worker and only touch files;
+# their finishers run back in this process (on the pool's result thread) and
+# record the outcome. Gallery photos show as "processing" until then.
+
+GALLERY_MAX_SIZE = (1200, 800)
+
+_image_executor = None
+_image_executor_lock = threading.Lock()
+
+
+def image_executor(restart=False):
+    """
+    The image worker pool, started on first use.
+
+    Args:
+        restart (bool): Replace the pool, after a worker died and broke it
+    """
+    global _image_executor
+    with _image_executor_lock:
+        if restart and _image_executor is not None:
+            _image_executor.shutdown(wait=False)
+            _image_executor = None
+        if _image_executor is None:
+            method = app.config["IMAGE_WORKER_START_METHOD"]
+            # Forked workers can't be replaced, so they live as long as the pool
+            options = {} if method == "fork" else {"max_tasks_per_child": app.config["IMAGE_WORKER_MAX_TASKS"]}
+            _image_executor = ProcessPoolExecutor(
+                max_workers=app.config["IMAGE_WORKERS"],
+                mp_context=multiprocessing.get_context(method),
+                **options,
+            )
+        return _image_executor
+
+
+def submit_image_job(job, source, finish, *args):
+    """
+    Run ``job(source, image_settings())`` in the image pool, then
+    ``finish(source, result, error, *args)`` in this process within an app
+    context. With IMAGE_WORKERS = 0 both run before this returns.
+
+    Call it after committing the row the finisher looks up.
+    """
+    settings = image_settings()
+    if not app.config["IMAGE_WORKERS"]:
+        future = Future()
+        try:
+            future.set_result(job(source, settings))
+        except Exception as e:
+            future.set_exception(e)
+        _finish_image_job(future, source, finish, args)
+        return
+    try:
+        future = image_executor().submit(job, source, settings)
+    except BrokenProcessPool:
+        future = image_executor(restart=True).submit(job, source, settings)
+    future.add_done_callback(lambda done: _finish_image_job(done, source, finish, args))
+
+
+def _finish_image_job(future, source, finish, args):
+    try:
+        result, error = future.result(), None
+    except Exception as e:
+        result, error = None, e
+    with app.app_context():
+        try:
+            finish(source, result, error, *args)
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("Could not record the image job for %s", source)
+
+
+def run_image_job(job, *args):
+    """
+    Run ``job(*args)`` in the image pool and wait for its result, for work a
+    request can't answer without. With IMAGE_WORKERS = 0 it runs inline.
+    """
+    if not app.config["IMAGE_WORKERS"]:
+        return job(*args)
+    try:
+        future = image_executor().submit(job, *args)
+    except BrokenProcessPool:
+        future = image_executor(restart=True).submit(job, *args)
+    return future.result()
+
+
+def _remove_job_files(source, result):
+    """Delete what a job wrote for a row that was deleted while it ran, unless another row shows the same blob."""
+    result = result or {}
+    # A gallery job writes its own blob (see process_gallery_image())
+    written = [blob_path(f"{result['blob']['sha256']}.jpg")] if "blob" in result else []
+    source = written[0] if written else source
+    if blob_in_use(source):
+        return
+    paths = [variant["filename"] for variant in result.get("variants", [])]
+    for path in chain(paths, written, [thumbnail_path(source)]):
+        path = os.path.join(app.static_folder, path)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def render_derivatives(image, source, settings):
+    """
+    Write every derivative of a decoded original: the grid thumbnail and the
+    responsive copies. No database access.
+
+    Returns:
+        dict: "thumbnail" (width, height), "placeholder", "variants" and
+        "manifest", for record_derivatives() once the caller adds "size"
+    """
+    thumbnail = write_thumbnail(image, source, settings)
+    variants = render_image_variants(image, source, settings)
+    fingerprint = source_fingerprint(os.path.join(settings["static_folder"], source))
+    return {
+        "thumbnail": thumbnail,
+        "placeholder": render_placeholder(image),
+        "variants": variants,
+        "manifest": dict(fingerprint, version=derivative_version(source, settings)),
+    }
+
+
+def build_derivatives(source, settings):
+    """
+    Image job: decode an original once and write all its derivatives. Used for
+    collection uploads and by the rebuild script.
+
+    Returns:
+        dict: See render_derivatives(), plus the original's upright "size"
+    """
+    path = os.path.join(settings["static_folder"], source)
+    image, original = load_image(path, variant_target(settings), settings["max_pixels"])
+    return dict(render_derivatives(image, source, settings), size=original)
+
+
+def process_gallery_image(source, settings):
+    """
+    Turn an uploaded gallery photo into what the gallery serves, from a single
+    decode: a copy fit into GALLERY_MAX_SIZE as an optimized JPEG, stored in
+    the blob store under its own hash, and that copy's thumbnail and
+    responsive copies. The upload itself is left alone, as other rows may
+    show the same bytes.
+
+    Used by the upload job and scripts/rebuild_derivatives.py --pending. No
+    database access.
+
+    Args:
+        source (str): Path of the upload under static/
+        settings (dict): image_settings()
+
+    Returns:
+        dict: Original and final upright (width, height), "metadata" (see
+        image_metadata()), "blob" (the copy's MediaBlob columns), plus what
+        render_derivatives() returns for the copy, for record_gallery_image()
+    """
+    path = os.path.join(settings["static_folder"], source)
+    metadata = image_metadata(path)
+    image, original = load_image(path, GALLERY_MAX_SIZE, settings["max_pixels"])
+    image = downscale(image, fit_size(original, GALLERY_MAX_SIZE))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85, optimize=True)
+    data = buffer.getvalue()
+    blob = {"sha256": hashlib.sha256(data).hexdigest(), "extension": "jpg", "size": len(data)}
+    resized = blob_path(f"{blob['sha256']}.jpg")
+    path = os.path.join(settings["static_folder"], resized)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return dict(render_derivatives(image, resized, settings), original=original, size=image.size,
+                metadata=metadata, blob=blob)
+
+
+def photo_dates(taken_at):
+    """Photo column values for a capture time: taken_at and the year and month labels derived from it."""
+    return {
+        "taken_at": taken_at,
+        "year": taken_at.year,
+        "month": taken_at.strftime("%b").lower() + taken_at.strftime("%y"),  # e.g. "nov23"
+    }
+
+
+def record_photo_metadata(photo, metadata):
+    """
+    Store the capture time and orientation image_metadata() read on a Photo.
+    A photo without a capture time keeps its upload time. The caller commits.
+    """
+    photo.orientation = metadata["orientation"]
+    if metadata["taken_at"] is not None:
+        for key, value in photo_dates(metadata["taken_at"]).items():
+            setattr(photo, key, value)
+
+
+def record_gallery_image(photo, result):
+    """
+    Point a processed gallery Photo at its resized copy (see
+    process_gallery_image()) and record the copy's derivatives and the
+    upload's capture time, size and orientation; the upload is deleted
+    unless other rows show it. The caller commits.
+    """
+    blob = db.session.get(MediaBlob, result["blob"]["sha256"])
+    if blob is None:
+        blob = MediaBlob(**result["blob"])
+        db.session.add(blob)
+        db.session.flush()
+    upload = media_path(photo), photo.sha256
+    photo.filename, photo.sha256 = blob.filename, blob.sha256
+    record_photo_metadata(photo, result["metadata"])
+    record_derivatives(photo, result)
+    photo.status = "ready"
+    db.session.flush()
+    if upload[0] != media_path(photo):
+        release_media(*upload)
+
+
+def _finish_gallery_upload(source, result, error, photo_id):
+    def finish():
+        photo = db.session.get(Photo, photo_id)
+        if photo is None:
+            return None
+        if error is not None:
+            photo.status = "failed"
+        else:
+            record_gallery_image(photo, result)
+        return photo
+
+    if commit_with_retry(finish) is None:
+        _remove_job_files(source, result)
+    elif error is not None:
+        app.logger.error("Could not process gallery upload %s: %s", source, error)
+
+
+def queue_gallery_upload(photo):
+    """Resize a committed gallery Photo (status "processing") in the background."""
+    submit_image_job(process_gallery_image, media_path(photo), _finish_gallery_upload, photo.id)
+
+
+def _finish_image_variants(source, result, error, model, item_id):
+    def finish():
+        item = db.session.get(model, item_id)
+        if item is not None and error is None:
+            record_derivatives(item, result)
+        return item
+
+    if commit_with_retry(finish) is None:
+        _remove_job_files(source, result)
+    elif error is not None:
+        # The page keeps showing the original
+        app.logger.error("Could not generate responsive copies of %s: %s", source, error)
+
+
+def queue_image_variants(item):
+    """Generate the thumbnail and responsive copies of a committed collection photo in the background."""
+    submit_image_job(build_derivatives, media_path(item), _finish_image_variants, type(item), item.id)
+
+
+# --- On-Demand Images ---
+# /img/<preset>/<path> renders IMAGE_PRESETS sizes of gallery and collection
+# photos on first request, in the image pool, and serves them from a disk cache
+# shared by every worker process. A cached file is named by a digest of its
+# source's path, mtime and size and of the preset and pipeline settings, so
+# replacing an original or changing a preset just stops using the old files,
+# which eviction then removes.
+
+image_cache_stats = Counter()
+RESIZE_SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+
+class ImageCache:
+    """
+    Rendered preset images as files, pruned to a byte budget in least recently
+    used order.
+
+    A hit refreshes the file's mtime (at most every TOUCH_AFTER seconds), so
+    the oldest mtimes are the least recently used files. Concurrent requests
+    for a file that is being rendered wait for that render instead of
+    starting their own.
+
+    Args:
+        directory (str): Cache directory, created if missing
+        max_bytes (int): Byte budget; pruning goes down to PRUNE_TO of it
+    """
+
+    TOUCH_AFTER = 60  # seconds
+    PRUNE_TO = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None  # bytes on disk, counted on the first store
+        self._renders = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, extension):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.{extension}")
+
+    def open(self, path):
+        """
+        Open a cached file and mark it recently used. An open file can still be
+        served after another process evicts it.
+
+        Returns:
+            file: Opened for binary reading, or None if it isn't cached
+        """
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        now = time.time()
+        if now - os.fstat(f.fileno()).st_mtime > self.TOUCH_AFTER:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return f
+
+    def render(self, path, render, *args):
+        """
+        Produce ``path`` with ``render(*args)``, which writes it and returns
+        its size, unless a render of it is already running in this process,
+        whose outcome is then shared.
+
+        Raises:
+            Exception: Whatever the render raised
+        """
+        with self._lock:
+            pending = self._renders.get(path)
+            if pending is None:
+                pending = self._renders[path] = Future()
+                running = False
+            else:
+                running = True
+        if running:
+            image_cache_stats["collapsed"] += 1
+            pending.result()
+            return
+        try:
+            # Finished by a render that completed between open() and here
+            if not os.path.exists(path):
+                self._stored(path, render(*args))
+                image_cache_stats["renders"] += 1
+            pending.set_result(None)
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._renders[path]
+
+    def _stored(self, path, size):
+        with self._lock:
+            if self.size is None:
+                self.size = self._disk_usage()
+            else:
+                self.size += size
+            if self.size <= self.max_bytes:
+                return
+        self.prune(keep=path)
+
+    def _files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, os.path.join(root, name)))
+        return files
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def prune(self, keep=None):
+        """
+        Delete the least recently used files until the cache is under PRUNE_TO
+        of its budget.
+
+        Args:
+            keep (str): File to leave alone, the one just stored for a request
+        """
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * self.PRUNE_TO:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            image_cache_stats["evictions"] += 1
+        with self._lock:
+            self.size = total
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.size = 0
+
+
+image_cache = ImageCache(app.config["IMAGE_CACHE_DIR"], app.config["IMAGE_CACHE_BYTES"])
+
+
+def render_preset(source_path, cache_path, preset):
+    """
+    Image job: fit a photo into a preset's box and write it to the cache.
+
+    Args:
+        source_path (str): Original file
+        cache_path (str): File to write, atomically
+        preset (dict): "size", "format", "quality" and "max_pixels"
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    image, _ = load_image(source_path, preset["size"], preset["max_pixels"])
+    image = downscale(image, fit_size(image.size, preset["size"]))
+    save_image(image, cache_path, preset["format"].upper(), quality=preset["quality"], optimize=True)
+    return os.path.getsize(cache_path)
+
+
+def source_version(stat):
+    """Short token that changes whenever a source file is replaced."""
+    return hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:10]
+
+
+def resized_url(preset, source):
+    """
+    URL of a photo in an IMAGE_PRESETS size, versioned with the file so that
+    browsers can cache it for good.
+
+    Args:
+        preset (str): Name in IMAGE_PRESETS
+        source (str): Path of the original under static/ (media_path())
+    """
+    try:
+        version = source_version(os.stat(os.path.join(app.static_folder, source)))
+    except OSError:
+        return url_for("resized_image", preset=preset, source=source)
+    return url_for("resized_image", preset=preset, source=source, v=version)
+
+
+@app.context_processor
+def inject_resized_url():
+    return {"resized_url": resized_url}
+
+
+@app.route("/img/<preset>/<path:source>")
+def resized_image(preset, source):
+    """
+    A photo in the blob store or a media root fitted into an IMAGE_PRESETS box.
+
+    Rendered on its first request and served from the image cache after that.
+    Responses to URLs whose ``v`` matches the file (see resized_url()) are
+    cacheable forever; other URLs must be revalidated.
+
+    Args:
+        preset (str): Name in IMAGE_PRESETS
+        source (str): Path of the original under static/
+    """
+    spec = app.config["IMAGE_PRESETS"].get(preset)
+    if (spec is None or source.split("/", 1)[0] not in {BLOB_ROOT, *MEDIA_ROOTS.values()}
+            or not source.lower().endswith(RESIZE_SOURCE_EXTENSIONS)):
+        abort(404)
+    source_path = safe_join(app.static_folder, source)
+    if source_path is None or not os.path.isfile(source_path):
+        abort(404)
+    version = source_version(os.stat(source_path))
+
+    fmt = spec["format"]
+    settings = {
+        "size": tuple(spec["size"]),
+        "format": fmt,
+        "quality": app.config["IMAGE_VARIANT_QUALITY"][fmt],
+        "max_pixels": app.config["IMAGE_MAX_PIXELS"],
+    }
+    key = json.dumps([source, version, settings, IMAGE_PIPELINE_VERSION, REDUCING_GAP])
+    cache_path = image_cache.path(key, IMAGE_EXTENSIONS[fmt])
+    image_file = image_cache.open(cache_path)
+    if image_file is not None:
+        image_cache_stats["hits"] += 1
+    else:
+        image_cache_stats["misses"] += 1
+        try:
+            image_cache.render(cache_path, run_image_job, render_preset, source_path, cache_path, settings)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            app.logger.warning("Could not resize %s to %s: %s", source, preset, e)
+            abort(404)
+        image_file = image_cache.open(cache_path)
+        if image_file is None:
+            # Evicted by another process in between
+            abort(503)
+
+    etag = os.path.splitext(os.path.basename(cache_path))[0][:32]
+    response = send_file(image_file, mimetype=f"image/{fmt}", etag=etag)
+    if request.args.get("v") == version:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "public, no-cache"
+    return response
+
+
+# --- Authentication Routes ---
+
+
+@app.route("/register", methods=["GET", "POST"])
+def register():
+    """
+    Handle user registration.
+
+    GET: Display registration form
+    POST: Process registration form and create new user
+
+    Returns:
+        Rendered template or redirect response
+    """
+    if current_user.is_authenticated:
+        return redirect(url_for("index"))
+
+    if request.method == "POST":
+        username = request.form.get("username")
+        password = request.form.get("password")
+        confirm_password = request.form.get("confirm_password")
+
+        # Validation
+        if not username or not password:
+            flash("Username and password are required!", "error")
+            return render_template("auth/register.html")
+
+        if password != confirm_password:
+            flash("Passwords do not match!", "error")
+            return render_template("auth/register.html")
+
+        if User.query.filter_by(username=username).first():
+            flash("Username already exists!", "error")
+            return render_template("auth/register.html")
+
+        # Create new user with username as email (for compatibility)
+        new_user = User(username=username, email=f"{username}@example.com", role="reader")
+        new_user.set_password(password)
+
+        db.session.add(new_user)
+        commit_with_retry()
+
+        flash("Registration successful! Please log in.", "success")
+        return redirect(url_for("login"))
+
+    return render_template("auth/register.html")
+
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    """
+    Handle user login.
+
+    GET: Display login form
+    POST: Authenticate user credentials and establish session
+
+    Returns:
+        Rendered template or redirect response
+    """
+    if current_user.is_authenticated:
+        return redirect(url_for("index"))
+
+    if request.method == "POST":
+        username = request.form.get("username")
+        password = request.form.get("password")
+        remember = bool(request.form.get("remember"))
+
+        user = User.query.filter_by(username=username).first()
+
+        if user and user.check_password(password):
+            login_user(user, remember=remember)
+            next_page = request.args.get("next")
+            flash(f"Welcome back, {user.username}!", "success")
+            return redirect(next_page) if next_page else redirect(url_for("index"))
+        else:
+            flash("Invalid username or password!", "error")
+
+    return render_template("auth/login.html")
+
+
+@app.route("/logout")
+@login_required
+def logout():
+    """
+    Log out the current user and end their session.
+
+    Returns:
+        Redirect to homepage with success message
+    """
+    logout_user()
+    flash("You have been logged out.", "info")
+    return redirect(url_for("index"))
+
+
+@app.route("/profile", methods=["GET", "POST"])
+@login_required
+def profile():
+    """
+    User profile page for managing account settings.
+    
+    GET: Display profile information
+    POST: Update password or other settings
+    
+    Returns:
+        Rendered template or redirect response
+    """
+    if request.method == "POST":
+        action = request.form.get("action")
+        
+        if action == "change_password":
+            current_password = request.form.get("current_password")
+            new_password = request.form.get("new_password")
+            confirm_password = request.form.get("confirm_password")
+            
+            # Validation
+            if not current_password or not new_password or not confirm_password:
+                flash("All password fields are required!", "error")
+                return render_template("profile.html")
+            
+            if not current_user.check_password(current_password):
+                flash("Current password is incorrect!", "error")
+                return render_template("profile.html")
+            
+            if new_password != confirm_password:
+                flash("New passwords do not match!", "error")
+                return render_template("profile.html")
+            
+            if len(new_password) < 6:
+                flash("Password must be at least 6 characters long!", "error")
+                return render_template("profile.html")
+            
+            # Update password
+            current_user.set_password(new_password)
+            commit_with_retry()
+            flash("Password changed successfully!", "success")
+            return redirect(url_for("profile"))
+    
+    return render_template("profile.html")
+
+
+# --- Decorators ---
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.is_admin():
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
+
+def member_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.is_member():
+            flash("You need to be a member to perform this action.", "error")
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# --- Page Cache ---
+# Rendered responses for logged-out GET requests, keyed on path and query
+# string. Each entry records the version of every table its page reads; a
+# commit that changes one of those tables bumps the version and so retires the
+# entries. Versions are kept by the last (most shared) store so that a commit
+# in one worker invalidates pages cached by the others.
+
+page_cache_stats = Counter()
+ALL_PAGES = "_all_pages"
+
+
+class MemoryPageStore:
+    """
+    In-process LRU of page entries, bounded by the total size of their bodies.
+
+    Args:
+        max_bytes (int): Byte budget; least recently used entries are evicted beyond it
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._versions = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old["body"])
+            self._entries[key] = entry
+            self.size += len(entry["body"])
+            while self.size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted["body"])
+                page_cache_stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def get_versions(self, tables):
+        return {table: self._versions[table] for table in tables}
+
+    def bump_versions(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+
+class DiskPageStore:
+    """
+    Page entries as files, shared by every worker process on the host.
+
+    Entries are pickled to entries/<sha256[:2]>/<sha256> and written atomically.
+    A table's version is the mtime of versions/<table>, so bumping it is a touch.
+
+    Args:
+        directory (str): Cache directory, created if missing
+        max_bytes (int): Byte budget; the oldest files are pruned beyond it
+    """
+
+    PRUNE_EVERY = 100  # stores between size checks
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._writes = 0
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "versions"), exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "entries", digest[:2], digest)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete the oldest entry files until the store is under its byte budget."""
+        files = []
+        for root, _, names in os.walk(os.path.join(self.directory, "entries")):
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            page_cache_stats["evictions"] += 1
+
+    def clear(self):
+        shutil.rmtree(os.path.join(self.directory, "entries"), ignore_errors=True)
+        os.makedirs(os.path.join(self.directory, "entries"), exist_ok=True)
+
+    def get_versions(self, tables):
+        versions = {}
+        for table in tables:
+            try:
+                versions[table] = os.stat(os.path.join(self.directory, "versions", table)).st_mtime_ns
+            except OSError:
+                versions[table] = 0
+        return versions
+
+    def bump_versions(self, tables):
+        now = time.time_ns()
+        for table in tables:
+            path = os.path.join(self.directory, "versions", table)
+            with open(path, "a"):
+                pass
+            os.utime(path, ns=(now, now))
+
+
+def build_page_cache_stores():
+    """
+    Create the stores named in PAGE_CACHE_STORES.
+
+    Returns:
+        list: Stores, fastest first (empty if the cache is disabled)
+    """
+    stores = []
+    for name in filter(None, (part.strip() for part in app.config["PAGE_CACHE_STORES"].split(","))):
+        if name == "memory":
+            stores.append(MemoryPageStore(app.config["PAGE_CACHE_MEMORY_BYTES"]))
+        elif name == "disk":
+            stores.append(DiskPageStore(app.config["PAGE_CACHE_DIR"], app.config["PAGE_CACHE_DISK_BYTES"]))
+        else:
+            raise ValueError(f"Unknown page cache store: {name}")
+    return stores
+
+
+page_cache_stores = build_page_cache_stores()
+
+
+def flushed_tables(session):
+    """Names of the tables a flush is writing, from inside an after_flush hook."""
+    # new/dirty/deleted still hold the pre-flush state there
+    return {
+        sa_inspect(obj).mapper.local_table.name
+        for obj in chain(session.new, session.dirty, session.deleted)
+    }
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    session.info.setdefault("page_cache_tables", set()).update(flushed_tables(session))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_cached_pages(session):
+    tables = session.info.pop("page_cache_tables", None)
+    if tables and page_cache_stores:
+        page_cache_stores[-1].bump_versions(tables)
+        page_cache_stats["invalidations"] += len(tables)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changed_tables(session):
+    session.info.pop("page_cache_tables", None)
+
+
+def _page_cache_bypassed():
+    token = app.config["PAGE_CACHE_BYPASS_TOKEN"]
+    return bool(token) and request.headers.get("X-Page-Cache-Bypass") == token
+
+
+def cached_page(*models):
+    """
+    Cache a view's response for logged-out visitors until one of ``models`` changes.
+
+    Only anonymous GETs without pending flash messages are served from or stored
+    in the cache, and only 200 responses that don't set cookies are stored.
+
+    Args:
+        *models: Model classes whose tables the page reads
+    """
+    # ALL_PAGES is a version every entry depends on, bumped to clear the cache in all workers
+    tables = sorted(model.__table__.name for model in models) + [ALL_PAGES]
+
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            if (not page_cache_stores or request.method != "GET"
+                    or current_user.is_authenticated or "_flashes" in session):
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            # Taken before rendering, so a commit during the render leaves the entry stale
+            versions = page_cache_stores[-1].get_versions(tables)
+            bypass = _page_cache_bypassed()
+            if bypass:
+                page_cache_stats["bypasses"] += 1
+            else:
+                for i, store in enumerate(page_cache_stores):
+                    entry = store.get(key)
+                    if (entry is not None and entry["versions"] == versions
+                            and time.time() - entry["stored_at"] < app.config["PAGE_CACHE_TTL"]):
+                        for faster_store in page_cache_stores[:i]:
+                            faster_store.set(key, entry)
+                        page_cache_stats["hits"] += 1
+                        response = Response(entry["body"], status=entry["status"], headers=entry["headers"])
+                        response.headers["X-Page-Cache"] = "HIT"
+                        return response
+                page_cache_stats["misses"] += 1
+
+            response = make_response(view(*args, **kwargs))
+            if (response.status_code == 200 and not response.is_streamed
+                    and "Set-Cookie" not in response.headers):
+                entry = {
+                    "body": response.get_data(),
+                    "status": response.status_code,
+                    "headers": list(response.headers.items()),
+                    "versions": versions,
+                    "stored_at": time.time(),
+                }
+                for store in page_cache_stores:
+                    store.set(key, entry)
+                page_cache_stats["stores"] += 1
+            response.headers["X-Page-Cache"] = "BYPASS" if bypass else "MISS"
+            return response
+        return decorated_function
+    return decorator
+
+
+# --- Conditional GET ---
+# Pages send an ETag and Last-Modified built from the data_version rows of the
+# tables they read, and a matching If-None-Match / If-Modified-Since is answered
+# with 304 before the view runs. Template edits change the validators too.
+
+
+def _newest_template_mtime():
+    newest = 0
+    for root, _, names in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in names:
+            newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+    return datetime.utcfromtimestamp(int(newest))
+
+
+TEMPLATES_MODIFIED = _newest_template_mtime()
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _bump_data_versions(session, flush_context):
+    tables = flushed_tables(session) - {DataVersion.__tablename__}
+    if not tables:
+        return
+    now = datetime.utcnow()
+    table = DataVersion.__table__
+    statement = sqlite_insert(table).values(
+        [{"name": name, "version": 1, "updated_at": now} for name in sorted(tables)]
+    )
+    session.connection().execute(statement.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"version": table.c.version + 1, "updated_at": statement.excluded.updated_at},
+    ))
+
+
+def data_versions(tables):
+    """
+    Read the data_version rows of ``tables``.
+
+    Returns:
+        list: Rows with name, version and updated_at (tables never changed are absent)
+    """
+    return db.session.execute(
+        db.select(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+        .where(DataVersion.name.in_(tables))
+    ).all()
+
+
+def page_validators(tables):
+    """
+    Build the ETag and Last-Modified for a page reading ``tables``.
+
+    The ETag also covers who is looking, since members and admins see extra
+    controls on the same URL.
+
+    Args:
+        tables (list): Table names the page depends on
+
+    Returns:
+        tuple: (etag, last_modified) with last_modified a naive UTC datetime,
+        rounded up to the whole second HTTP dates are limited to
+    """
+    rows = data_versions(tables)
+    viewer = (current_user.get_id(), current_user.role) if current_user.is_authenticated else None
+    state = (TEMPLATES_MODIFIED.isoformat(), viewer, sorted((row.name, row.version) for row in rows))
+    etag = hashlib.sha1(repr(state).encode("utf-8")).hexdigest()
+    last_modified = max([row.updated_at for row in rows if row.updated_at] + [TEMPLATES_MODIFIED])
+    if last_modified.microsecond:
+        last_modified = last_modified.replace(microsecond=0) + timedelta(seconds=1)
+    return etag, last_modified
+
+
+def conditional_page(*models):
+    """
+    Answer conditional GETs for a view with 304 when ``models`` haven't changed.
+
+    Args:
+        *models: Model classes whose tables the page reads
+    """
+    tables = sorted(model.__table__.name for model in models)
+
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            # A pending flash message is part of the next page, so always render it
+            if request.method != "GET" or "_flashes" in session:
+                return view(*args, **kwargs)
+
+            etag, last_modified = page_validators(tables)
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif current_user.is_authenticated:
+                # Last-Modified doesn't cover the viewer, only the ETag does
+                not_modified = False
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and last_modified <= since.replace(tzinfo=None)
+
+            response = Response(status=304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                # Until that second is over, another change could still get the
+                # same Last-Modified, so only the ETag can validate the page
+                if last_modified <= datetime.utcnow():
+                    response.last_modified = last_modified
+                # Let browsers keep the page but check back on every visit
+                response.cache_control.no_cache = True
+                response.cache_control.private = current_user.is_authenticated
+                response.vary.add("Cookie")
+            return response
+        return decorated_function
+    return decorator
+
+
+# --- Query Cache ---
+
+query_cache_stats = Counter()
+_query_cache = {}  # (function name, args) -> (tables, snapshot, loaded_at, shared table versions)
+_query_cache_lock = threading.Lock()
+_query_cache_generation = 0  # Bumped on every invalidation
+
+
+def _snapshot(value):
+    """
+    Copy a query result so it can outlive the session that loaded it.
+
+    Model instances become detached copies holding only their column values,
+    lists and rows become tuples and dicts read-only mappings. Nothing done to
+    the copies is ever saved.
+    """
+    if isinstance(value, db.Model):
+        mapper = sa_inspect(value).mapper
+        copy = mapper.class_(**{attr.key: getattr(value, attr.key) for attr in mapper.column_attrs})
+        make_transient_to_detached(copy)
+        return copy
+    if isinstance(value, Row) or type(value) in (list, tuple):
+        return tuple(_snapshot(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _snapshot(item) for key, item in value.items()})
+    return value
+
+
+def cached_query(*models):
+    """
+    Cache a function's query result per arguments until one of ``models`` changes.
+
+    The result is stored as a read-only snapshot (see _snapshot) and dropped
+    when a commit in this process writes to one of the models' tables, or after
+    QUERY_CACHE_TTL seconds. A hit is also checked against the table versions
+    of the shared page cache store, so a commit in another worker drops it too
+    and pages re-rendered under the new versions never use a stale result.
+    Cached objects are detached, so only their column attributes can be used,
+    not relationships.
+
+    Args:
+        *models: Model classes whose tables the query reads
+    """
+    tables = frozenset(model.__table__.name for model in models)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args):
+            key = (fn.__name__, args)
+            now = time.time()
+            # Versions other workers' commits bump (see _invalidate_cached_pages)
+            versions = page_cache_stores[-1].get_versions(tables) if page_cache_stores else None
+            cached = _query_cache.get(key)
+            if (cached is not None and now - cached[2] < app.config["QUERY_CACHE_TTL"]
+                    and cached[3] == versions):
+                query_cache_stats["hits"] += 1
+                return cached[1]
+
+            query_cache_stats["misses"] += 1
+            generation = _query_cache_generation
+            snapshot = _snapshot(fn(*args))
+            with _query_cache_lock:
+                # Don't keep a result that a commit may have made stale while it loaded
+                if generation == _query_cache_generation:
+                    _query_cache[key] = (tables, snapshot, now, versions)
+            return snapshot
+
+        wrapper.tables = tables
+        return wrapper
+    return decorator
+
+
+def invalidate_cached_queries(tables=None):
+    """
+    Drop cached query results that read any of ``tables`` (all of them if None).
+    """
+    global _query_cache_generation
+    with _query_cache_lock:
+        _query_cache_generation += 1
+        for key, (entry_tables, _, _, _) in list(_query_cache.items()):
+            if tables is None or entry_tables & tables:
+                del _query_cache[key]
+                query_cache_stats["invalidations"] += 1
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_query_cache_tables(session, flush_context):
+    session.info.setdefault("query_cache_tables", set()).update(flushed_tables(session))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_cached_queries(session):
+    tables = session.info.pop("query_cache_tables", None)
+    if tables:
+        invalidate_cached_queries(tables)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_query_cache_tables(session):
+    session.info.pop("query_cache_tables", None)
+
+
+@cached_query(CategoryIcon)
+def library_categories():
+    """
+    Library categories in display order.
+
+    Returns:
+        tuple: Detached CategoryIcon snapshots
+    """
+    return CategoryIcon.query.order_by(CategoryIcon.display_order, CategoryIcon.name).all()
+
+
+@cached_query(Label, Post)
+def label_post_counts():
+    """
+    Blog labels with the number of posts carrying each, by name.
+
+    Post is listed because adding or removing a post's labels only marks the
+    post as changed. Grouping by the unique name lets SQLite walk the name
+    index instead of sorting.
+
+    Returns:
+        tuple: (Label snapshot, post count) pairs
+    """
+    return (
+        db.session.query(Label, db.func.count(post_labels.c.post_id))
+        .outerjoin(post_labels, post_labels.c.label_id == Label.id)
+        .group_by(Label.name)
+        .order_by(Label.name)
+        .all()
+    )
+
+
+CategoryBookCounts = namedtuple("CategoryBookCounts", ["total", "public", "hidden", "bytes"])
+NO_BOOKS = CategoryBookCounts(0, 0, 0, 0)
 
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin():
-            abort(403)
-        return f(*args, **kwargs)
-    return decorated_function
 
-def member_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_member():
-            flash("You need to be a member to perform this action.", "error")
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
+@cached_query(Book)
+def category_book_counts():
+    """
+    Number of books and their size on disk per library category, in one grouped query.
+
+    Returns:
+        MappingProxyType: Category name -> CategoryBookCounts; empty categories are absent
+    """
+    public = db.func.sum(db.case((Book.is_public.is_(True), 1), else_=0))
+    rows = db.session.execute(
+        db.select(Book.category, db.func.count(Book.id), public, db.func.coalesce(db.func.sum(Book.file_size), 0))
+        .group_by(Book.category)
+    ).all()
+    return {
+        category: CategoryBookCounts(total, public, total - public, size)
+        for category, total, public, size in rows
+    }
 
 
 # --- Main Page Routes ---
@@ -645,6 +3625,7 @@ def member_required(f):
 
 
 @app.route("/")
+@cached_page(Photo, Post, LabProject)
 def index():
     """
     Homepage route that displays recent photos and projects.
@@ -652,22 +3633,20 @@ def index():
     Returns:
         Rendered index.html template with recent photos and projects
     """
-    # Get 6 most recent photos for the gallery section (sorted by year and filename descending)
-    recent_photos = Photo.query.order_by(Photo.year.desc(), Photo.filename.desc()).limit(6).all()
+    # Get 6 most recently taken photos for the gallery section
+    recent_photos = Photo.query.order_by(Photo.taken_at.desc(), Photo.id.desc()).limit(6).all()
     # Get 6 most recent blog posts for the humanity section
-    recent_posts = Post.query.order_by(Post.created_at.desc()).limit(6).all()
+    recent_posts = (
+        Post.query.options(db.defer(Post.content), db.lazyload(Post.labels))
+        .order_by(Post.created_at.desc())
+        .limit(6)
+        .all()
+    )
     # Get 3 most recent lab projects
     lab_projects = LabProject.query.order_by(LabProject.created_at.desc()).limit(3).all()
     
-    # Load rotating texts for quotes section
-    texts_path = os.path.join(app.static_folder, 'rotating_texts.json')
-    quotes = []
-    try:
-        with open(texts_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            quotes = data.get('paragraphs', [])
-    except Exception as e:
-        print(f"Error loading rotating texts: {e}")
+    # A random handful of quotes for the hero and Ideas rotation, not the whole corpus
+    quotes = rotating_texts.sample('paragraphs', HOME_QUOTES_SAMPLE)
 
     return render_template(
         "index.html",
@@ -696,19 +3675,10 @@ def ideas():
     Displays rotating quotes and downloadable books (for authorized users).
     """
     # Load rotating texts
-    texts_path = os.path.join(app.static_folder, 'rotating_texts.json')
-    quotes = []
-    try:
-        with open(texts_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            quotes = data.get('paragraphs', [])
-            # Take only 6 quotes as requested
-            quotes = data.get('paragraphs', [])
-    except Exception as e:
-        print(f"Error loading rotating texts: {e}")
+    quotes = rotating_texts.sample('paragraphs')
 
     # Fetch categories for the Library section from CategoryIcon model
-    categories = CategoryIcon.query.order_by(CategoryIcon.display_order, CategoryIcon.name).all()
+    categories = library_categories()
 
     # Check permission for downloads
     can_download = False
@@ -763,7 +3733,7 @@ def add_lab_project():
         image_filename=image_filename
     )
     db.session.add(new_project)
-    db.session.commit()
+    commit_with_retry()
     flash("Project added successfully!", "success")
     return redirect(url_for('lab'))
 
@@ -772,7 +3742,7 @@ def add_lab_project():
 def delete_lab_project(project_id):
     project = LabProject.query.get_or_404(project_id)
     db.session.delete(project)
-    db.session.commit()
+    commit_with_retry()
     flash("Project deleted.", "success")
     return redirect(url_for('lab'))
 
@@ -780,14 +3750,70 @@ def delete_lab_project(project_id):
 # --- Library Routes ---
 
 @app.route("/library")
+@cached_page(CategoryIcon, Book)
 def library_index():
     """
     Library landing page showing book categories.
     """
     # Get categories from CategoryIcon model
-    categories = CategoryIcon.query.order_by(CategoryIcon.display_order, CategoryIcon.name).all()
+    categories = library_categories()
+    
+    # Readers and visitors only count public books, as in library_category
+    show_hidden = current_user.is_authenticated and current_user.role != 'reader'
+    counts = category_book_counts()
+    book_totals = {}
+    for category in categories:
+        category_counts = counts.get(category.name, NO_BOOKS)
+        book_totals[category.name] = category_counts.total if show_hidden else category_counts.public
     
-    return render_template("library/index.html", categories=categories)
+    return render_template("library/index.html", categories=categories, book_totals=book_totals)
+
+@app.route("/library/search")
+def library_search():
+    """
+    Search the library by title, author or category.
+    """
+    query_text = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = 20
+
+    # Readers and visitors only see public books, as in library_category
+    include_hidden = current_user.is_authenticated and current_user.role != 'reader'
+    results = []
+    if query_text:
+        results = search_books(query_text, include_hidden, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(results) > per_page
+
+    return render_template(
+        "library/search.html",
+        query=query_text,
+        results=results[:per_page],
+        page=page,
+        has_next=has_next,
+    )
+
+@app.route("/library/search/suggest")
+def library_search_suggest():
+    """
+    Typeahead suggestions for the library search box.
+
+    Returns:
+        JSON list of {id, title, author, category, url}
+    """
+    query_text = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 8, type=int), 1), 20)
+    include_hidden = current_user.is_authenticated and current_user.role != 'reader'
+    results = search_books(query_text, include_hidden, limit=limit) if query_text else []
+    return jsonify([
+        {
+            "id": book["id"],
+            "title": book["title"].striptags(),
+            "author": book["author"].striptags(),
+            "category": book["category"],
+            "url": url_for('library_category', category=book["category"], _anchor=f"book-{book['id']}"),
+        }
+        for book in results
+    ])
 
 @app.route("/library/<category>")
 def library_category(category):
@@ -847,7 +3873,7 @@ def upload_book(category):
             upload_date=datetime.utcnow()
         )
         db.session.add(new_book)
-        db.session.commit()
+        commit_with_retry()
         
         flash('Book uploaded successfully', 'success')
         return redirect(url_for('library_category', category=category))
@@ -885,7 +3911,7 @@ def toggle_book_public(book_id):
     
     book = Book.query.get_or_404(book_id)
     book.is_public = not book.is_public
-    db.session.commit()
+    commit_with_retry()
     
     status = "public" if book.is_public else "hidden from public"
     flash(f'Book "{book.title}" is now {status}', 'success')
@@ -903,15 +3929,13 @@ def manage_categories():
     if not current_user.is_admin():
         abort(403)
     
-    categories = CategoryIcon.query.order_by(CategoryIcon.display_order, CategoryIcon.name).all()
+    categories = library_categories()
     
-    # Get book counts for each category
-    category_book_counts = {}
-    for category in categories:
-        count = Book.query.filter_by(category=category.name).count()
-        category_book_counts[category.name] = count
+    # Book counts and sizes for every category from one grouped query
+    counts = category_book_counts()
+    book_counts = {category.name: counts.get(category.name, NO_BOOKS) for category in categories}
     
-    return render_template("library/manage_categories.html", categories=categories, category_book_counts=category_book_counts)
+    return render_template("library/manage_categories.html", categories=categories, category_book_counts=book_counts)
 
 @app.route("/admin/library/category/add", methods=["POST"])
 @login_required
@@ -944,7 +3968,7 @@ def add_category():
         display_order=max_order + 1
     )
     db.session.add(new_category)
-    db.session.commit()
+    commit_with_retry()
     
     flash(f'Category "{name}" added successfully', "success")
     return redirect(url_for("manage_categories"))
@@ -980,7 +4004,7 @@ def rename_category(category_id):
     
     # Update category name
     category.name = new_name
-    db.session.commit()
+    commit_with_retry()
     
     flash(f'Category "{old_name}" renamed to "{new_name}"', "success")
     return redirect(url_for("manage_categories"))
@@ -996,14 +4020,17 @@ def delete_category(category_id):
     
     category = CategoryIcon.query.get_or_404(category_id)
     
-    # Check if any books exist in this category
-    book_count = Book.query.filter_by(category=category.name).count()
+    # Check if any books exist in this category. The cached counts may lag a
+    # book added by another worker, so an empty result is confirmed with EXISTS.
+    book_count = category_book_counts().get(category.name, NO_BOOKS).total
+    if book_count == 0 and db.session.query(Book.query.filter_by(category=category.name).exists()).scalar():
+        book_count = Book.query.filter_by(category=category.name).count()
     if book_count > 0:
         flash(f'Cannot delete category "{category.name}" - it contains {book_count} book(s). Please reassign or delete the books first.', "error")
         return redirect(url_for("manage_categories"))
     
     db.session.delete(category)
-    db.session.commit()
+    commit_with_retry()
     
     flash(f'Category "{category.name}" deleted successfully', "success")
     return redirect(url_for("manage_categories"))
@@ -1025,7 +4052,7 @@ def update_category_icon(category_id):
         return redirect(url_for("manage_categories"))
     
     category.icon = new_icon
-    db.session.commit()
+    commit_with_retry()
     
     flash(f'Icon for "{category.name}" updated successfully', "success")
     return redirect(url_for("manage_categories"))
@@ -1035,7 +4062,38 @@ def update_category_icon(category_id):
 # --- Gallery Routes ---
 
 
+GALLERY_PER_PAGE = 20
+
+
+def index_years(column):
+    """
+    Years an indexed datetime column has values in, newest first. Walks the
+    index with one seek per year (the latest value before the start of the
+    previous year found) instead of reading every row.
+
+    Returns:
+        list: (year, latest value in that year) tuples
+    """
+    years, before = [], None
+    while True:
+        query = db.select(db.func.max(column))
+        if before is not None:
+            query = query.where(column < before)
+        latest = db.session.scalar(query)
+        if latest is None:
+            return years
+        years.append((latest.year, latest))
+        before = datetime(latest.year, 1, 1)
+
+
+def gallery_years():
+    """Years with gallery photos, newest first (see index_years())."""
+    return [year for year, _ in index_years(Photo.taken_at)]
+
+
 @app.route("/gallery")
+@conditional_page(Photo, PhotoLike, PhotoComment, User, ImageVariant)
+@cached_page(Photo, PhotoLike, PhotoComment, User, ImageVariant)
 def gallery():
     """
     Photo gallery page that displays all photos grouped by month.
@@ -1043,37 +4101,75 @@ def gallery():
     Returns:
         Rendered photo_gallery.html template with photos organized by month
     """
-    # Get distinct years for navigation
-    # We can't easily use distinct() on the year column if some photos might not have it set (though our logic tries to set it)
-    # So we'll query all years efficiently
-    years_query = db.session.query(Photo.year).distinct().all()
-    years = sorted([y[0] for y in years_query if y[0] is not None], reverse=True)
+    # Years for navigation, by when the photos were taken
+    years = gallery_years()
     
     # Get current year filter and page
     selected_year = request.args.get('year')
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
+    per_page = GALLERY_PER_PAGE
     
     query = Photo.query
+    year_filter = None
     
     if selected_year and selected_year != 'all':
         try:
-            year_int = int(selected_year)
-            query = query.filter_by(year=year_int)
-        except ValueError:
+            start, end = _year_bounds(int(selected_year))
+            query = query.filter(Photo.taken_at >= start, Photo.taken_at < end)
+            year_filter = start.year
+        except (ValueError, OverflowError):
             pass # Ignore invalid year format
             
-    # Order by year descending, then by filename descending (assuming higher filenames = newer photos)
-    pagination = query.order_by(Photo.year.desc(), Photo.filename.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    # Newest taken first
+    pagination = KeysetPagination(
+        query,
+        [Photo.taken_at, Photo.id],
+        per_page=per_page,
+        count_key=("photo", year_filter),
+    )
     
     return render_template(
         "gallery/photo_gallery.html", 
         pagination=pagination, 
+        variants=load_image_variants(pagination.items),
         years=years,
         selected_year=selected_year if selected_year != 'all' else None
     )
 
 
+@app.route("/photos/status")
+def photo_status():
+    """
+    Processing status of gallery photos, polled by the gallery page while
+    uploads are being resized.
+
+    Query args:
+        ids: Comma-separated photo ids, at most GALLERY_PER_PAGE
+
+    Returns:
+        JSON {id: {"status": "processing" | "ready" | "failed", "thumbnail": url or null}};
+        unknown (e.g. deleted) ids are left out
+    """
+    try:
+        ids = [int(i) for i in request.args.get("ids", "").split(",") if i.strip()]
+    except ValueError:
+        abort(400)
+    found = {}
+    if ids:
+        rows = db.session.execute(
+            db.select(Photo.id, Photo.status, Photo.filename, Photo.sha256)
+            .where(Photo.id.in_(ids[:GALLERY_PER_PAGE]))
+        )
+        for row in rows:
+            thumbnail = None
+            if row.status == "ready":
+                source = stored_media_path(MEDIA_ROOTS[Photo], row.filename, row.sha256)
+                thumbnail = url_for("static", filename=thumbnail_path(source))
+            found[str(row.id)] = {"status": row.status, "thumbnail": thumbnail}
+    response = jsonify(found)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 # --- Photo Comment & Like Routes ---
 
 @app.route("/photos/<int:photo_id>/comment", methods=["POST"])
@@ -1089,7 +4185,7 @@ def add_photo_comment(photo_id):
         
     comment = PhotoComment(content=content, user_id=current_user.id, photo_id=photo_id)
     db.session.add(comment)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Comment added!", "success")
     return redirect(url_for("gallery"))
@@ -1105,7 +4201,7 @@ def delete_photo_comment(comment_id):
         abort(403)
         
     db.session.delete(comment)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Comment deleted.", "info")
     return redirect(url_for("gallery"))
@@ -1119,12 +4215,12 @@ def like_photo(photo_id):
     
     if like:
         db.session.delete(like)
-        db.session.commit()
+        commit_with_retry()
         flash("Unliked.", "info")
     else:
         like = PhotoLike(user_id=current_user.id, photo_id=photo_id)
         db.session.add(like)
-        db.session.commit()
+        commit_with_retry()
         flash("Liked!", "success")
         
     return redirect(url_for("gallery"))
@@ -1133,99 +4229,192 @@ def like_photo(photo_id):
 # --- Collections Routes ---
 
 
+# Collections shown on /collections; 'models' feed the collection_stats row
+COLLECTION_DEFINITIONS = [
+    {
+        'key': 'guitar',
+        'name': 'Guitar',
+        'route': 'guitar_collection',
+        'models': [GuitarVideo, GuitarPhoto],
+        'description': 'Melodies, chords, and musical journeys',
+        'image': 'guitar.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1510915361894-db8b60106cb1?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'videos',
+        'name': 'Videos',
+        'route': 'videos_collection',
+        'models': [CollectionVideo],
+        'description': 'Visual stories worth watching',
+        'image': 'videos.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1574267432644-f610f5b17a8e?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'books',
+        'name': 'Books',
+        'route': 'books_collection',
+        'models': [BookPhoto],
+        'description': 'Literary adventures and discoveries',
+        'image': 'books.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1495446815901-a7297e633e8d?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'reading_quotes',
+        'name': 'Reading Quotes',
+        'route': 'reading_quotes_collection',
+        'models': [ReadingQuotePhoto],
+        'description': 'Words that resonated',
+        'image': 'reading_quotes.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1455390582262-044cdead277a?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'exercises',
+        'name': 'Exercises',
+        'route': 'exercises_collection',
+        'models': [ExercisePhoto],
+        'description': 'Physical discipline',
+        'image': 'exercises.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1517836357463-d25dfeac3438?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'intellectual',
+        'name': 'Intellectual Masturbation',
+        'route': 'intellectual_collection',
+        'models': [IntellectualPhoto],
+        'description': 'Abstract thoughts',
+        'image': 'intellectual.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1507413245164-6160d8298b31?w=800&h=600&fit=crop'
+    },
+    {
+        'key': 'fragmented_quotes',
+        'name': 'Fragmented Quotes',
+        'route': 'fragmented_quotes_collection',
+        'models': [FragmentedQuotePhoto],
+        'description': 'Bits and pieces',
+        'image': 'fragmented.jpg',
+        'fallback_image': 'https://images.unsplash.com/photo-1455849318743-b2233052fcff?w=800&h=600&fit=crop'
+    }
+]
+COLLECTION_MODELS = [model for collection in COLLECTION_DEFINITIONS for model in collection['models']]
+
+# Folder under static/ holding each model's images, for the collection cover
+COLLECTION_COVER_FOLDERS = {
+    GuitarPhoto: 'guitar_photos',
+    BookPhoto: 'book_photos',
+    ExercisePhoto: 'exercise_photos',
+    ReadingQuotePhoto: 'reading_quote_photos',
+    IntellectualPhoto: 'intellectual_photos',
+    FragmentedQuotePhoto: 'fragmented_quote_photos',
+}
+
+
+def refresh_collection_stats(connection, key):
+    """
+    Recompute one collection_stats row from the collection's tables.
+
+    Args:
+        connection: SQLAlchemy connection to run the queries on
+        key (str): Collection key from COLLECTION_DEFINITIONS
+    """
+    definition = next(c for c in COLLECTION_DEFINITIONS if c['key'] == key)
+    item_count = 0
+    last_update = None
+    cover_filename = None
+    cover_date = None
+    for model in definition['models']:
+        item_count += connection.scalar(db.select(db.func.count()).select_from(model.__table__))
+        # Videos aren't in the blob store
+        sha256 = model.sha256 if model in MEDIA_ROOTS else db.null()
+        latest = connection.execute(
+            db.select(model.filename, sha256.label("sha256"), model.created_at)
+            .order_by(model.created_at.desc())
+            .limit(1)
+        ).first()
+        if latest is None or latest.created_at is None:
+            continue
+        if last_update is None or latest.created_at > last_update:
+            last_update = latest.created_at
+        folder = COLLECTION_COVER_FOLDERS.get(model)
+        if folder and (cover_date is None or latest.created_at > cover_date):
+            cover_date = latest.created_at
+            cover_filename = stored_media_path(folder, latest.filename, latest.sha256)
+
+    values = dict(last_update=last_update, item_count=item_count, cover_filename=cover_filename)
+    statement = sqlite_insert(CollectionStats.__table__).values(key=key, **values)
+    connection.execute(statement.on_conflict_do_update(index_elements=['key'], set_=values))
+
+
+def rebuild_collection_stats():
+    """
+    Recompute every collection_stats row from the existing data.
+    """
+    def rebuild():
+        connection = db.session.connection()
+        for definition in COLLECTION_DEFINITIONS:
+            refresh_collection_stats(connection, definition['key'])
+
+    commit_with_retry(rebuild)
+
+
+def _collection_item_inserted(key):
+    def after_insert(mapper, connection, target):
+        stats = CollectionStats.__table__
+        created_at = target.created_at or datetime.utcnow()
+        is_newest = db.or_(stats.c.last_update.is_(None), stats.c.last_update <= created_at)
+        values = {
+            'item_count': stats.c.item_count + 1,
+            'last_update': db.case((is_newest, created_at), else_=stats.c.last_update),
+        }
+        folder = COLLECTION_COVER_FOLDERS.get(type(target))
+        if folder:
+            values['cover_filename'] = db.case(
+                (is_newest, media_path(target)), else_=stats.c.cover_filename
+            )
+        result = connection.execute(stats.update().where(stats.c.key == key).values(values))
+        if result.rowcount == 0:
+            refresh_collection_stats(connection, key)
+    return after_insert
+
+
+def _collection_item_deleted(key):
+    def after_delete(mapper, connection, target):
+        # The deleted item may have been the newest one, so recount from the tables
+        refresh_collection_stats(connection, key)
+    return after_delete
+
+
+for _definition in COLLECTION_DEFINITIONS:
+    for _model in _definition['models']:
+        event.listen(_model, 'after_insert', _collection_item_inserted(_definition['key']))
+        event.listen(_model, 'after_delete', _collection_item_deleted(_definition['key']))
+
+
 def get_collections_with_last_update():
     """
     Get all collections with their last update time for dynamic ordering.
+
+    Reads the materialized collection_stats rows, so this is a single query.
     
     Returns:
         list: List of dictionaries with collection info and last update time
     """
+    stats = {row.key: row for row in CollectionStats.query.all()}
     collections_data = []
-    
-    # Define all collections with their models and routes
-    collection_definitions = [
-        {
-            'name': 'Guitar',
-            'route': 'guitar_collection',
-            'models': [GuitarVideo, GuitarPhoto],
-            'description': 'Melodies, chords, and musical journeys',
-            'image': 'guitar.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1510915361894-db8b60106cb1?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Videos',
-            'route': 'videos_collection',
-            'models': [CollectionVideo],
-            'description': 'Visual stories worth watching',
-            'image': 'videos.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1574267432644-f610f5b17a8e?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Books',
-            'route': 'books_collection',
-            'models': [BookPhoto],
-            'description': 'Literary adventures and discoveries',
-            'image': 'books.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1495446815901-a7297e633e8d?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Reading Quotes',
-            'route': 'reading_quotes_collection',
-            'models': [ReadingQuotePhoto],
-            'description': 'Words that resonated',
-            'image': 'reading_quotes.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1455390582262-044cdead277a?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Exercises',
-            'route': 'exercises_collection',
-            'models': [ExercisePhoto],
-            'description': 'Physical discipline',
-            'image': 'exercises.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1517836357463-d25dfeac3438?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Intellectual Masturbation',
-            'route': 'intellectual_collection',
-            'models': [IntellectualPhoto],
-            'description': 'Abstract thoughts',
-            'image': 'intellectual.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1507413245164-6160d8298b31?w=800&h=600&fit=crop'
-        },
-        {
-            'name': 'Fragmented Quotes',
-            'route': 'fragmented_quotes_collection',
-            'models': [FragmentedQuotePhoto],
-            'description': 'Bits and pieces',
-            'image': 'fragmented.jpg',
-            'fallback_image': 'https://images.unsplash.com/photo-1455849318743-b2233052fcff?w=800&h=600&fit=crop'
-        }
-    ]
-    
-    for collection in collection_definitions:
-        last_update = None
-        
-        # Find the most recent created_at from all models in this collection
-        for model in collection['models']:
-            try:
-                latest_item = model.query.order_by(model.created_at.desc()).first()
-                if latest_item and (last_update is None or latest_item.created_at > last_update):
-                    last_update = latest_item.created_at
-            except Exception as e:
-                # If there's an error (e.g., table doesn't exist), continue to next model
-                continue
-        
-        # If no items found, use a default date (very old)
-        if last_update is None:
-            last_update = datetime(2000, 1, 1)
-        
+    for collection in COLLECTION_DEFINITIONS:
+        row = stats.get(collection['key'])
+        cover_filename = row.cover_filename if row else None
         collections_data.append({
             'name': collection['name'],
             'route': collection['route'],
             'description': collection['description'],
             'image': collection['image'],
-            'fallback_image': collection['fallback_image'],
-            'last_update': last_update
+            'fallback_image': (
+                resized_url('medium', cover_filename) if cover_filename
+                else collection['fallback_image']
+            ),
+            # If no items found, use a default date (very old)
+            'last_update': (row.last_update if row else None) or datetime(2000, 1, 1),
+            'item_count': row.item_count if row else 0,
         })
     
     # Sort collections by last_update in descending order (most recent first)
@@ -1235,6 +4424,8 @@ def get_collections_with_last_update():
 
 
 @app.route("/collections")
+@conditional_page(CollectionStats, *COLLECTION_MODELS)
+@cached_page(CollectionStats, *COLLECTION_MODELS)
 def collections():
     """
     Collections page route displaying various curated collections with dynamic ordering.
@@ -1247,6 +4438,7 @@ def collections():
 
 
 @app.route("/collections/guitar")
+@conditional_page(GuitarVideo, GuitarPhoto, ImageVariant)
 def guitar_collection():
     """
     Guitar collection page displaying videos and photos.
@@ -1256,7 +4448,9 @@ def guitar_collection():
     """
     videos = GuitarVideo.query.order_by(GuitarVideo.created_at.desc()).all()
     photos = GuitarPhoto.query.order_by(GuitarPhoto.created_at.desc()).all()
-    return render_template("collections/guitar.html", videos=videos, photos=photos)
+    return render_template(
+        "collections/guitar.html", videos=videos, photos=photos, variants=load_image_variants(photos)
+    )
 
 
 @app.route("/collections/guitar/upload-video", methods=["GET", "POST"])
@@ -1287,7 +4481,7 @@ def upload_guitar_video():
             filename=video_filename
         )
         db.session.add(new_video)
-        db.session.commit()
+        commit_with_retry()
         
         flash("Video uploaded successfully!", "success")
         return redirect(url_for("guitar_collection"))
@@ -1310,20 +4504,12 @@ def upload_guitar_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("guitar_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        photo_path = os.path.join(basedir, "static", "guitar_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = GuitarPhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(GuitarPhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("guitar_collection"))
         
         flash("Photo uploaded successfully!", "success")
         return redirect(url_for("guitar_collection"))
@@ -1345,7 +4531,7 @@ def delete_guitar_video(video_id):
         os.remove(video_path)
     
     db.session.delete(video)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Video deleted successfully!", "info")
     return redirect(url_for("guitar_collection"))
@@ -1359,19 +4545,14 @@ def delete_guitar_photo(photo_id):
     """
     photo = GuitarPhoto.query.get_or_404(photo_id)
     
-    # Delete file
-    photo_path = os.path.join(basedir, "static", "guitar_photos", photo.filename)
-    if os.path.exists(photo_path):
-        os.remove(photo_path)
-    
-    db.session.delete(photo)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(photo))
     
     flash("Photo deleted successfully!", "info")
     return redirect(url_for("guitar_collection"))
 
 
 @app.route("/collections/videos")
+@conditional_page(CollectionVideo)
 def videos_collection():
     """
     Videos collection page displaying all videos.
@@ -1413,7 +4594,7 @@ def upload_collection_video():
             filename=video_filename
         )
         db.session.add(new_video)
-        db.session.commit()
+        commit_with_retry()
         
         flash("Video uploaded successfully!", "success")
         return redirect(url_for("videos_collection"))
@@ -1435,13 +4616,33 @@ def delete_collection_video(video_id):
         os.remove(video_path)
     
     db.session.delete(video)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Video deleted successfully!", "info")
     return redirect(url_for("videos_collection"))
 
 
+def collection_pagination(model, per_page=20):
+    """
+    Paginate a photo collection newest first using keyset pagination.
+
+    Args:
+        model: Collection model with created_at and id columns
+        per_page (int): Number of items per page
+
+    Returns:
+        KeysetPagination: The current page of the collection
+    """
+    return KeysetPagination(
+        model.query,
+        [model.created_at, model.id],
+        per_page=per_page,
+        count_key=(model.__tablename__,),
+    )
+
+
 @app.route("/collections/books")
+@conditional_page(BookPhoto, ImageVariant)
 def books_collection():
     """
     Books collection page displaying book photos with pagination.
@@ -1449,12 +4650,11 @@ def books_collection():
     Returns:
         Rendered collections/books.html template with book photos
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    pagination = BookPhoto.query.order_by(BookPhoto.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    pagination = collection_pagination(BookPhoto)
     
-    return render_template("collections/books.html", pagination=pagination)
+    return render_template(
+        "collections/books.html", pagination=pagination, variants=load_image_variants(pagination.items)
+    )
 
 
 @app.route("/collections/books/upload", methods=["GET", "POST"])
@@ -1472,25 +4672,12 @@ def upload_book_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("books_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        # Ensure unique filename to prevent overwrites
-        base, ext = os.path.splitext(photo_filename)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        photo_filename = f"{base}_{timestamp}{ext}"
-        
-        photo_path = os.path.join(basedir, "static", "book_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = BookPhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(BookPhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("books_collection"))
         
         flash("Book photo uploaded successfully!", "success")
         return redirect(url_for("books_collection"))
@@ -1508,27 +4695,22 @@ def delete_book_photo(book_id):
     """
     book = BookPhoto.query.get_or_404(book_id)
     
-    # Delete file
-    book_path = os.path.join(basedir, "static", "book_photos", book.filename)
-    if os.path.exists(book_path):
-        os.remove(book_path)
-    
-    db.session.delete(book)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(book))
     
     flash("Book photo deleted successfully!", "info")
     return redirect(url_for("books_collection"))
 
 
 @app.route("/collections/exercises")
+@conditional_page(ExercisePhoto, ImageVariant)
 def exercises_collection():
     """
     Exercises collection page.
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = ExercisePhoto.query.order_by(ExercisePhoto.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template("collections/exercises.html", pagination=pagination)
+    pagination = collection_pagination(ExercisePhoto)
+    return render_template(
+        "collections/exercises.html", pagination=pagination, variants=load_image_variants(pagination.items)
+    )
 
 
 @app.route("/collections/exercises/upload", methods=["GET", "POST"])
@@ -1546,25 +4728,12 @@ def upload_exercise_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("exercises_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        # Ensure unique filename to prevent overwrites
-        base, ext = os.path.splitext(photo_filename)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        photo_filename = f"{base}_{timestamp}{ext}"
-        
-        photo_path = os.path.join(basedir, "static", "exercise_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = ExercisePhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(ExercisePhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("exercises_collection"))
         
         flash("Exercise photo uploaded successfully!", "success")
         return redirect(url_for("exercises_collection"))
@@ -1579,24 +4748,21 @@ def upload_exercise_photo():
 def delete_exercise_photo(photo_id):
     """Delete an exercise photo."""
     photo = ExercisePhoto.query.get_or_404(photo_id)
-    photo_path = os.path.join(basedir, "static", "exercise_photos", photo.filename)
-    if os.path.exists(photo_path):
-        os.remove(photo_path)
-    db.session.delete(photo)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(photo))
     flash("Photo deleted successfully!", "info")
     return redirect(url_for("exercises_collection"))
 
 
 @app.route("/collections/reading-quotes")
+@conditional_page(ReadingQuotePhoto, ImageVariant)
 def reading_quotes_collection():
     """
     Reading Quotes collection page.
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = ReadingQuotePhoto.query.order_by(ReadingQuotePhoto.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template("collections/reading_quotes.html", pagination=pagination)
+    pagination = collection_pagination(ReadingQuotePhoto)
+    return render_template(
+        "collections/reading_quotes.html", pagination=pagination, variants=load_image_variants(pagination.items)
+    )
 
 
 @app.route("/collections/reading-quotes/upload", methods=["GET", "POST"])
@@ -1614,25 +4780,12 @@ def upload_reading_quote_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("reading_quotes_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        # Ensure unique filename to prevent overwrites
-        base, ext = os.path.splitext(photo_filename)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        photo_filename = f"{base}_{timestamp}{ext}"
-        
-        photo_path = os.path.join(basedir, "static", "reading_quote_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = ReadingQuotePhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(ReadingQuotePhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("reading_quotes_collection"))
         
         flash("Reading quote uploaded successfully!", "success")
         return redirect(url_for("reading_quotes_collection"))
@@ -1647,24 +4800,21 @@ def upload_reading_quote_photo():
 def delete_reading_quote_photo(photo_id):
     """Delete a reading quote photo."""
     photo = ReadingQuotePhoto.query.get_or_404(photo_id)
-    photo_path = os.path.join(basedir, "static", "reading_quote_photos", photo.filename)
-    if os.path.exists(photo_path):
-        os.remove(photo_path)
-    db.session.delete(photo)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(photo))
     flash("Photo deleted successfully!", "info")
     return redirect(url_for("reading_quotes_collection"))
 
 
 @app.route("/collections/intellectual-masturbation")
+@conditional_page(IntellectualPhoto, ImageVariant)
 def intellectual_collection():
     """
     Intellectual Masturbation collection page.
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = IntellectualPhoto.query.order_by(IntellectualPhoto.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template("collections/intellectual_masturbation.html", pagination=pagination)
+    pagination = collection_pagination(IntellectualPhoto)
+    return render_template(
+        "collections/intellectual_masturbation.html", pagination=pagination, variants=load_image_variants(pagination.items)
+    )
 
 
 @app.route("/collections/intellectual-masturbation/upload", methods=["GET", "POST"])
@@ -1682,25 +4832,12 @@ def upload_intellectual_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("intellectual_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        # Ensure unique filename to prevent overwrites
-        base, ext = os.path.splitext(photo_filename)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        photo_filename = f"{base}_{timestamp}{ext}"
-        
-        photo_path = os.path.join(basedir, "static", "intellectual_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = IntellectualPhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(IntellectualPhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("intellectual_collection"))
         
         flash("Intellectual masturbation photo uploaded successfully!", "success")
         return redirect(url_for("intellectual_collection"))
@@ -1715,24 +4852,21 @@ def upload_intellectual_photo():
 def delete_intellectual_photo(photo_id):
     """Delete an intellectual masturbation photo."""
     photo = IntellectualPhoto.query.get_or_404(photo_id)
-    photo_path = os.path.join(basedir, "static", "intellectual_photos", photo.filename)
-    if os.path.exists(photo_path):
-        os.remove(photo_path)
-    db.session.delete(photo)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(photo))
     flash("Photo deleted successfully!", "info")
     return redirect(url_for("intellectual_collection"))
 
 
 @app.route("/collections/fragmented-quotes")
+@conditional_page(FragmentedQuotePhoto, ImageVariant)
 def fragmented_quotes_collection():
     """
     Fragmented Quotes collection page.
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    pagination = FragmentedQuotePhoto.query.order_by(FragmentedQuotePhoto.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template("collections/fragmented_quotes.html", pagination=pagination)
+    pagination = collection_pagination(FragmentedQuotePhoto)
+    return render_template(
+        "collections/fragmented_quotes.html", pagination=pagination, variants=load_image_variants(pagination.items)
+    )
 
 
 @app.route("/collections/fragmented-quotes/upload", methods=["GET", "POST"])
@@ -1750,25 +4884,12 @@ def upload_fragmented_quote_photo():
             flash("Title and photo file are required!", "error")
             return redirect(url_for("fragmented_quotes_collection"))
         
-        # Save photo file
-        photo_filename = secure_filename(photo_file.filename)
-        # Ensure unique filename to prevent overwrites
-        base, ext = os.path.splitext(photo_filename)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        photo_filename = f"{base}_{timestamp}{ext}"
-        
-        photo_path = os.path.join(basedir, "static", "fragmented_quote_photos", photo_filename)
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        photo_file.save(photo_path)
-        
-        # Create database entry
-        new_photo = FragmentedQuotePhoto(
-            title=title,
-            description=description,
-            filename=photo_filename
-        )
-        db.session.add(new_photo)
-        db.session.commit()
+        # Stored once per content, so identical photos share a file
+        try:
+            add_media(FragmentedQuotePhoto, photo_file, title=title, description=description)
+        except ValueError as e:
+            flash(f"{e}.", "error")
+            return redirect(url_for("fragmented_quotes_collection"))
         
         flash("Fragmented quote uploaded successfully!", "success")
         return redirect(url_for("fragmented_quotes_collection"))
@@ -1783,11 +4904,7 @@ def upload_fragmented_quote_photo():
 def delete_fragmented_quote_photo(photo_id):
     """Delete a fragmented quote photo."""
     photo = FragmentedQuotePhoto.query.get_or_404(photo_id)
-    photo_path = os.path.join(basedir, "static", "fragmented_quote_photos", photo.filename)
-    if os.path.exists(photo_path):
-        os.remove(photo_path)
-    db.session.delete(photo)
-    db.session.commit()
+    commit_with_retry(lambda: delete_media(photo))
     flash("Photo deleted successfully!", "info")
     return redirect(url_for("fragmented_quotes_collection"))
 
@@ -1796,23 +4913,56 @@ def delete_fragmented_quote_photo(photo_id):
 
 
 @app.route("/blogs")
+@conditional_page(Post, Label, Like, Comment)
+@cached_page(Post, Label, Like, Comment)
 def blog_index():
     """
-    Display all blog posts.
+    Display blog posts, newest first, optionally filtered by label.
     """
     label_name = request.args.get('label')
+    # The list shows the stored excerpt and no labels, so skip loading the full
+    # content and the eager subquery load of Post.labels
+    query = Post.query.options(db.defer(Post.content), db.lazyload(Post.labels))
+    count_key = ("post",)
     if label_name:
         label = Label.query.filter_by(name=label_name).first()
-        if label:
-            # Sort posts by date descending
-            posts = sorted(label.posts, key=lambda x: x.created_at, reverse=True)
-        else:
-            posts = []
-    else:
-        posts = Post.query.order_by(Post.created_at.desc()).all()
-    
-    all_labels = Label.query.order_by(Label.name).all()
-    return render_template("blogs/index.html", posts=posts, labels=all_labels, current_label=label_name)
+        # An unknown label matches no posts
+        label_id = label.id if label else None
+        query = query.join(post_labels, post_labels.c.post_id == Post.id).filter(post_labels.c.label_id == label_id)
+        # By id, so made-up ?label= values share one cache entry
+        count_key = ("post", "label", label_id)
+    pagination = KeysetPagination(query, [Post.created_at, Post.id], per_page=20, count_key=count_key)
+
+    return render_template(
+        "blogs/index.html",
+        posts=pagination.items,
+        pagination=pagination,
+        labels=label_post_counts(),
+        current_label=label_name,
+    )
+
+
+@app.route("/search")
+def search():
+    """
+    Search blog posts and show ranked results with highlighted snippets.
+    """
+    query_text = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = 20
+
+    results = []
+    if query_text:
+        results = search_posts(query_text, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(results) > per_page
+
+    return render_template(
+        "blogs/search.html",
+        query=query_text,
+        results=results[:per_page],
+        page=page,
+        has_next=has_next,
+    )
 
 
 def get_media_type(filename):
@@ -1876,7 +5026,7 @@ def create():
             labels=post_labels
         )
         db.session.add(new_post)
-        db.session.commit()
+        commit_with_retry()
 
         flash("Post created successfully!", "success")
         return redirect(url_for("blog_index"))
@@ -1885,12 +5035,18 @@ def create():
 
 
 @app.route("/posts/<int:post_id>")
+@conditional_page(Post, Label, Like, Comment, User)
+@cached_page(Post, Label, Like, Comment, User)
 def post(post_id):
     """
     Display a single blog post.
     """
     post = Post.query.get_or_404(post_id)
-    return render_template("blogs/post.html", post=post)
+    user_liked = (
+        current_user.is_authenticated
+        and Like.query.filter_by(user_id=current_user.id, post_id=post_id).first() is not None
+    )
+    return render_template("blogs/post.html", post=post, user_liked=user_liked)
 
 
 @app.route("/<int:post_id>/edit", methods=["GET", "POST"])
@@ -1941,7 +5097,7 @@ def edit(post_id):
                     db.session.add(label)
                 post.labels.append(label)
 
-        db.session.commit()
+        commit_with_retry()
 
         flash("Post updated successfully!", "success")
         return redirect(url_for("post", post_id=post.id))
@@ -1963,7 +5119,7 @@ def delete(post_id):
             os.remove(file_path)
 
     db.session.delete(post)
-    db.session.commit()
+    commit_with_retry()
 
     flash(f'Post "{post.title}" was successfully deleted.', "info")
     return redirect(url_for("blog_index"))
@@ -2003,7 +5159,7 @@ def add_comment(post_id):
         
     comment = Comment(content=content, user_id=current_user.id, post_id=post_id)
     db.session.add(comment)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Comment added!", "success")
     return redirect(url_for("post", post_id=post_id))
@@ -2019,7 +5175,7 @@ def delete_comment(comment_id):
         
     post_id = comment.post_id
     db.session.delete(comment)
-    db.session.commit()
+    commit_with_retry()
     
     flash("Comment deleted.", "info")
     return redirect(url_for("post", post_id=post_id))
@@ -2032,12 +5188,12 @@ def like_post(post_id):
     
     if like:
         db.session.delete(like)
-        db.session.commit()
+        commit_with_retry()
         flash("Unliked.", "info")
     else:
         like = Like(user_id=current_user.id, post_id=post_id)
         db.session.add(like)
-        db.session.commit()
+        commit_with_retry()
         flash("Liked!", "success")
         
     return redirect(url_for("post", post_id=post_id))
@@ -2060,7 +5216,7 @@ def contact():
         
         message = Message(name=name, email=email, content=content, user_id=user_id)
         db.session.add(message)
-        db.session.commit()
+        commit_with_retry()
         
         flash("Message sent! We will get back to you soon.", "success")
         return redirect(url_for("contact"))
@@ -2084,7 +5240,7 @@ def update_user_role(user_id):
     
     if new_role in ["admin", "member", "reader"]:
         user.role = new_role
-        db.session.commit()
+        commit_with_retry()
         flash(f"User {user.username} role updated to {new_role}.", "success")
     else:
         flash("Invalid role selected.", "error")
@@ -2100,7 +5256,7 @@ def delete_user(user_id):
         return redirect(url_for("admin_users"))
         
     db.session.delete(user)
-    db.session.commit()
+    commit_with_retry()
     flash(f"User {user.username} deleted.", "info")
     return redirect(url_for("admin_users"))
 
@@ -2110,6 +5266,62 @@ def admin_messages():
     messages = Message.query.order_by(Message.created_at.desc()).all()
     return render_template("admin/messages.html", messages=messages)
 
+@app.route("/admin/page-cache")
+@admin_required
+def admin_page_cache():
+    """
+    Page cache hit/miss counters for this worker process.
+    """
+    lookups = page_cache_stats["hits"] + page_cache_stats["misses"]
+    return jsonify({
+        "stores": [type(store).__name__ for store in page_cache_stores],
+        "hit_rate": round(page_cache_stats["hits"] / lookups, 3) if lookups else None,
+        "memory_bytes": sum(store.size for store in page_cache_stores if isinstance(store, MemoryPageStore)),
+        **page_cache_stats,
+    })
+
+@app.route("/admin/image-cache")
+@admin_required
+def admin_image_cache():
+    """
+    On-demand image counters for this worker process.
+    """
+    return jsonify({
+        "directory": image_cache.directory,
+        "max_bytes": image_cache.max_bytes,
+        "size": image_cache.size,
+        **image_cache_stats,
+    })
+
+@app.route("/admin/query-cache")
+@admin_required
+def admin_query_cache():
+    """
+    Query cache hit/miss counters and cached entries for this worker process.
+    """
+    lookups = query_cache_stats["hits"] + query_cache_stats["misses"]
+    now = time.time()
+    return jsonify({
+        "hit_rate": round(query_cache_stats["hits"] / lookups, 3) if lookups else None,
+        "entries": [
+            {"query": name, "args": repr(args), "tables": sorted(tables), "rows": len(snapshot),
+             "age": round(now - loaded_at, 1)}
+            for (name, args), (tables, snapshot, loaded_at, _) in list(_query_cache.items())
+        ],
+        **query_cache_stats,
+    })
+
+@app.route("/admin/page-cache/clear", methods=["POST"])
+@admin_required
+def clear_page_cache():
+    if page_cache_stores:
+        page_cache_stores[-1].bump_versions([ALL_PAGES])
+    for store in page_cache_stores:
+        store.clear()
+    invalidate_cached_queries()
+    flash("Page cache cleared.", "success")
+    return redirect(request.referrer or url_for("index"))
+
 
 # --- Project Management Routes ---
 
@@ -2176,7 +5388,7 @@ def add_project():
             image_filename=image_filename,  # Save the filename to the database
         )
         db.session.add(new_project)
-        db.session.commit()
+        commit_with_retry()
 
         flash("Project added successfully!", "success")
         return redirect(url_for("index"))
@@ -2203,16 +5415,247 @@ os.makedirs(BLOG_UPLOAD_FOLDER, exist_ok=True)
 
 
 
+# --- Sitemaps ---
+# /sitemap.xml is an index of child sitemaps: the fixed pages, posts by year,
+# gallery pages by year (with their images), collections and library
+# categories. A child is streamed from column-only queries the first time and
+# then served from memory until data_version shows one of its tables changed.
+
+SITEMAP_FIXED_PAGES = [
+    # (endpoint, changefreq, priority)
+    ("index", "weekly", "1.0"),
+    ("blog_index", "daily", "0.9"),
+    ("gallery", "weekly", "0.8"),
+    ("collections", "weekly", "0.8"),
+    ("library_index", "weekly", "0.7"),
+    ("ideas", "monthly", "0.6"),
+    ("lab", "monthly", "0.6"),
+    ("about", "monthly", "0.8"),
+    ("contact", "monthly", "0.5"),
+]
+# Every table a sitemap reads, for the ETag of the sitemap routes
+SITEMAP_MODELS = [Post, Photo, Book, CategoryIcon, CollectionStats, *COLLECTION_MODELS]
+SITEMAP_TABLES = sorted(model.__table__.name for model in SITEMAP_MODELS)
+COLLECTION_SITEMAP_TABLES = sorted(model.__table__.name for model in [CollectionStats, *COLLECTION_MODELS])
+
+_sitemap_cache = {}  # sitemap name -> (table versions, body)
+
+
+def _w3c_datetime(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ") if value else None
+
+
+def _sitemap_url(loc, lastmod=None, changefreq=None, priority=None, images=()):
+    """Render one <url> element."""
+    parts = [f"<url><loc>{escape(loc)}</loc>"]
+    if lastmod:
+        parts.append(f"<lastmod>{_w3c_datetime(lastmod)}</lastmod>")
+    if changefreq:
+        parts.append(f"<changefreq>{changefreq}</changefreq>")
+    if priority:
+        parts.append(f"<priority>{priority}</priority>")
+    for image in images:
+        parts.append(f"<image:image><image:loc>{escape(image)}</image:loc></image:image>")
+    parts.append("</url>\n")
+    return "".join(parts)
+
+
+def _sitemap_urlset(urls):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+           'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n')
+    yield from urls
+    yield "</urlset>\n"
+
+
+def _year_bounds(year):
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def sitemap_children():
+    """
+    List the child sitemaps with the newest change each one covers.
+
+    Returns:
+        list: (name, lastmod) tuples
+    """
+    post_years = index_years(Post.created_at)
+    photo_years = []
+    for year, _ in index_years(Photo.taken_at):
+        # Filed by capture time, changed when uploaded
+        start, end = _year_bounds(year)
+        photo_years.append((year, db.session.scalar(
+            db.select(db.func.max(Photo.created_at)).where(Photo.taken_at >= start, Photo.taken_at < end)
+        )))
+    collections_lastmod = db.session.scalar(db.select(db.func.max(CollectionStats.last_update)))
+    library_lastmod = db.session.scalar(
+        db.select(db.func.max(Book.upload_date)).where(Book.is_public.is_(True))
+    )
+
+    children = [("pages", None)]
+    children += [(f"posts-{year}", lastmod) for year, lastmod in post_years]
+    children += [(f"gallery-{year}", lastmod) for year, lastmod in photo_years]
+    children.append(("collections", collections_lastmod))
+    children.append(("library", library_lastmod))
+    return children
+
+
+def _generate_sitemap_index():
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for name, lastmod in sitemap_children():
+        loc = escape(url_for("sitemap_child", name=name, _external=True))
+        lastmod_tag = f"<lastmod>{_w3c_datetime(lastmod)}</lastmod>" if lastmod else ""
+        yield f"<sitemap><loc>{loc}</loc>{lastmod_tag}</sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def _generate_pages_sitemap():
+    return _sitemap_urlset(
+        _sitemap_url(url_for(endpoint, _external=True), changefreq=changefreq, priority=priority)
+        for endpoint, changefreq, priority in SITEMAP_FIXED_PAGES
+    )
+
+
+def _generate_posts_sitemap(year):
+    start, end = _year_bounds(year)
+    rows = db.session.execute(
+        db.select(Post.id, Post.created_at)
+        .where(Post.created_at >= start, Post.created_at < end)
+        .order_by(Post.created_at.desc())
+        .execution_options(yield_per=500)
+    )
+    return _sitemap_urlset(
+        _sitemap_url(url_for("post", post_id=row.id, _external=True), row.created_at, "monthly", "0.7")
+        for row in rows
+    )
+
+
+def _generate_gallery_sitemap(year):
+    """One <url> per gallery page of the year, listing the photos it shows."""
+    start, end = _year_bounds(year)
+    rows = db.session.execute(
+        db.select(Photo.filename, Photo.sha256, Photo.created_at)
+        .where(Photo.taken_at >= start, Photo.taken_at < end)
+        .order_by(Photo.taken_at.desc(), Photo.id.desc())
+        .execution_options(yield_per=500)
+    )
+
+    def urls():
+        page, images, lastmod = 1, [], None
+        for row in rows:
+            source = stored_media_path(MEDIA_ROOTS[Photo], row.filename, row.sha256)
+            images.append(url_for("static", filename=source, _external=True))
+            lastmod = max(filter(None, [lastmod, row.created_at]), default=None)
+            if len(images) == GALLERY_PER_PAGE:
+                yield _sitemap_url(_gallery_page_url(year, page), lastmod, "monthly", "0.6", images)
+                page, images, lastmod = page + 1, [], None
+        if images:
+            yield _sitemap_url(_gallery_page_url(year, page), lastmod, "monthly", "0.6", images)
+
+    return _sitemap_urlset(urls())
+
+
+def _gallery_page_url(year, page):
+    if page == 1:
+        return url_for("gallery", year=year, _external=True)
+    return url_for("gallery", year=year, page=page, _external=True)
+
+
+def _generate_collections_sitemap():
+    stats = dict(db.session.execute(db.select(CollectionStats.key, CollectionStats.last_update)).all())
+    return _sitemap_urlset(
+        [_sitemap_url(url_for("collections", _external=True), max(filter(None, stats.values()), default=None),
+                      "weekly", "0.8")]
+        + [
+            _sitemap_url(url_for(collection["route"], _external=True), stats.get(collection["key"]), "weekly", "0.7")
+            for collection in COLLECTION_DEFINITIONS
+        ]
+    )
+
+
+def _generate_library_sitemap():
+    # Only public books count, as visitors and crawlers can't see the others
+    newest = dict(db.session.execute(
+        db.select(Book.category, db.func.max(Book.upload_date))
+        .where(Book.is_public.is_(True))
+        .group_by(Book.category)
+    ).all())
+    categories = [category.name for category in library_categories()]
+    return _sitemap_urlset(chain(
+        [_sitemap_url(url_for("library_index", _external=True), max(newest.values(), default=None), "weekly", "0.7")],
+        (
+            _sitemap_url(url_for("library_category", category=name, _external=True), newest.get(name), "weekly", "0.6")
+            for name in categories
+        ),
+    ))
+
+
+def cached_sitemap(name, tables, generate):
+    """
+    Serve a sitemap from memory, or stream it and keep the result.
+
+    Args:
+        name (str): Cache key
+        tables (list): Tables the sitemap reads; a change to any of them regenerates it
+        generate: Function returning an iterable of XML strings
+
+    Returns:
+        Response: application/xml response
+    """
+    versions = {row.name: row.version for row in data_versions(tables)}
+    cached = _sitemap_cache.get(name)
+    if cached is not None and cached[0] == versions:
+        return Response(cached[1], mimetype="application/xml")
+
+    def stream():
+        chunks = []
+        for chunk in generate():
+            chunks.append(chunk)
+            yield chunk
+        _sitemap_cache[name] = (versions, "".join(chunks).encode("utf-8"))
+
+    return Response(stream_with_context(stream()), mimetype="application/xml")
+
+
 @app.route("/sitemap.xml")
+@conditional_page(*SITEMAP_MODELS)
 def sitemap():
     """
-    Generate sitemap.xml dynamically.
-    """
-    posts = Post.query.order_by(Post.created_at.desc()).all()
-    template = render_template("sitemap.xml", posts=posts)
-    response = make_response(template)
-    response.headers["Content-Type"] = "application/xml"
-    return response
+    Sitemap index pointing at the child sitemaps.
+    """
+    return cached_sitemap("index", SITEMAP_TABLES, _generate_sitemap_index)
+
+
+@app.route("/sitemaps/<name>.xml")
+@conditional_page(*SITEMAP_MODELS)
+def sitemap_child(name):
+    """
+    One child sitemap: pages, posts-<year>, gallery-<year>, collections or library.
+    Only the names the sitemap index lists exist, so invented years (and other
+    spellings of real ones) are 404s rather than new _sitemap_cache entries.
+    """
+    kind, _, year = name.partition("-")
+    generators = {
+        ("pages", False): (_generate_pages_sitemap, []),
+        ("posts", True): (lambda: _generate_posts_sitemap(int(year)), ["post"]),
+        ("gallery", True): (lambda: _generate_gallery_sitemap(int(year)), ["photo"]),
+        ("collections", False): (_generate_collections_sitemap, COLLECTION_SITEMAP_TABLES),
+        ("library", False): (_generate_library_sitemap, ["book", "category_icon"]),
+    }
+    if (kind, bool(year)) not in generators:
+        abort(404)
+    if year:
+        # A year the index lists has rows in it: one index seek, where
+        # sitemap_children() walks every year
+        if not re.fullmatch(r"[12][0-9]{3}", year):
+            abort(404)
+        column = {"posts": Post.created_at, "gallery": Photo.taken_at}[kind]
+        start, end = _year_bounds(int(year))
+        if not db.session.scalar(db.select(db.exists().where(column >= start, column < end))):
+            abort(404)
+    generate, tables = generators[(kind, bool(year))]
+    return cached_sitemap(name, tables, generate)
 
 
 @app.route("/robots.txt")
@@ -2238,7 +5681,7 @@ def upload_photo():
     Handle photo uploads for the gallery.
 
     GET: Redirect to gallery page
-    POST: Process uploaded photo, optimize it, and save to database
+    POST: Store uploaded photo and queue it for resizing (see add_media)
 
     Returns:
         Redirect response to gallery page
@@ -2262,98 +5705,25 @@ def upload_photo():
             filename_without_ext = os.path.splitext(secure_filename(file.filename))[0]
             title = filename_without_ext.replace("_", " ").replace("-", " ").title()
 
-        # Get current year for folder organization
-        current_date = datetime.now()
-        current_year = current_date.year
-        
-        # Create year directory if it doesn't exist
-        year_dir = os.path.join(app.config["PHOTO_UPLOAD_FOLDER"], str(current_year))
-        os.makedirs(year_dir, exist_ok=True)
-
-        # Save and resize the file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(year_dir, filename)
-
-        # Save original file temporarily
-        file.save(file_path)
-
+        # Stored in the blob store; resizing, thumbnails and reading the
+        # capture time from EXIF happen in an image worker. Until then the
+        # photo is dated by its upload time.
         try:
-            # Open and resize the image
-            with Image.open(file_path) as img:
-                # Convert to RGB if necessary (for PNG with transparency)
-                if img.mode in ("RGBA", "LA", "P"):
-                    img = img.convert("RGB")
-
-                # Calculate new dimensions while maintaining aspect ratio
-                max_width = 1200  # Optimal for web display
-                max_height = 800
-
-                # Get current dimensions
-                width, height = img.size
-
-                # Calculate new dimensions
-                if width > max_width or height > max_height:
-                    # Calculate scaling factor
-                    width_ratio = max_width / width
-                    height_ratio = max_height / height
-                    scale_factor = min(width_ratio, height_ratio)
-
-                    # Calculate new dimensions
-                    new_width = int(width * scale_factor)
-                    new_height = int(height * scale_factor)
-
-                    # Resize image
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    # Save optimized version (overwrite original)
-                    img.save(file_path, "JPEG", quality=85, optimize=True)
-
-                    flash(
-                        f"Photo uploaded and optimized! Original: {width}x{height}, Optimized: {new_width}x{new_height}",
-                        "success",
-                    )
-                else:
-                    # Image is already small enough, just optimize
-                    img.save(file_path, "JPEG", quality=85, optimize=True)
-                    flash("Photo uploaded successfully!", "success")
-            
-            # Generate Thumbnail
-            with Image.open(file_path) as img:
-                if img.mode in ("RGBA", "LA", "P"):
-                    img = img.convert("RGB")
-                
-                # Create thumbnail directory
-                thumb_year_dir = os.path.join(app.config["PHOTO_UPLOAD_FOLDER"], "thumbnails", str(current_year))
-                os.makedirs(thumb_year_dir, exist_ok=True)
-                
-                thumb_path = os.path.join(thumb_year_dir, filename)
-                
-                img.thumbnail((400, 400))
-                img.save(thumb_path, "JPEG", quality=80, optimize=True)
-
-        except Exception as e:
-            flash(f"Error processing image: {str(e)}", "error")
+            new_photo = add_media(
+                Photo, file, title=title, description=description, **photo_dates(datetime.now())
+            )
+        except ValueError as e:
+            flash(f"{e}.", "error")
             return redirect(url_for("gallery"))
 
-        # Auto-generate month from current date (format: "nov23", "dec23", etc.)
-        month_abbr = current_date.strftime("%b").lower()  # "nov", "dec", etc.
-        year_short = current_date.strftime("%y")  # "23", "24", etc.
-        auto_month = f"{month_abbr}{year_short}"
-
-        # Create photo record
-        # Store filename as "year/filename"
-        db_filename = f"{current_year}/{filename}"
-        
-        new_photo = Photo(
-            title=title,
-            description=description,
-            filename=db_filename,
-            month=auto_month,
-            year=current_year,
-        )
-        db.session.add(new_photo)
-        db.session.commit()
-
+        # With IMAGE_WORKERS = 0 the job has already finished, in its own session
+        db.session.refresh(new_photo)
+        if new_photo.status == "failed":
+            flash("Error processing image. It is saved but couldn't be resized; try uploading it again.", "error")
+        elif new_photo.status == "processing":
+            flash("Photo uploaded! It will appear in the gallery once it has been resized.", "success")
+        else:
+            flash("Photo uploaded successfully!", "success")
         return redirect(url_for("gallery"))
 
     return redirect(url_for("gallery"))
@@ -2373,14 +5743,8 @@ def delete_photo(photo_id):
     """
     photo = Photo.query.get_or_404(photo_id)
 
-    # Delete the file from filesystem
-    file_path = os.path.join(app.config["PHOTO_UPLOAD_FOLDER"], photo.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
-    # Delete from database
-    db.session.delete(photo)
-    db.session.commit()
+    # Delete from database, and the file unless another row shares it
+    commit_with_retry(lambda: delete_media(photo))
 
     flash(f'Photo "{photo.title}" was successfully deleted.', "info")
     return redirect(url_for("gallery"))
@@ -90,7 +90,16 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # FTS5 search tables are created with raw SQL and are not in the models,
+    # so keep autogenerate from dropping them
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == "table" and reflected and compare_to is None and "_fts" in name:
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
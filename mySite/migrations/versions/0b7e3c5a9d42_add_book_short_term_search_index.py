@@ -0,0 +1,44 @@
+"""Add book short-term search index
+
+Revision ID: 0b7e3c5a9d42
+Revises: 6a2d9e4b7f10
+Create Date: 2026-10-22 10:36:41.902518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e3c5a9d42'
+down_revision = '6a2d9e4b7f10'
+branch_labels = None
+depends_on = None
+
+
+def short_grams(*texts):
+    """Same as short_grams() in app.py."""
+    grams = set()
+    for text in texts:
+        for word in (text or "").lower().split():
+            grams.update(word)
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(sorted(gram.encode("utf-8").hex() for gram in grams))
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS book_grams "
+               "USING fts5(grams, tokenize='ascii', detail='none')")
+
+    # Index the existing books
+    connection = op.get_bind()
+    books = connection.execute(sa.text("SELECT id, title, author, category FROM book")).fetchall()
+    for book_id, title, author, category in books:
+        connection.execute(
+            sa.text("INSERT INTO book_grams (rowid, grams) VALUES (:id, :grams)"),
+            {"id": book_id, "grams": short_grams(title, author, category)},
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS book_grams")
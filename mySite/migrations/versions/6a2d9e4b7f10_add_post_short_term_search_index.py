@@ -0,0 +1,44 @@
+"""Add post short-term search index
+
+Revision ID: 6a2d9e4b7f10
+Revises: 8e3f1a7c5d29
+Create Date: 2026-10-22 09:12:05.381647
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2d9e4b7f10'
+down_revision = '8e3f1a7c5d29'
+branch_labels = None
+depends_on = None
+
+
+def short_grams(*texts):
+    """Same as short_grams() in app.py."""
+    grams = set()
+    for text in texts:
+        for word in (text or "").lower().split():
+            grams.update(word)
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return " ".join(sorted(gram.encode("utf-8").hex() for gram in grams))
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS post_grams "
+               "USING fts5(grams, tokenize='ascii', detail='none')")
+
+    # Index the existing posts from their already stripped text in post_fts
+    connection = op.get_bind()
+    posts = connection.execute(sa.text("SELECT rowid, title, body FROM post_fts")).fetchall()
+    for post_id, title, body in posts:
+        connection.execute(
+            sa.text("INSERT INTO post_grams (rowid, grams) VALUES (:id, :grams)"),
+            {"id": post_id, "grams": short_grams(title, body)},
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS post_grams")
@@ -0,0 +1,36 @@
+"""Add post full-text search index
+
+Revision ID: b2d6f8a1c935
+Revises: 7c9d0e2f4a61
+Create Date: 2026-10-18 13:41:52.790133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from bs4 import BeautifulSoup
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6f8a1c935'
+down_revision = '7c9d0e2f4a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+               "USING fts5(title, body, tokenize='trigram')")
+
+    # Index the existing posts with their HTML stripped
+    connection = op.get_bind()
+    posts = connection.execute(sa.text("SELECT id, title, content FROM post")).fetchall()
+    for post_id, title, content in posts:
+        body = " ".join(BeautifulSoup(content or "", "html.parser").get_text(" ").split())
+        connection.execute(
+            sa.text("INSERT INTO post_fts (rowid, title, body) VALUES (:id, :title, :body)"),
+            {"id": post_id, "title": title, "body": body},
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS post_fts")
@@ -0,0 +1,29 @@
+"""Add book full-text search index
+
+Revision ID: e5a07b3c9d12
+Revises: b2d6f8a1c935
+Create Date: 2026-10-18 15:02:37.418265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a07b3c9d12'
+down_revision = 'b2d6f8a1c935'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS book_fts "
+               "USING fts5(title, author, category, tokenize='trigram')")
+
+    # Index the existing books
+    op.execute("INSERT INTO book_fts (rowid, title, author, category) "
+               "SELECT id, title, COALESCE(author, ''), category FROM book")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS book_fts")
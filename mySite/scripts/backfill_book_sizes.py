@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Re-read the file size of every book in the library.
+
+Sizes are recorded when a book is added (upload or scripts/import_books.py)
+and shown per category on the category admin page. Run this after replacing
+or restoring book files directly on disk.
+
+Usage:
+    python scripts/backfill_book_sizes.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import app, backfill_book_sizes
+
+
+def main():
+    start = time.perf_counter()
+    with app.app_context():
+        updated = backfill_book_sizes()
+    print(f"✅ Updated {updated} books in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Recompute the stored excerpt, plain text length and reading time of every post.
+
+These are set automatically whenever a post's content is assigned (create,
+edit and the import scripts). Run this after editing post content directly in
+the database or after changing the excerpt/reading time rules in app.py.
+
+Usage:
+    python scripts/backfill_post_summaries.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import app, backfill_post_summaries
+
+
+def main():
+    start = time.perf_counter()
+    with app.app_context():
+        updated = backfill_post_summaries()
+    print(f"✅ Updated {updated} posts in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Bytes and time saved by conditional GETs (ETag / Last-Modified).
+
+Requests each page once like a first visit, then again with the ETag (and
+separately the Last-Modified date) it returned, like a browser revalidating
+its copy. Prints the bytes and time of both and exits with status 1 if a
+revalidation of an unchanged page doesn't get a 304.
+
+The page cache is turned off so the first request shows the full render cost.
+The pages are served from a temporary copy of the database (mySite/database.db
+unless --database names another), migrated to the latest schema, so the
+original is never opened for writing.
+
+Usage:
+    python scripts/benchmark_conditional_get.py [--repeat 5] [--database path/to/database.db]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database.db")
+
+PAGES = [
+    "/blogs",
+    "/posts/{post_id}",
+    "/gallery",
+    "/gallery?page=2",
+    "/collections",
+    "/collections/guitar",
+    "/collections/videos",
+    "/collections/books",
+    "/collections/exercises",
+    "/collections/reading-quotes",
+    "/collections/intellectual-masturbation",
+    "/collections/fragmented-quotes",
+]
+
+
+def timed_get(client, path, headers, repeat):
+    """Return (response, median milliseconds) for ``repeat`` identical GETs."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+    return response, statistics.median(samples)
+
+
+def copy_database(source, target):
+    """Snapshot a SQLite database with the backup API, which is safe while the site writes to it."""
+    original = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    copy = sqlite3.connect(target)
+    try:
+        original.backup(copy)
+    finally:
+        copy.close()
+        original.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes saved by conditional GETs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", help="SQLite database to copy instead of mySite/database.db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        # The engine profile's journal_mode and any writes a page makes stay in the copy
+        copy_database(os.path.abspath(args.database or DEFAULT_DATABASE), db_path)
+        os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+        os.environ["PAGE_CACHE_STORES"] = ""
+        failures = measure(args.repeat)
+    if failures:
+        sys.exit(1)
+
+
+def measure(repeat):
+    """
+    Request every page and print its full and revalidated cost.
+
+    Returns:
+        int: Number of pages not answered with 304 when unchanged
+    """
+    from flask_migrate import upgrade
+    from mySite.app import app, Post
+
+    with app.app_context():
+        # The copy may predate the latest migrations
+        upgrade(directory=os.path.join(os.path.dirname(DEFAULT_DATABASE), "migrations"))
+        post = Post.query.order_by(Post.created_at.desc()).first()
+    client = app.test_client()
+
+    print(f"{'page':<40}{'200 bytes':>11}{'200 ms':>9}{'304 bytes':>11}{'304 ms':>9}  If-Modified-Since")
+    print("-" * 98)
+    full_total = revalidate_total = failures = 0
+    for template in PAGES:
+        if "{post_id}" in template and post is None:
+            continue
+        path = template.format(post_id=post.id if post else 0)
+
+        first, full_ms = timed_get(client, path, {}, repeat)
+        etag = first.headers.get("ETag")
+        last_modified = first.headers.get("Last-Modified")
+        revalidated, revalidate_ms = timed_get(client, path, {"If-None-Match": etag or ""}, repeat)
+        by_date = client.get(path, headers={"If-Modified-Since": last_modified or ""})
+
+        # A 304 still carries its status line and headers
+        full_bytes = len(first.data) + len(str(first.headers))
+        revalidate_bytes = len(revalidated.data) + len(str(revalidated.headers))
+        ok = first.status_code == 200 and revalidated.status_code == 304 and by_date.status_code == 304
+        failures += not ok
+        full_total += full_bytes
+        revalidate_total += revalidate_bytes
+        print(
+            f"{'✅' if ok else '❌'} {path:<37}{full_bytes:>11}{full_ms:>8.1f} {revalidate_bytes:>11}"
+            f"{revalidate_ms:>8.1f}  {by_date.status_code}"
+        )
+
+    print("-" * 98)
+    if full_total:
+        saved = full_total - revalidate_total
+        print(f"Revalidating every page: {revalidate_total} bytes instead of {full_total} "
+              f"({saved} bytes, {saved / full_total:.1%} saved)")
+    if failures:
+        print(f"❌ {failures} page(s) not answered with 304 when unchanged")
+    else:
+        print("✅ All unchanged pages answered with 304")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Image bytes a browser downloads per gallery and collection page, before and
+after responsive copies (srcset/<picture>).
+
+Builds a scratch database and static folder with synthetic photos (gallery
+photos as upload_photo() leaves them, 1200px plus a 400px thumbnail;
+collection photos as phone-sized originals), renders each page once without
+ImageVariant rows (the plain <img> markup) and once after
+generate_image_variants(), and for each viewport picks the image a browser
+would: the first <source> of a supported type, then the smallest srcset
+candidate covering the slot width from ``sizes`` times the device pixel ratio.
+
+The gallery's "before" is its 400px thumbnails, smaller than the grid slot on
+every viewport here, so its bytes go up in exchange for sharp images.
+
+Usage:
+    python scripts/benchmark_image_bytes.py [--photos 10] [--no-webp]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# (name, CSS viewport width, device pixel ratio)
+VIEWPORTS = [
+    ("phone", 390, 3),
+    ("tablet", 820, 2),
+    ("laptop", 1440, 1),
+]
+
+PAGES = [
+    "/gallery",
+    "/collections/guitar",
+    "/collections/books",
+    "/collections/exercises",
+    "/collections/reading-quotes",
+    "/collections/intellectual-masturbation",
+    "/collections/fragmented-quotes",
+]
+
+
+def synthetic_photo(rng, size):
+    """
+    A photo-like RGB image: fractal detail in each channel plus sensor-like
+    noise, so it compresses about as well as a real photo (a 12MP one is
+    roughly 2.7 MB as JPEG quality 90).
+    """
+    from PIL import Image
+
+    width, height = size
+    channels = []
+    for _ in range(3):
+        x, y, r = rng.uniform(-0.8, -0.7), rng.uniform(0.05, 0.2), rng.uniform(0.02, 0.05)
+        extent = (x - r, y - r * height / width, x + r, y + r * height / width)
+        channel = Image.effect_mandelbrot((width // 2, height // 2), extent, 100)
+        channels.append(channel.resize(size, Image.Resampling.BICUBIC))
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    return Image.blend(Image.merge("RGB", channels), noise, 0.08)
+
+
+def create_photos(m, static_dir, count, rng):
+    """Insert ``count`` photos per model, with files laid out like the upload routes do."""
+    from PIL import Image
+
+    # A few distinct images per size, reused in different orientations, as
+    # rendering them is the slow part
+    bases = {size: [synthetic_photo(rng, size) for _ in range(2)] for size in [(1200, 800), (4032, 3024)]}
+    for model, root in m.MEDIA_ROOTS.items():
+        for i in range(count):
+            if model is m.Photo:
+                filename = f"2024/photo_{i}.jpg"
+                image = rng.choice(bases[1200, 800]).transpose(rng.choice([Image.FLIP_LEFT_RIGHT, Image.FLIP_TOP_BOTTOM]))
+            else:
+                filename = f"{root}_{i}.jpg"
+                image = rng.choice(bases[4032, 3024])
+                # Alternate landscape and portrait
+                image = image.transpose(Image.ROTATE_90 if i % 2 else Image.ROTATE_180)
+            path = os.path.join(static_dir, root, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image.save(path, "JPEG", quality=90)
+            if model is m.Photo:
+                thumb_path = os.path.join(static_dir, root, "thumbnails", filename)
+                os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+                image.thumbnail((400, 400))
+                image.save(thumb_path, "JPEG", quality=80, optimize=True)
+                item = model(title=f"Photo {i}", filename=filename, year=2024, month="jan24")
+            else:
+                item = model(title=f"Photo {i}", filename=filename)
+            m.db.session.add(item)
+    m.db.session.commit()
+
+
+def slot_width(sizes, viewport):
+    """Evaluate a sizes attribute of "(max-width: Npx) X" entries and a default."""
+    for entry in [part.strip() for part in sizes.split(",")]:
+        match = re.match(r"\(max-width:\s*(\d+)px\)\s*(.+)", entry)
+        if match:
+            if viewport > int(match.group(1)):
+                continue
+            entry = match.group(2)
+        if entry.endswith("vw"):
+            return viewport * float(entry[:-2]) / 100
+        return float(entry.rstrip("px"))
+    return viewport
+
+
+def pick_candidate(srcset, sizes, viewport, dpr):
+    """The srcset URL a browser would fetch for the slot."""
+    candidates = sorted(
+        (int(descriptor.rstrip("w")), url)
+        for url, descriptor in (item.split() for item in srcset.split(","))
+    )
+    needed = slot_width(sizes, viewport) * dpr
+    return next((url for width, url in candidates if width >= needed), candidates[-1][1])
+
+
+def page_image_urls(soup, viewport, dpr, webp):
+    urls = []
+    for img in soup.select(".js-gallery-item img"):
+        picture = img.find_parent("picture")
+        chosen = None
+        if picture is not None:
+            for source in picture.find_all("source"):
+                if source.get("type") == "image/webp" and not webp:
+                    continue
+                chosen = pick_candidate(source["srcset"], source["sizes"], viewport, dpr)
+                break
+        if chosen is None and img.get("srcset"):
+            chosen = pick_candidate(img["srcset"], img["sizes"], viewport, dpr)
+        urls.append(chosen or img["src"])
+    return urls
+
+
+def page_bytes(m, client, static_dir, path, viewport, dpr, webp):
+    from bs4 import BeautifulSoup
+
+    response = client.get(path)
+    soup = BeautifulSoup(response.data, "html.parser")
+    total = 0
+    for url in page_image_urls(soup, viewport, dpr, webp):
+        total += os.path.getsize(os.path.join(static_dir, url.split("/static/", 1)[1]))
+    return total, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare image bytes per page with and without srcset")
+    parser.add_argument("--photos", type=int, default=10, help="Photos per gallery/collection")
+    parser.add_argument("--no-webp", action="store_true", help="Simulate a browser without WebP support")
+    args = parser.parse_args()
+
+    import random
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp_dir, "bench.db")
+        os.environ["PAGE_CACHE_STORES"] = ""
+        import mySite.app as m
+
+        static_dir = os.path.join(tmp_dir, "static")
+        m.app.static_folder = static_dir
+        client = m.app.test_client()
+        with m.app.app_context():
+            m.db.create_all()
+            create_photos(m, static_dir, args.photos, random.Random(42))
+
+            before = {
+                (path, name): page_bytes(m, client, static_dir, path, width, dpr, not args.no_webp)
+                for path in PAGES for name, width, dpr in VIEWPORTS
+            }
+            for model in m.MEDIA_ROOTS:
+                for item in model.query.all():
+                    m.generate_image_variants(item)
+            m.db.session.commit()
+            after = {
+                (path, name): page_bytes(m, client, static_dir, path, width, dpr, not args.no_webp)
+                for path in PAGES for name, width, dpr in VIEWPORTS
+            }
+
+    print(f"{'page':<40}{'viewport':<10}{'before KB':>11}{'after KB':>10}{'saved':>8}{'HTML +KB':>10}")
+    print("-" * 89)
+    total_before = total_after = 0
+    for path in PAGES:
+        for name, _, _ in VIEWPORTS:
+            (old, old_html), (new, new_html) = before[path, name], after[path, name]
+            total_before += old
+            total_after += new
+            saved = 1 - new / old if old else 0
+            print(f"{path:<40}{name:<10}{old / 1024:>11.0f}{new / 1024:>10.0f}{saved:>8.0%}"
+                  f"{(new_html - old_html) / 1024:>10.1f}")
+    print("-" * 89)
+    print(f"All pages and viewports: {total_before / 1024 / 1024:.1f} MB -> {total_after / 1024 / 1024:.1f} MB "
+          f"({1 - total_after / total_before:.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Wall time and peak memory of the image pipeline against the code it replaced.
+
+For synthetic uploads of several sizes and formats, times two jobs:
+
+- gallery: a gallery upload as process_gallery_image() handles it (fit into
+  1200x800, thumbnail, responsive copies), against the old upload_photo()
+  code (decode, resize, save; decode again for the thumbnail; decode again
+  for the copies)
+- variants: the responsive copies of a collection photo, against a full
+  decode resized with LANCZOS for every width
+
+Every run happens in a fresh process so its peak RSS can be measured; the
+figure reported is the peak above what the process used after importing the
+app. Times are the median of --repeat runs.
+
+Usage:
+    python scripts/benchmark_image_pipeline.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# (label, size, format)
+INPUTS = [
+    ("12MP JPEG", (4032, 3024), "JPEG"),
+    ("24MP JPEG", (6000, 4000), "JPEG"),
+    ("2MP JPEG", (1600, 1200), "JPEG"),
+    ("12MP PNG", (4032, 3024), "PNG"),
+]
+
+
+def peak_rss_kb(reset=False):
+    """
+    Peak resident memory of this process in KB. On Linux ru_maxrss carries
+    over the parent's peak through fork and exec, so the kernel's high-water
+    mark is used instead, restarted from the current RSS when ``reset``.
+    """
+    if os.path.exists("/proc/self/clear_refs"):
+        if reset:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        with open("/proc/self/status") as f:
+            return int(next(line.split()[1] for line in f if line.startswith("VmHWM:")))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def synthetic_photo(size):
+    """A photo-like RGB image: smooth fractal detail plus sensor-like noise."""
+    from PIL import Image
+
+    width, height = size
+    channels = [
+        Image.effect_mandelbrot((width // 4, height // 4), (x - 0.03, 0.1, x + 0.03, 0.1 + 0.06 * height / width), 100)
+        .resize(size, Image.Resampling.BICUBIC)
+        for x in (-0.75, -0.74, -0.76)
+    ]
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    return Image.blend(Image.merge("RGB", channels), noise, 0.08)
+
+
+def legacy_gallery(m, source, settings):
+    """upload_photo() and generate_image_variants() before the single-decode pipeline."""
+    from PIL import Image
+
+    path = os.path.join(settings["static_folder"], source)
+    with Image.open(path) as img:
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGB")
+        width, height = img.size
+        if width > 1200 or height > 800:
+            scale = min(1200 / width, 800 / height)
+            img = img.resize((int(width * scale), int(height * scale)), Image.Resampling.LANCZOS)
+        img.save(path, "JPEG", quality=85, optimize=True)
+    with Image.open(path) as img:
+        thumb_path = os.path.join(settings["static_folder"], m.thumbnail_path(source))
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        img.thumbnail((400, 400))
+        img.save(thumb_path, "JPEG", quality=80, optimize=True)
+    legacy_variants(m, source, settings)
+
+
+def legacy_variants(m, source, settings):
+    """generate_image_variants() before the single-decode pipeline: full decode, LANCZOS per width."""
+    from PIL import Image
+
+    with Image.open(os.path.join(settings["static_folder"], source)) as image:
+        image.load()
+        image = image if image.mode in ("RGB", "L") else image.convert("RGB")
+    for width in sorted(m.variant_widths(image.width, settings["widths"]), reverse=True):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in settings["formats"]:
+            path = os.path.join(settings["static_folder"], m.variant_filename(source, fmt, width, settings["folder"]))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            resized.save(path, fmt.upper(), quality=settings["quality"][fmt], optimize=True)
+
+
+def pipeline_variants(m, source, settings):
+    path = os.path.join(settings["static_folder"], source)
+    image, _ = m.load_image(path, m.variant_target(settings), settings["max_pixels"])
+    m.render_image_variants(image, source, settings)
+
+
+JOBS = {
+    ("gallery", "old"): legacy_gallery,
+    ("gallery", "new"): lambda m, source, settings: m.process_gallery_image(source, settings),
+    ("variants", "old"): legacy_variants,
+    ("variants", "new"): pipeline_variants,
+}
+
+
+def run_child(job, code, static_dir, source):
+    """Run one job in this (fresh) process and print its time and peak memory as JSON."""
+    import mySite.app as m
+
+    settings = dict(m.image_settings(), static_folder=static_dir)
+    baseline = peak_rss_kb(reset=True)
+    start = time.perf_counter()
+    JOBS[job, code](m, source, settings)
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_kb": peak_rss_kb() - baseline}))
+
+
+def measure(job, code, original, work_dir, repeat):
+    """Median seconds and largest peak RSS (KB) over ``repeat`` runs on fresh copies of ``original``."""
+    seconds, peaks = [], []
+    for _ in range(repeat):
+        static_dir = os.path.join(work_dir, "static")
+        shutil.rmtree(static_dir, ignore_errors=True)
+        source = "gallery_images/2024/" + os.path.basename(original)
+        os.makedirs(os.path.join(static_dir, "gallery_images", "2024"))
+        shutil.copy(original, os.path.join(static_dir, source))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", job, code, static_dir, source],
+            check=True, capture_output=True, text=True, env=dict(os.environ, IMAGE_WORKERS="0"),
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        peaks.append(result["peak_kb"])
+    return statistics.median(seconds), max(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the single-decode image pipeline")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=4, metavar=("JOB", "CODE", "STATIC", "SOURCE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp_dir, "bench.db")
+        print(f"{'input':<12}{'job':<10}{'old ms':>9}{'new ms':>9}{'speedup':>9}{'old MB':>9}{'new MB':>9}")
+        print("-" * 67)
+        for label, size, fmt in INPUTS:
+            original = os.path.join(tmp_dir, f"input_{size[0]}x{size[1]}.{fmt.lower()}")
+            image = synthetic_photo(size)
+            image.save(original, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+            for job in ("gallery", "variants"):
+                old_s, old_kb = measure(job, "old", original, tmp_dir, args.repeat)
+                new_s, new_kb = measure(job, "new", original, tmp_dir, args.repeat)
+                print(f"{label:<12}{job:<10}{old_s * 1000:>9.0f}{new_s * 1000:>9.0f}{old_s / new_s:>8.1f}x"
+                      f"{old_kb / 1024:>9.1f}{new_kb / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
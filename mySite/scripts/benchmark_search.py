@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Query latency benchmark for the blog full-text search.
+
+Fills a scratch database with synthetic posts (50,000 by default, mixed
+Chinese and English HTML like the Douban/WeChat imports), builds the FTS5
+indexes and times search_posts() for several query shapes. A LIKE '%...%' scan
+over post.content is timed alongside for comparison.
+
+Usage:
+    python scripts/benchmark_search.py [--posts 50000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+CHINESE = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理府研质"
+ENGLISH = "memory river window silence autumn letter journey morning harbor lantern garden history reading guitar practice photograph quotation".split()
+
+
+def build_vocabulary(rng, size=3000):
+    """Chinese words of 2-4 characters, used with a skewed (Zipf-like) frequency."""
+    return ["".join(rng.choice(CHINESE) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def random_paragraph(rng, vocabulary):
+    words = []
+    for _ in range(rng.randint(40, 120)):
+        if rng.random() < 0.05:
+            words.append(" " + rng.choice(ENGLISH) + " ")
+        else:
+            words.append(vocabulary[min(int(rng.paretovariate(1.2)) - 1, len(vocabulary) - 1)])
+    return "".join(words)
+
+
+def build_queries(vocabulary):
+    """Pick query terms of different frequencies and lengths from the vocabulary."""
+    three = [w for w in vocabulary if len(w) >= 3]
+    two = [w for w in vocabulary if len(w) == 2]
+    return [
+        ("common 3+ char Chinese term", three[0]),
+        ("rare 3+ char Chinese term", three[-1]),
+        ("English word", "lantern"),
+        ("two terms", f"{three[1]} {three[5]}"),
+        ("common 2 char Chinese term", two[0]),
+        ("rare 2 char Chinese term", two[-1]),
+        ("no match", "zzzqqq"),
+    ]
+
+
+def populate(db, Post, count, rng, vocabulary):
+    """Insert synthetic posts with raw executemany for speed."""
+    rows = []
+    for i in range(count):
+        paragraphs = "".join(f"<p>{random_paragraph(rng, vocabulary)}</p>" for _ in range(rng.randint(3, 8)))
+        rows.append({
+            "title": f"{random_paragraph(rng, vocabulary)[:20]} {i}",
+            "content": f"<div class=\"rich_media_content\">{paragraphs}</div>",
+            "like_count": 0,
+            "comment_count": 0,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Post.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Post.__table__.insert(), rows)
+    db.session.commit()
+
+
+def time_call(fn, repeat):
+    """Return (median, p95) wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blog search latency")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp_dir, "bench.db")
+        from mySite.app import app, db, Post, rebuild_post_search_index, search_posts
+
+        with app.app_context():
+            db.create_all()
+            rng = random.Random(42)
+            vocabulary = build_vocabulary(rng)
+
+            start = time.perf_counter()
+            populate(db, Post, args.posts, rng, vocabulary)
+            print(f"Inserted {args.posts} posts in {time.perf_counter() - start:.1f}s")
+
+            start = time.perf_counter()
+            rebuild_post_search_index()
+            print(f"Built search index in {time.perf_counter() - start:.1f}s")
+            print("-" * 78)
+            print(f"{'query':<34}{'results':>8}{'fts p50':>10}{'fts p95':>10}{'LIKE p50':>12}")
+
+            for label, query in build_queries(vocabulary):
+                results = search_posts(query)
+                fts_p50, fts_p95 = time_call(lambda: search_posts(query), args.repeat)
+                term = query.split()[0]
+                like = lambda: Post.query.with_entities(Post.id).filter(
+                    Post.content.like(f"%{term}%")
+                ).order_by(Post.created_at.desc()).limit(20).all()
+                like_p50, _ = time_call(like, max(3, args.repeat // 5))
+                print(f"{label:<34}{len(results):>8}{fts_p50:>9.1f}ms{fts_p95:>8.1f}ms{like_p50:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for the SQLite engine profiles.
+
+Starts several reader and writer processes against a scratch copy of the
+photo table and runs them at the same time for each engine profile. Readers
+repeat the gallery query while writers insert rows the way upload_photo and
+like_photo do. Prints throughput and lock errors per profile.
+
+Usage:
+    python scripts/benchmark_sqlite_contention.py [--readers 4] [--writers 4] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import SQLITE_ENGINE_PROFILES, apply_sqlite_pragmas
+
+GALLERY_QUERY = "SELECT id, title, filename FROM photo ORDER BY year DESC, filename DESC LIMIT 20"
+
+
+def open_connection(db_path, profile_name):
+    """Open a connection the way the app's connection pool would."""
+    # timeout=0 leaves waiting entirely to the profile's busy_timeout
+    connection = sqlite3.connect(db_path, timeout=0)
+    apply_sqlite_pragmas(connection, SQLITE_ENGINE_PROFILES[profile_name])
+    return connection
+
+
+def create_database(db_path, rows):
+    """Create the scratch photo table and fill it with sample rows."""
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE photo (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, "
+        "filename VARCHAR(255) NOT NULL, year INTEGER, created_at DATETIME)"
+    )
+    connection.executemany(
+        "INSERT INTO photo (title, filename, year, created_at) VALUES (?, ?, ?, datetime('now'))",
+        [(f"Photo {i}", f"{2020 + i % 6}/IMG_{i:06d}.jpg", 2020 + i % 6) for i in range(rows)],
+    )
+    connection.commit()
+    connection.close()
+
+
+def reader(db_path, profile_name, deadline, results):
+    """Run the gallery query in a loop until the deadline."""
+    connection = open_connection(db_path, profile_name)
+    reads = errors = 0
+    while time.time() < deadline:
+        try:
+            connection.execute(GALLERY_QUERY).fetchall()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    connection.close()
+    results.put(("read", reads, errors))
+
+
+def writer(db_path, profile_name, deadline, results):
+    """Insert and commit one row at a time until the deadline."""
+    connection = open_connection(db_path, profile_name)
+    writes = errors = 0
+    pid = os.getpid()
+    while time.time() < deadline:
+        try:
+            connection.execute(
+                "INSERT INTO photo (title, filename, year, created_at) VALUES (?, ?, ?, datetime('now'))",
+                (f"Upload {pid}-{writes}", f"2026/UPLOAD_{pid}_{writes}.jpg", 2026),
+            )
+            connection.commit()
+            writes += 1
+        except sqlite3.OperationalError:
+            connection.rollback()
+            errors += 1
+    connection.close()
+    results.put(("write", writes, errors))
+
+
+def run_profile(profile_name, readers, writers, seconds, rows):
+    """Benchmark one engine profile and return its totals."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        create_database(db_path, rows)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + seconds
+        processes = [
+            multiprocessing.Process(target=reader, args=(db_path, profile_name, deadline, results))
+            for _ in range(readers)
+        ] + [
+            multiprocessing.Process(target=writer, args=(db_path, profile_name, deadline, results))
+            for _ in range(writers)
+        ]
+        for process in processes:
+            process.start()
+
+        totals = {"read": [0, 0], "write": [0, 0]}
+        for _ in processes:
+            kind, count, errors = results.get()
+            totals[kind][0] += count
+            totals[kind][1] += errors
+        for process in processes:
+            process.join()
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite engine profiles under contention")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers + {args.writers} writers, {args.seconds:.0f}s per profile")
+    print("-" * 72)
+    print(f"{'profile':<14}{'reads/s':>12}{'writes/s':>12}{'read errors':>16}{'write errors':>16}")
+    for profile_name in SQLITE_ENGINE_PROFILES:
+        totals = run_profile(profile_name, args.readers, args.writers, args.seconds, args.rows)
+        reads, read_errors = totals["read"]
+        writes, write_errors = totals["write"]
+        print(
+            f"{profile_name:<14}{reads / args.seconds:>12.0f}{writes / args.seconds:>12.0f}"
+            f"{read_errors:>16}{write_errors:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Query count regression check for the library category pages.
+
+Builds a scratch database with a small and a large library, requests each
+page with the query cache cold and warm, and counts the SQL statements it
+runs. Exits with status 1 if a page runs more queries for the larger library,
+which means a per-category query (N+1) has crept back in.
+
+Usage:
+    python scripts/check_query_counts.py [--small 3] [--large 40]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+PAGES = [
+    "/library",
+    "/ideas",
+    "/admin/library/categories",
+]
+
+
+def fill_library(m, categories):
+    """Replace the library with ``categories`` categories of one public and one hidden book each."""
+    m.Book.query.delete()
+    m.CategoryIcon.query.delete()
+    for i in range(categories):
+        name = f"Category {i}"
+        m.db.session.add(m.CategoryIcon(name=name, display_order=i))
+        for is_public in (True, False):
+            m.db.session.add(m.Book(
+                title=f"Book {i} {is_public}", author="Author", category=name,
+                filename=f"{i}.pdf", file_path=f"library_books/{name}/{i}.pdf",
+                is_public=is_public, file_size=1024,
+            ))
+    m.db.session.commit()
+
+
+def count_queries(m, client, path):
+    """Return (status, cold query count, warm query count) for GETs of ``path``."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    m.invalidate_cached_queries()
+    m.event.listen(m.db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get(path)
+        cold = len(statements)
+        statements.clear()
+        client.get(path)
+        warm = len(statements)
+    finally:
+        m.event.remove(m.db.engine, "before_cursor_execute", record)
+    return response.status_code, cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that library pages run a constant number of queries")
+    parser.add_argument("--small", type=int, default=3, help="Categories in the small library")
+    parser.add_argument("--large", type=int, default=40, help="Categories in the large library")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite://"
+    os.environ["PAGE_CACHE_STORES"] = ""
+
+    import mySite.app as m
+
+    results = {}
+    with m.app.app_context():
+        m.db.create_all()
+        admin = m.User(username="query-count-admin", email="admin@example.com", role="admin")
+        admin.set_password("password")
+        m.db.session.add(admin)
+        m.db.session.commit()
+
+        client = m.app.test_client()
+        client.post("/login", data={"username": "query-count-admin", "password": "password"})
+        for size in (args.small, args.large):
+            fill_library(m, size)
+            for path in PAGES:
+                client.get(path)  # Consume the login flash and warm the user cache
+                results[path, size] = count_queries(m, client, path)
+
+    failures = 0
+    print(f"{'page':<30}{'categories':>12}{'status':>8}{'cold':>7}{'warm':>7}")
+    for path in PAGES:
+        small, large = results[path, args.small], results[path, args.large]
+        ok = small[0] == large[0] == 200 and small[1:] == large[1:]
+        failures += not ok
+        for size, (status, cold, warm) in ((args.small, small), (args.large, large)):
+            print(f"{'✅' if ok else '❌'} {path:<28}{size:>12}{status:>8}{cold:>7}{warm:>7}")
+
+    print("-" * 64)
+    if failures:
+        print(f"❌ {failures} page(s) run more queries as the library grows")
+        sys.exit(1)
+    print("✅ Query counts don't depend on the number of categories")
+
+
+if __name__ == "__main__":
+    main()
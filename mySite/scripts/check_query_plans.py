@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Query plan regression check for the hot route queries.
+
+Runs EXPLAIN QUERY PLAN on the queries each public route issues and exits with
+status 1 if any of them falls back to a full table scan or a temporary B-tree
+sort. Filtered queries must also use an index search rather than walking a
+whole index.
+
+By default the schema is built from the models in a scratch in-memory database.
+Pass --database to check an existing (migrated) database file instead.
+
+Usage:
+    python scripts/check_query_plans.py [--database path/to/database.db]
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Queries allowed to sort in a temp B-tree because the rows being sorted are
+# already narrowed by an index search (e.g. one label's posts)
+BOUNDED_SORTS = {
+    ("blog_index", "label next page"),
+}
+
+
+def route_queries(models):
+    """
+    Build the queries the routes run, labelled by route.
+
+    Args:
+        models: The mySite.app module
+
+    Returns:
+        list: (route, description, query) tuples
+    """
+    m = models
+    queries = [
+        ("index", "recent photos", m.Photo.query.order_by(m.Photo.taken_at.desc(), m.Photo.id.desc()).limit(6)),
+        ("index", "recent posts", m.Post.query.order_by(m.Post.created_at.desc()).limit(6)),
+        ("index", "lab projects", m.LabProject.query.order_by(m.LabProject.created_at.desc()).limit(3)),
+        ("gallery", "year facets", m.db.select(m.db.func.max(m.Photo.taken_at)).where(m.Photo.taken_at < datetime(2024, 1, 1))),
+        ("gallery", "next page", keyset_page(m, m.Photo.query, [m.Photo.taken_at, m.Photo.id], (datetime(2024, 1, 1), 1))),
+        ("gallery", "previous page", keyset_page(m, m.Photo.query, [m.Photo.taken_at, m.Photo.id], (datetime(2024, 1, 1), 1), backwards=True)),
+        ("gallery", "one year page", keyset_page(m, m.Photo.query.filter(m.Photo.taken_at >= datetime(2024, 1, 1), m.Photo.taken_at < datetime(2025, 1, 1)), [m.Photo.taken_at, m.Photo.id], (datetime(2024, 6, 1), 1))),
+        ("blog_index", "next page", keyset_page(m, m.Post.query, [m.Post.created_at, m.Post.id], (datetime(2024, 1, 1), 1))),
+        ("blog_index", "label next page", keyset_page(m, m.Post.query.join(m.post_labels, m.post_labels.c.post_id == m.Post.id).filter(m.post_labels.c.label_id == 1), [m.Post.created_at, m.Post.id], (datetime(2024, 1, 1), 1))),
+        ("blog_index", "label lookup", m.Label.query.filter_by(name="label")),
+        ("blog_index", "label counts", m.db.session.query(m.Label, m.db.func.count(m.post_labels.c.post_id)).outerjoin(m.post_labels, m.post_labels.c.label_id == m.Label.id).group_by(m.Label.name).order_by(m.Label.name)),
+        ("post", "comments", m.Comment.query.filter_by(post_id=1)),
+        ("post", "likes", m.Like.query.filter_by(post_id=1)),
+        ("like_post", "existing like", m.Like.query.filter_by(user_id=1, post_id=1)),
+        ("like_photo", "existing like", m.PhotoLike.query.filter_by(user_id=1, photo_id=1)),
+        ("gallery", "photo comments", m.PhotoComment.query.filter_by(photo_id=1)),
+        ("gallery", "image variants", m.ImageVariant.query.filter_by(source="a.jpg").order_by(m.ImageVariant.source, m.ImageVariant.format, m.ImageVariant.width)),
+        ("sitemap", "post years", m.db.select(m.db.func.max(m.Post.created_at)).where(m.Post.created_at < datetime(2024, 1, 1))),
+        ("sitemap", "gallery year lastmod", m.db.select(m.db.func.max(m.Photo.created_at)).where(m.Photo.taken_at >= datetime(2024, 1, 1), m.Photo.taken_at < datetime(2025, 1, 1))),
+        ("sitemap", "collections lastmod", m.db.select(m.db.func.max(m.CollectionStats.last_update))),
+        ("sitemap", "library lastmod", m.db.select(m.db.func.max(m.Book.upload_date)).where(m.Book.is_public.is_(True))),
+        ("sitemap_child", "post year exists", m.db.select(m.db.exists().where(m.Post.created_at >= datetime(2024, 1, 1), m.Post.created_at < datetime(2025, 1, 1)))),
+        ("sitemap_child", "gallery year exists", m.db.select(m.db.exists().where(m.Photo.taken_at >= datetime(2024, 1, 1), m.Photo.taken_at < datetime(2025, 1, 1)))),
+        ("sitemap_child", "posts of a year", m.db.select(m.Post.id, m.Post.created_at).where(m.Post.created_at >= datetime(2024, 1, 1), m.Post.created_at < datetime(2025, 1, 1)).order_by(m.Post.created_at.desc())),
+        ("sitemap_child", "gallery of a year", m.db.select(m.Photo.filename, m.Photo.sha256, m.Photo.created_at).where(m.Photo.taken_at >= datetime(2024, 1, 1), m.Photo.taken_at < datetime(2025, 1, 1)).order_by(m.Photo.taken_at.desc(), m.Photo.id.desc())),
+        ("library_index", "categories", m.CategoryIcon.query.order_by(m.CategoryIcon.display_order, m.CategoryIcon.name)),
+        ("library_category", "reader view", m.Book.query.filter_by(category="category", is_public=True).order_by(m.Book.upload_date.desc())),
+        ("library_category", "member view", m.Book.query.filter_by(category="category").order_by(m.Book.upload_date.desc())),
+        ("manage_categories", "category book counts", m.db.session.query(m.Book.category, m.db.func.count(m.Book.id), m.db.func.sum(m.Book.file_size)).group_by(m.Book.category)),
+        ("delete_category", "book exists", m.Book.query.with_entities(m.Book.id).filter_by(category="category").limit(1)),
+    ]
+
+    collection_models = [
+        m.GuitarVideo, m.GuitarPhoto, m.CollectionVideo, m.BookPhoto, m.ExercisePhoto,
+        m.ReadingQuotePhoto, m.IntellectualPhoto, m.FragmentedQuotePhoto,
+    ]
+    for model in collection_models:
+        queries.append(("collections", f"{model.__tablename__} last update",
+                        model.query.order_by(model.created_at.desc()).limit(1)))
+        queries.append((model.__tablename__, "next page",
+                        keyset_page(m, model.query, [model.created_at, model.id], (datetime(2024, 1, 1), 1))))
+    return queries
+
+
+def keyset_page(m, query, key_columns, cursor, backwards=False):
+    """Build the query KeysetPagination runs for a page after (or before) a cursor."""
+    key = m.db.tuple_(*key_columns)
+    if backwards:
+        return query.filter(key > cursor).order_by(*[c.asc() for c in key_columns]).limit(21)
+    return query.filter(key < cursor).order_by(*[c.desc() for c in key_columns]).limit(21)
+
+
+def explain(db, query):
+    """
+    Run EXPLAIN QUERY PLAN for an ORM query.
+
+    Returns:
+        list: The plan detail strings
+    """
+    statement = query.statement if hasattr(query, "statement") else query
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(compiled), params
+    ).fetchall()
+    return [row[3] for row in rows], statement.whereclause is not None
+
+
+def plan_problems(details, filtered, allow_sort=False):
+    """
+    Find the plan steps that indicate a missing index.
+
+    Args:
+        details (list): Plan detail strings
+        filtered (bool): Whether the query has a WHERE clause
+        allow_sort (bool): Accept a temp B-tree sort of index-searched rows
+
+    Returns:
+        list: Offending plan steps
+    """
+    problems = []
+    for detail in details:
+        if "USE TEMP B-TREE" in detail:
+            if not allow_sort:
+                problems.append(detail)
+        elif detail == "SCAN CONSTANT ROW":
+            # The outer SELECT of an EXISTS probe
+            continue
+        elif detail.startswith("SCAN ") and (" USING " not in detail or filtered):
+            problems.append(detail)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check hot route queries for full scans and temp sorts")
+    parser.add_argument("--database", help="Existing SQLite database to check instead of a scratch schema")
+    parser.add_argument("--verbose", action="store_true", help="Print every query plan")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(args.database)
+    else:
+        os.environ["DATABASE_URL"] = "sqlite://"
+
+    import mySite.app as models
+
+    failures = 0
+    with models.app.app_context():
+        if not args.database:
+            models.db.create_all()
+
+        for route, description, query in route_queries(models):
+            details, filtered = explain(models.db, query)
+            problems = plan_problems(details, filtered, (route, description) in BOUNDED_SORTS)
+            status = "❌" if problems else "✅"
+            print(f"{status} {route}: {description}")
+            for detail in details if args.verbose else problems:
+                print(f"     {detail}")
+            failures += bool(problems)
+
+    print("-" * 50)
+    if failures:
+        print(f"❌ {failures} quer{'y' if failures == 1 else 'ies'} without a supporting index")
+        sys.exit(1)
+    print("✅ All query plans use indexes")
+
+
+if __name__ == "__main__":
+    main()
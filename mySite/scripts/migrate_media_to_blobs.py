@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Move gallery and collection photos stored before the blob store (in their
+model's folder under static/) into it, so identical files are kept once.
+
+Each old file is copied into the blob store by content and every row
+showing it is pointed at the blob. Once those rows are committed the old
+file and its derivatives are deleted. Rows whose bytes were already in the
+store take the derivatives made for them; run scripts/rebuild_derivatives.py
+afterwards to build the rest at their new paths.
+
+Usage:
+    python scripts/migrate_media_to_blobs.py [--root book_photos ...] [--dry-run] [--keep-files]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import (
+    app, db, commit_with_retry, MEDIA_ROOTS, adopt_derivatives, media_path, rebuild_collection_stats,
+    release_media, store_blob,
+)
+
+COMMIT_EVERY = 50
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move photos from the media folders into the blob store")
+    parser.add_argument("--root", action="append", choices=sorted(MEDIA_ROOTS.values()),
+                        help="Only this media root (repeatable); default all")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    parser.add_argument("--keep-files", action="store_true", help="Leave the old files and derivatives in place")
+    args = parser.parse_args()
+    roots = set(args.root or MEDIA_ROOTS.values())
+
+    with app.app_context():
+        moved = files = shared = 0
+        missing, moved_sources = [], []
+
+        def commit():
+            commit_with_retry()
+            if not args.keep_files:
+                for source in moved_sources:
+                    release_media(source, None)
+                commit_with_retry()
+            moved_sources.clear()
+
+        for model, root in MEDIA_ROOTS.items():
+            if root not in roots:
+                continue
+            shown_by = {}
+            for item in model.query.filter(model.sha256.is_(None)).order_by(model.id).all():
+                shown_by.setdefault(media_path(item), []).append(item)
+
+            for source, items in shown_by.items():
+                path = os.path.join(app.static_folder, source)
+                if not os.path.exists(path):
+                    missing.append(source)
+                    continue
+                if args.dry_run:
+                    print(f"  {source} ({len(items)} rows)")
+                    files += 1
+                    moved += len(items)
+                    continue
+                try:
+                    blob, new = store_blob(path)
+                except ValueError as e:
+                    print(f"  ❌ {source}: {e}")
+                    continue
+                for item in items:
+                    item.filename, item.sha256 = blob.filename, blob.sha256
+                    item.thumb_width = item.thumb_height = None
+                    if not new:
+                        adopt_derivatives(item)
+                shared += not new
+                files += 1
+                moved += len(items)
+                moved_sources.append(source)
+                if files % COMMIT_EVERY == 0:
+                    commit()
+                    print(f"  {files} files moved...")
+        if not args.dry_run:
+            commit()
+            # Covers point at the old paths
+            rebuild_collection_stats()
+
+    for source in missing[:20]:
+        print(f"  missing: {source}")
+    if args.dry_run:
+        print(f"Would move {files} files ({moved} rows), {len(missing)} missing originals")
+    else:
+        print(f"✅ Moved {files} files ({moved} rows, {shared} already in the store), "
+              f"{len(missing)} missing originals")
+
+
+if __name__ == "__main__":
+    main()
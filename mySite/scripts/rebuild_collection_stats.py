@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Rebuild the collection_stats table from the collection tables.
+
+The stats are maintained automatically when collection items are added or
+deleted. Run this after creating the table on an existing database or after
+editing the collection tables by hand.
+
+Usage:
+    python scripts/rebuild_collection_stats.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import app, CollectionStats, rebuild_collection_stats
+
+
+def main():
+    with app.app_context():
+        rebuild_collection_stats()
+        for stats in CollectionStats.query.order_by(CollectionStats.last_update.desc()).all():
+            print(f"  {stats.key:<20} {stats.item_count:>6} items  last update {stats.last_update}")
+    print("✅ Collection stats rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Rebuild the derivatives of gallery and collection photos (grid thumbnails
+and the responsive WebP/JPEG copies) in parallel, skipping the fresh ones.
+
+Every photo of every media root (MEDIA_ROOTS in app.py) is checked against
+its ImageManifest entry: a photo is rebuilt when it has no entry, when its
+derivatives are missing or its thumbnail size isn't recorded, or when the
+entry's pipeline version differs from the current settings (after changing
+IMAGE_VARIANT_* or the thumbnail size).
+A file whose mtime or size changed is hashed, and rebuilt only if its
+content did too. Uploads record their entry as they are processed. Rows
+showing the same blob share one rebuild.
+
+Photos processed before sizes and placeholders were recorded get them from
+a small decode of the file they show, even when their derivatives are
+fresh; gallery photos also get their EXIF capture time and orientation.
+
+With --pending, gallery uploads left "processing" (the server stopped before
+its image worker finished) or "failed" are first resized the way upload_photo
+does it, which moves them into the blob store.
+
+Usage:
+    python scripts/rebuild_derivatives.py [--workers 4] [--force] [--pending]
+        [--root gallery_images ...] [--dry-run]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import (
+    app, db, commit_with_retry, ImageManifest, ImageVariant, MEDIA_ROOTS, PLACEHOLDER_SIZE, Photo,
+    build_derivatives, derivative_version, image_metadata, image_settings, load_image, media_path,
+    process_gallery_image, record_derivatives, record_gallery_image, record_image_details,
+    record_photo_metadata, render_placeholder, source_fingerprint, thumbnail_path,
+)
+
+COMMIT_EVERY = 50
+
+
+def rebuild(source, settings, entry, pending, describe):
+    """
+    Worker job for one photo.
+
+    Returns:
+        dict: What build_derivatives() returns, or only {"manifest": ...}
+        when the file was touched but its content is unchanged; with
+        ``describe``, plus "metadata" from image_metadata() and always
+        "size" and "placeholder"
+    """
+    if pending:
+        return process_gallery_image(source, settings)
+    path = os.path.join(settings["static_folder"], source)
+    result = None
+    version = derivative_version(source, settings)
+    if entry and entry["version"] == version:
+        fingerprint = source_fingerprint(path)
+        if fingerprint["sha256"] == entry["sha256"]:
+            result = {"manifest": dict(fingerprint, version=version)}
+    if result is None:
+        result = build_derivatives(source, settings)
+    if describe:
+        result["metadata"] = image_metadata(path)
+        if "placeholder" not in result:
+            image, result["size"] = load_image(path, PLACEHOLDER_SIZE, settings["max_pixels"])
+            result["placeholder"] = render_placeholder(image)
+    return result
+
+
+def undescribed(items):
+    """Rows among ``items`` whose size and placeholder (and capture metadata) were never recorded."""
+    return [item for item in items if item.width is None or item.placeholder is None]
+
+
+def plan(roots, settings, force, pending):
+    """
+    Decide what to rebuild.
+
+    Returns:
+        tuple: (jobs as (rows, source, known manifest entry or None, pending,
+        describe), number of fresh files, list of missing originals)
+    """
+    manifest = {entry.source: entry for entry in ImageManifest.query.all()}
+    variant_files = {}
+    for source, filename in db.session.execute(db.select(ImageVariant.source, ImageVariant.filename)):
+        variant_files.setdefault(source, []).append(filename)
+    shown_by = {}
+    for model, root in MEDIA_ROOTS.items():
+        if root in roots:
+            for item in model.query.order_by(model.id).all():
+                shown_by.setdefault(media_path(item), []).append(item)
+
+    jobs, fresh, missing = [], 0, []
+    for source, items in shown_by.items():
+        path = os.path.join(settings["static_folder"], source)
+        if not os.path.exists(path):
+            missing.append(source)
+            continue
+        waiting = [item for item in items if isinstance(item, Photo) and item.status != "ready"]
+        if waiting:
+            if pending:
+                jobs.append((waiting, source, None, True, False))
+            items = [item for item in items if item not in waiting]
+            if not items:
+                continue
+
+        entry = manifest.get(source)
+        stat = os.stat(path)
+        outputs = variant_files.get(source, []) + [thumbnail_path(source)]
+        outputs_exist = (
+            source in variant_files
+            and all(item.thumb_width is not None for item in items)
+            and all(os.path.exists(os.path.join(settings["static_folder"], output)) for output in outputs)
+        )
+        describe = bool(undescribed(items))
+        if (not force and entry is not None and outputs_exist and not describe
+                and entry.version == derivative_version(source, settings)
+                and (entry.mtime, entry.size) == (stat.st_mtime, stat.st_size)):
+            fresh += 1
+            continue
+        known = None
+        if entry is not None and outputs_exist and not force:
+            known = {"version": entry.version, "sha256": entry.sha256}
+        jobs.append((items, source, known, False, describe))
+    return jobs, fresh, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild stale grid thumbnails and responsive copies")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--force", action="store_true", help="Rebuild everything, fresh or not")
+    parser.add_argument("--pending", action="store_true", help="Resize gallery uploads that never finished processing")
+    parser.add_argument("--root", action="append", choices=sorted(MEDIA_ROOTS.values()),
+                        help="Only this media root (repeatable); default all")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be rebuilt")
+    args = parser.parse_args()
+    roots = set(args.root or MEDIA_ROOTS.values())
+
+    with app.app_context():
+        settings = image_settings()
+        jobs, fresh, missing = plan(roots, settings, args.force, args.pending)
+        print(f"{len(jobs)} to rebuild, {fresh} fresh, {len(missing)} missing originals")
+        if args.dry_run:
+            for _, source, _, pending, describe in jobs:
+                note = " (pending upload)" if pending else " (size and placeholder)" if describe else ""
+                print(f"  {source}{note}")
+            return
+
+        start = time.perf_counter()
+        rebuilt = unchanged = done = 0
+        source_bytes = 0
+        failures = []
+        report_every = max(1, len(jobs) // 20)
+        context = multiprocessing.get_context(app.config["IMAGE_WORKER_START_METHOD"])
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context) as executor:
+            futures = {
+                executor.submit(rebuild, source, settings, known, pending, describe): (items, source, pending)
+                for items, source, known, pending, describe in jobs
+            }
+            for future in as_completed(futures):
+                items, source, pending = futures[future]
+                done += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append((source, e))
+                    if pending:
+                        for item in items:
+                            item.status = "failed"
+                else:
+                    source_bytes += result["manifest"]["size"]
+                    if "metadata" in result and not pending:
+                        for item in undescribed(items):
+                            item.width, item.height = result["size"]
+                            item.placeholder = result["placeholder"]
+                            if isinstance(item, Photo):
+                                record_photo_metadata(item, result["metadata"])
+                    if pending:
+                        for item in items:
+                            record_gallery_image(item, result)
+                        rebuilt += 1
+                    elif "variants" in result:
+                        record_derivatives(items[0], result)
+                        for item in items[1:]:
+                            record_image_details(item, result)
+                        rebuilt += 1
+                    else:
+                        entry = db.session.get(ImageManifest, source)
+                        entry.mtime, entry.size = result["manifest"]["mtime"], result["manifest"]["size"]
+                        unchanged += 1
+                if done % COMMIT_EVERY == 0:
+                    commit_with_retry()
+                if done % report_every == 0 or done == len(jobs):
+                    elapsed = time.perf_counter() - start
+                    print(f"  [{done}/{len(jobs)}] {done / elapsed:.1f} images/s, "
+                          f"{source_bytes / elapsed / 1024 / 1024:.1f} MB/s, {len(failures)} failed")
+        commit_with_retry()
+
+    elapsed = time.perf_counter() - start
+    for source, error in failures[:20]:
+        print(f"  ❌ {source}: {error}")
+    if len(failures) > 20:
+        print(f"  ... and {len(failures) - 20} more")
+    print(f"{'❌' if failures else '✅'} Rebuilt {rebuilt}, {unchanged} unchanged after hashing, {fresh} fresh, "
+          f"{len(missing)} missing originals, {len(failures)} failed in {elapsed:.1f}s "
+          f"with {args.workers} workers")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search indexes (post_fts, post_grams, book_fts and book_grams).
+
+The indexes are maintained automatically when posts and books are created,
+edited, deleted or imported. Run this after editing rows directly in the
+database or if an index is missing (e.g. a database created with
+db.create_all()).
+
+Usage:
+    python scripts/rebuild_search_index.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import app, rebuild_book_search_index, rebuild_post_search_index
+
+
+def main():
+    with app.app_context():
+        start = time.perf_counter()
+        indexed = rebuild_post_search_index()
+        print(f"✅ Indexed {indexed} posts in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        indexed = rebuild_book_search_index()
+        print(f"✅ Indexed {indexed} books in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
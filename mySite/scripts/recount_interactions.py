@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Check (and optionally repair) the like/comment counters on posts and photos.
+
+The counters are maintained automatically when likes and comments are added or
+deleted. Run this after bulk imports or manual database edits.
+
+Usage:
+    python scripts/recount_interactions.py            # report mismatches
+    python scripts/recount_interactions.py --repair   # recompute all counters
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from mySite.app import app, check_interaction_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check like/comment counters against the child tables")
+    parser.add_argument("--repair", action="store_true", help="Recompute every counter from the child tables")
+    args = parser.parse_args()
+
+    with app.app_context():
+        mismatches = check_interaction_counters(repair=args.repair)
+
+    for model_name, row_id, counter, stored, actual in mismatches:
+        print(f"  {model_name} {row_id}: {counter} is {stored}, should be {actual}")
+
+    if not mismatches:
+        print("✅ All like/comment counters are consistent")
+    elif args.repair:
+        print(f"✅ Repaired {len(mismatches)} counter(s)")
+    else:
+        print(f"❌ {len(mismatches)} counter(s) out of date - run with --repair to fix")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
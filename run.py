@@ -10,21 +10,24 @@ import sys
 # Add the current directory to Python path so we can import mySite
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-try:
-    from mySite.app import app
-    print("✅ Flask application loaded successfully!")
-    print("🚀 Starting server on http://127.0.0.1:8080")
-    print("📝 Press Ctrl+C to stop the server")
-    print("-" * 50)
+# Image workers are started with "spawn", which imports this file again in
+# each worker: only start the server when run directly
+if __name__ == "__main__":
+    try:
+        from mySite.app import app
+        print("✅ Flask application loaded successfully!")
+        print("🚀 Starting server on http://127.0.0.1:8080")
+        print("📝 Press Ctrl+C to stop the server")
+        print("-" * 50)
     
-    # Run the application
-    app.run(debug=True, host='127.0.0.1', port=8080)
+        # Run the application
+        app.run(debug=True, host='127.0.0.1', port=8080)
     
-except ImportError as e:
-    print(f"❌ Error importing Flask application: {e}")
-    print("\n💡 Try installing dependencies first:")
-    print("   pip install -r requirements.txt")
-except Exception as e:
-    print(f"❌ Error running Flask application: {e}")
-    print("\n🔧 Check if all dependencies are installed:")
-    print("   pip install -r requirements.txt")
+    except ImportError as e:
+        print(f"❌ Error importing Flask application: {e}")
+        print("\n💡 Try installing dependencies first:")
+        print("   pip install -r requirements.txt")
+    except Exception as e:
+        print(f"❌ Error running Flask application: {e}")
+        print("\n🔧 Check if all dependencies are installed:")
+        print("   pip install -r requirements.txt")